@@ -0,0 +1,194 @@
+# coding: utf-8
+"""
+无界面的命令行识别工具，不导入 PyQt5/qfluentwidgets
+
+用法（在项目根目录执行）：
+    python -m app.cli recognize formula.png images/ "shots/*.png"
+    cat formula.png | python -m app.cli recognize -
+    python -m app.cli watch ~/Screenshots
+每个结果输出一行 JSON；recognize 全部成功时退出码为 0，否则为 1；watch 持续运行，Ctrl+C 退出。
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import threading
+
+from .common.settings import CONFIG_PATH
+
+USERS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'users.json')
+
+
+def default_user_id():
+    """图形界面当前登录的用户，读取失败时为 default"""
+    try:
+        with open(USERS_FILE, encoding='utf-8') as f:
+            return json.load(f).get('current_user_id') or 'default'
+    except (OSError, ValueError):
+        return 'default'
+
+
+class JsonLinesWriter:
+    """线程安全地逐行写出 JSON"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def write(self, item):
+        line = json.dumps(item, ensure_ascii=False)
+        with self._lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+
+def create_core(args):
+    """按命令行参数创建识别服务和数据库（延迟导入，--help 不加载 OpenCV）"""
+    from .common.settings import headless_config
+    from .common.ocr_service import OcrServiceFactory
+    from .common.db_manager import DatabaseManager
+
+    if args.config:
+        headless_config().load(args.config)
+    service = OcrServiceFactory.create_service()
+    db = None if args.no_history else DatabaseManager()
+    return service, db
+
+
+def recognize_stdin(service, db, user_id):
+    """识别从标准输入读入的一张图片"""
+    import cv2
+    import numpy as np
+    from .common.image_payload import ImagePayload
+
+    data = sys.stdin.buffer.read()
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return {'path': '-', 'status': False, 'latex': None, 'confidence': 0,
+                'request_id': None, 'message': '无法解码标准输入中的图片', 'record_id': None}
+
+    payload = ImagePayload(image)
+    result = service.recognize(payload)
+    item = {
+        'path': '-',
+        'status': result['status'],
+        'latex': result.get('latex'),
+        'confidence': result.get('confidence', 0),
+        'request_id': result.get('request_id'),
+        'message': result.get('message'),
+        'record_id': None
+    }
+    if result['status'] and db is not None:
+        item['record_id'] = db.add_record(
+            payload.png(), result['latex'], result['confidence'], result['request_id'], user_id=user_id,
+            thumbnail=payload.thumbnail())
+    return item
+
+
+def cmd_recognize(args, stdout):
+    from .common.batch_engine import BatchRecognizer, iter_image_paths
+
+    # 单个文件原样保留，目录和通配符展开为图片列表
+    paths = []
+    ok = True
+    for source in args.inputs:
+        if source == '-':
+            continue
+        expanded = [source] if os.path.isfile(source) else list(iter_image_paths(source, args.recursive))
+        if not expanded:
+            print(f'未找到图片: {source}', file=sys.stderr)
+            ok = False
+        paths.extend(expanded)
+
+    service, db = create_core(args)
+    user_id = args.user or default_user_id()
+    writer = JsonLinesWriter(stdout)
+
+    if '-' in args.inputs or not args.inputs:
+        item = recognize_stdin(service, db, user_id)
+        writer.write(item)
+        ok = ok and item['status']
+
+    if paths:
+        recognizer = BatchRecognizer(
+            service, db,
+            workers=args.workers,
+            user_id=user_id,
+            progress_callback=lambda snapshot, item: writer.write(item)
+        )
+        snapshot = recognizer.run(paths)
+        ok = ok and snapshot['failed'] == 0
+    return 0 if ok else 1
+
+
+def cmd_watch(args, stdout):
+    from .common.folder_watcher import FolderWatcher, WatchCheckpoint
+    from .common.ocr_scheduler import PRIORITY_BULK
+    from .common.ocr_service import OcrServiceFactory
+
+    if not os.path.isdir(args.directory):
+        print(f'目录不存在: {args.directory}', file=sys.stderr)
+        return 1
+
+    service, db = create_core(args)
+    writer = JsonLinesWriter(stdout)
+    watcher = FolderWatcher(
+        args.directory,
+        OcrServiceFactory.with_priority(service, PRIORITY_BULK),
+        db,
+        WatchCheckpoint(args.checkpoint),
+        recursive=args.recursive,
+        interval=args.interval,
+        settle=args.settle,
+        workers=args.workers,
+        user_id=args.user or default_user_id(),
+        on_result=writer.write
+    )
+    if args.skip_existing:
+        print(f'已跳过 {watcher.skip_existing()} 个现有文件', file=sys.stderr)
+    print(f'正在监视 {watcher.directory}，按 Ctrl+C 退出', file=sys.stderr)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m app.cli', description='LatexOCR 命令行识别')
+    parser.add_argument('--config', help=f'配置文件路径，默认 {CONFIG_PATH}')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    recognize = subparsers.add_parser('recognize', help='识别图片文件、目录、通配符或标准输入')
+    recognize.add_argument('inputs', nargs='*', help='图片路径、目录或通配符，- 或省略表示从标准输入读取')
+    recognize.add_argument('-r', '--recursive', action='store_true', help='递归子目录')
+    recognize.add_argument('-w', '--workers', type=int, default=4, help='并发识别数')
+    recognize.add_argument('--user', help='历史记录所属用户 ID，默认图形界面当前用户')
+    recognize.add_argument('--no-history', action='store_true', help='不写入历史记录')
+    recognize.set_defaults(func=cmd_recognize)
+
+    watch = subparsers.add_parser('watch', help='监视文件夹，自动识别新增的图片')
+    watch.add_argument('directory', help='监视的目录')
+    watch.add_argument('-r', '--recursive', action='store_true', help='包含子目录')
+    watch.add_argument('-w', '--workers', type=int, default=2, help='并发识别数')
+    watch.add_argument('--interval', type=float, default=1.0, help='扫描间隔（秒）')
+    watch.add_argument('--settle', type=float, default=1.0, help='文件停止写入多少秒后才识别')
+    watch.add_argument('--checkpoint', default='app/data/watch_checkpoint.db', help='已处理文件记录的保存位置')
+    watch.add_argument('--skip-existing', action='store_true', help='忽略启动时目录中已有的图片')
+    watch.add_argument('--user', help='历史记录所属用户 ID，默认图形界面当前用户')
+    watch.add_argument('--no-history', action='store_true', help='不写入历史记录')
+    watch.set_defaults(func=cmd_watch)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    # 标准输出只留给 JSON 结果，各模块的日志输出改写到标准错误
+    stdout = sys.stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        return args.func(args, stdout)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,216 @@
+# coding: utf-8
+import glob
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from .image_payload import ImagePayload
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+def iter_image_paths(source, recursive=False):
+    """
+    展开批量识别的输入
+    Args:
+        source: 目录、glob 通配符或文件路径列表
+        recursive: 目录输入时是否递归子目录
+    Returns:
+        generator: 按文件名排序的图片路径
+    """
+    if isinstance(source, (list, tuple)):
+        yield from source
+        return
+
+    if os.path.isdir(source):
+        if recursive:
+            for root, dirs, files in os.walk(source):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(IMAGE_EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            with os.scandir(source) as entries:
+                names = sorted(e.name for e in entries
+                               if e.is_file() and e.name.lower().endswith(IMAGE_EXTENSIONS))
+            for name in names:
+                yield os.path.join(source, name)
+        return
+
+    for path in sorted(glob.iglob(source, recursive=recursive)):
+        if os.path.isfile(path):
+            yield path
+
+
+def read_image(path):
+    """读取图片为 BGR 数组（兼容非 ASCII 路径）"""
+    data = np.fromfile(path, dtype=np.uint8)
+    image = cv2.imdecode(data, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f'无法解码图片: {path}')
+    return image
+
+
+class BatchProgress:
+    """批量识别进度与吞吐统计"""
+
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.started = time.monotonic()
+
+    def throughput(self):
+        """每秒完成的图片数"""
+        elapsed = time.monotonic() - self.started
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def eta(self):
+        """预计剩余秒数，尚无法估计时返回 None"""
+        rate = self.throughput()
+        if not rate:
+            return None
+        return (self.total - self.done) / rate
+
+    def snapshot(self):
+        return {
+            'total': self.total,
+            'done': self.done,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'throughput': self.throughput(),
+            'eta': self.eta(),
+            'elapsed': time.monotonic() - self.started
+        }
+
+
+class BatchRecognizer:
+    """批量识别引擎：解码 → 预处理 → 识别 → 保存记录，有界并发、流式写出结果"""
+
+    def __init__(self, service, db, workers=4, max_pending=None, output_path=None,
+                 user_id=None, preprocess=None, progress_callback=None):
+        """
+        Args:
+            service: BaseOcrService 识别服务
+            db: DatabaseManager 数据库管理器，为 None 时不写历史记录
+            workers: 并发工作线程数
+            max_pending: 同时在途（已读取未完成）的最大图片数，默认 workers * 2
+            output_path: JSON Lines 结果文件，逐条追加写入
+            user_id: 历史记录所属用户，None 表示当前用户
+            preprocess: 可选的图像预处理函数 image -> image
+            progress_callback: 每完成一张图片调用 callback(snapshot, item)
+        """
+        self.service = service
+        self.db = db
+        self.workers = workers
+        self.max_pending = max_pending or workers * 2
+        self.output_path = output_path
+        self.user_id = user_id
+        self.preprocess = preprocess
+        self.progress_callback = progress_callback
+        self.progress = None
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._output = None
+
+    def cancel(self):
+        """停止提交新图片，已在途的图片会处理完"""
+        self._cancelled.set()
+
+    def process_file(self, path):
+        """
+        处理单张图片
+        Returns:
+            dict: 识别结果，附带 path 和 record_id
+        """
+        image = read_image(path)
+        if self.preprocess is not None:
+            image = self.preprocess(image)
+
+        payload = ImagePayload(image)
+        result = self.service.recognize(payload)
+        item = {
+            'path': path,
+            'status': result['status'],
+            'latex': result['latex'],
+            'confidence': result['confidence'],
+            'request_id': result['request_id'],
+            'message': result['message'],
+            'retryable': result.get('retryable', False),
+            'record_id': None
+        }
+        if result['status'] and self.db is not None:
+            item['record_id'] = self.db.add_record(
+                payload.png(),
+                result['latex'],
+                result['confidence'],
+                result['request_id'],
+                user_id=self.user_id,
+                thumbnail=payload.thumbnail()
+            )
+        return item
+
+    def _on_done(self, path, future):
+        try:
+            item = future.result()
+        except Exception as e:
+            item = {'path': path, 'status': False, 'latex': None, 'confidence': 0,
+                    'request_id': None, 'message': str(e), 'record_id': None}
+
+        with self._lock:
+            self.progress.done += 1
+            if item['status']:
+                self.progress.succeeded += 1
+            else:
+                self.progress.failed += 1
+            if self._output is not None:
+                self._output.write(json.dumps(item, ensure_ascii=False) + '\n')
+                self._output.flush()
+            snapshot = self.progress.snapshot()
+
+        if self.progress_callback is not None:
+            self.progress_callback(snapshot, item)
+
+    def _release(self, path, future, slots):
+        try:
+            self._on_done(path, future)
+        finally:
+            slots.release()
+
+    def run(self, source, recursive=False):
+        """
+        执行批量识别（阻塞直到完成或取消）
+        Args:
+            source: 目录、glob 通配符或文件路径列表
+            recursive: 目录/通配符输入时是否递归
+        Returns:
+            dict: 最终进度快照
+        """
+        paths = list(iter_image_paths(source, recursive))
+        self.progress = BatchProgress(len(paths))
+        # 背压：在途图片数达到上限时阻塞提交，保证内存占用与任务总量无关
+        slots = threading.BoundedSemaphore(self.max_pending)
+
+        if self.output_path:
+            self._output = open(self.output_path, 'a', encoding='utf-8')
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='BatchOcr') as executor:
+                for path in paths:
+                    slots.acquire()
+                    if self._cancelled.is_set():
+                        slots.release()
+                        break
+                    future = executor.submit(self.process_file, path)
+                    future.add_done_callback(lambda f, p=path: self._release(p, f, slots))
+        finally:
+            if self._output is not None:
+                self._output.close()
+                self._output = None
+
+        return self.progress.snapshot()
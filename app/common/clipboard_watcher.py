@@ -0,0 +1,160 @@
+# coding: utf-8
+import threading
+from collections import OrderedDict
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from PyQt5.QtWidgets import QApplication
+
+from .recognition_task import RecognitionTask, recognitionPool
+
+
+class RecentDigests:
+    """最近识别过的图片像素摘要（LRU，线程安全）"""
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self._digests = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, digest):
+        """
+        记录摘要
+        Returns:
+            bool: 摘要此前未出现过时为 True
+        """
+        with self._lock:
+            if digest in self._digests:
+                self._digests.move_to_end(digest)
+                return False
+            self._digests[digest] = None
+            if len(self._digests) > self.capacity:
+                self._digests.popitem(last=False)
+            return True
+
+    def discard(self, digest):
+        """移除摘要（识别未成功时，再次复制同一图片仍会识别）"""
+        with self._lock:
+            self._digests.pop(digest, None)
+
+
+class ClipboardRecognitionTask(RecognitionTask):
+    """ 剪贴板图片的识别任务，与最近识别过的图片像素相同时跳过 """
+
+    def __init__(self, service, db, image, seen, generation, index=None, offline_queue=None):
+        """
+        Args:
+            seen: RecentDigests 最近识别过的图片
+            generation: 创建任务时剪贴板的变更序号
+        """
+        super().__init__(service, db, image, index, offline_queue=offline_queue)
+        self.seen = seen
+        self.generation = generation
+        self.digest = None
+
+    def _accept(self, payload):
+        # 识别前就记录摘要，识别期间重复触发的复制事件直接跳过；识别未成功时由监视器移除
+        self.digest = payload.digest
+        return self.seen.add(self.digest)
+
+
+class ClipboardWatcher(QObject):
+    """
+    剪贴板监视：复制新图片后自动在后台识别并保存到历史记录
+
+    界面线程只负责取出剪贴板图片，像素摘要、查重、识别和写库都在识别线程池中完成。
+    """
+
+    recognized = pyqtSignal(dict)    # 识别结果（含 record_id）
+    failed = pyqtSignal(str)         # 失败原因
+    deferred = pyqtSignal(int, str)  # 已加入离线队列 (占位记录 ID, 失败原因)
+
+    # 部分平台一次复制会连续触发多次 dataChanged，合并到最后一次再读取
+    DEBOUNCE_MS = 50
+
+    def __init__(self, service, db, index=None, offline_queue=None, write_back=False, parent=None):
+        """
+        Args:
+            service: BaseOcrService 识别服务
+            db: DatabaseManager 数据库管理器
+            index: DuplicateIndex 相似图片索引，为 None 时不查重
+            offline_queue: OfflineQueue 离线队列，为 None 时网络错误直接报错
+            write_back: 识别成功后是否把 LaTeX 写回剪贴板
+        """
+        super().__init__(parent)
+        self.service = service
+        self.db = db
+        self.index = index
+        self.offline_queue = offline_queue
+        self.write_back = write_back
+        self.seen = RecentDigests()
+        self.tasks = {}
+        self.generation = 0  # 剪贴板变更序号，用于判断写回时剪贴板内容是否已被替换
+        self.enabled = False
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.DEBOUNCE_MS)
+        self.timer.timeout.connect(self._capture)
+
+    def setEnabled(self, enabled):
+        """开启或关闭监视"""
+        if enabled == self.enabled:
+            return
+        self.enabled = enabled
+        clipboard = QApplication.clipboard()
+        if enabled:
+            clipboard.dataChanged.connect(self._onDataChanged)
+        else:
+            clipboard.dataChanged.disconnect(self._onDataChanged)
+            self.timer.stop()
+
+    def setWriteBack(self, enabled):
+        self.write_back = enabled
+
+    def _onDataChanged(self):
+        self.generation += 1
+        self.timer.start()
+
+    def _capture(self):
+        clipboard = QApplication.clipboard()
+        # 本程序自己写入的内容（复制结果、复制渲染图片）不识别
+        if clipboard.ownsClipboard() or not clipboard.mimeData().hasImage():
+            return
+        image = clipboard.image()
+        if image.isNull():
+            return
+
+        task = ClipboardRecognitionTask(
+            self.service, self.db, image, self.seen, self.generation,
+            self.index, self.offline_queue
+        )
+        task.signals.finished.connect(self._onFinished)
+        task.signals.failed.connect(self._onFailed)
+        task.signals.deferred.connect(self._onDeferred)
+        task.signals.cancelled.connect(self._onCancelled)
+        self.tasks[task.id] = task
+        recognitionPool.start(task)
+
+    def _onFinished(self, task_id, result):
+        task = self.tasks.pop(task_id, None)
+        # 识别期间用户又复制了其他内容时不覆盖剪贴板
+        if self.write_back and task is not None and task.generation == self.generation:
+            QApplication.clipboard().setText(result['latex'])
+        self.recognized.emit(result)
+
+    def _forget(self, task_id):
+        """识别未成功：移除任务，并允许再次复制同一图片时重新识别"""
+        task = self.tasks.pop(task_id, None)
+        if task is not None and task.digest is not None:
+            self.seen.discard(task.digest)
+
+    def _onFailed(self, task_id, message):
+        self._forget(task_id)
+        self.failed.emit(message)
+
+    def _onDeferred(self, task_id, record_id, message):
+        self._forget(task_id)
+        self.deferred.emit(record_id, message)
+
+    def _onCancelled(self, task_id):
+        # 与最近识别过的图片相同
+        self.tasks.pop(task_id, None)
@@ -7,6 +7,8 @@ from qfluentwidgets import (qconfig, QConfig, ConfigItem, OptionsConfigItem, Boo
                             OptionsValidator, RangeConfigItem, RangeValidator,
                             FolderListValidator, Theme, FolderValidator, ConfigSerializer, __version__)
 
+from .settings import LATEX_OCR_DEFAULTS
+
 
 class Language(Enum):
     """ Language enumeration """
@@ -66,9 +68,40 @@ class Config(QConfig):
 
 
     # LatexOCR
-    type = OptionsConfigItem("LatexOCR", "Type", "simpletex", OptionsValidator(["Simpletex"]))
-    api_url = ConfigItem("LatexOCR", "ApiUrl", "https://server.simpletex.cn/api/latex_ocr", NonEmptyStringValidator())
-    token = ConfigItem("LatexOCR", "Token", "abc" * 10, NonEmptyStringValidator())
+    type = OptionsConfigItem("LatexOCR", "Type", LATEX_OCR_DEFAULTS["Type"], OptionsValidator(["Simpletex"]))
+    api_url = ConfigItem("LatexOCR", "ApiUrl", LATEX_OCR_DEFAULTS["ApiUrl"], NonEmptyStringValidator())
+    token = ConfigItem("LatexOCR", "Token", LATEX_OCR_DEFAULTS["Token"], NonEmptyStringValidator())
+    connectTimeout = RangeConfigItem("LatexOCR", "ConnectTimeout", LATEX_OCR_DEFAULTS["ConnectTimeout"], RangeValidator(1, 60))
+    readTimeout = RangeConfigItem("LatexOCR", "ReadTimeout", LATEX_OCR_DEFAULTS["ReadTimeout"], RangeValidator(1, 300))
+    poolSize = RangeConfigItem("LatexOCR", "PoolSize", LATEX_OCR_DEFAULTS["PoolSize"], RangeValidator(1, 32), restart=True)
+    cacheEnabled = ConfigItem("LatexOCR", "CacheEnabled", LATEX_OCR_DEFAULTS["CacheEnabled"], BoolValidator(), restart=True)
+    cacheMaxEntries = RangeConfigItem("LatexOCR", "CacheMaxEntries", LATEX_OCR_DEFAULTS["CacheMaxEntries"], RangeValidator(100, 100000), restart=True)
+    cacheMaxAgeDays = RangeConfigItem("LatexOCR", "CacheMaxAgeDays", LATEX_OCR_DEFAULTS["CacheMaxAgeDays"], RangeValidator(1, 365), restart=True)
+    duplicateLookupEnabled = ConfigItem("LatexOCR", "DuplicateLookupEnabled", LATEX_OCR_DEFAULTS["DuplicateLookupEnabled"], BoolValidator(), restart=True)
+    duplicateThreshold = RangeConfigItem("LatexOCR", "DuplicateThreshold", LATEX_OCR_DEFAULTS["DuplicateThreshold"], RangeValidator(0, 16))
+    batchWorkers = RangeConfigItem("LatexOCR", "BatchWorkers", LATEX_OCR_DEFAULTS["BatchWorkers"], RangeValidator(1, 16))
+    pageWorkers = RangeConfigItem("LatexOCR", "PageWorkers", LATEX_OCR_DEFAULTS["PageWorkers"], RangeValidator(1, 16))
+    preprocessEnabled = ConfigItem("LatexOCR", "PreprocessEnabled", LATEX_OCR_DEFAULTS["PreprocessEnabled"], BoolValidator(), restart=True)
+    preprocessBinarize = ConfigItem("LatexOCR", "PreprocessBinarize", LATEX_OCR_DEFAULTS["PreprocessBinarize"], BoolValidator(), restart=True)
+    targetGlyphHeight = RangeConfigItem("LatexOCR", "TargetGlyphHeight", LATEX_OCR_DEFAULTS["TargetGlyphHeight"], RangeValidator(0, 200), restart=True)
+    pngCompression = RangeConfigItem("LatexOCR", "PngCompression", LATEX_OCR_DEFAULTS["PngCompression"], RangeValidator(0, 9), restart=True)
+    dailyQuota = RangeConfigItem("LatexOCR", "DailyQuota", LATEX_OCR_DEFAULTS["DailyQuota"], RangeValidator(0, 100000))
+    requestsPerMinute = RangeConfigItem("LatexOCR", "RequestsPerMinute", LATEX_OCR_DEFAULTS["RequestsPerMinute"], RangeValidator(1, 600))
+    rateBurst = RangeConfigItem("LatexOCR", "RateBurst", LATEX_OCR_DEFAULTS["RateBurst"], RangeValidator(1, 20))
+    retryMaxAttempts = RangeConfigItem("LatexOCR", "RetryMaxAttempts", LATEX_OCR_DEFAULTS["RetryMaxAttempts"], RangeValidator(1, 10), restart=True)
+    circuitFailureThreshold = RangeConfigItem("LatexOCR", "CircuitFailureThreshold", LATEX_OCR_DEFAULTS["CircuitFailureThreshold"], RangeValidator(1, 50), restart=True)
+    circuitRecoverySeconds = RangeConfigItem("LatexOCR", "CircuitRecoverySeconds", LATEX_OCR_DEFAULTS["CircuitRecoverySeconds"], RangeValidator(5, 600), restart=True)
+    hedgeEnabled = ConfigItem("LatexOCR", "HedgeEnabled", LATEX_OCR_DEFAULTS["HedgeEnabled"], BoolValidator(), restart=True)
+    hedgeDelayMs = RangeConfigItem("LatexOCR", "HedgeDelayMs", LATEX_OCR_DEFAULTS["HedgeDelayMs"], RangeValidator(50, 10000), restart=True)
+    hedgeMode = OptionsConfigItem("LatexOCR", "HedgeMode", LATEX_OCR_DEFAULTS["HedgeMode"], OptionsValidator(["first", "best"]), restart=True)
+    hedgeProviders = ConfigItem("LatexOCR", "HedgeProviders", LATEX_OCR_DEFAULTS["HedgeProviders"], restart=True)
+    schedulerWorkers = RangeConfigItem("LatexOCR", "SchedulerWorkers", LATEX_OCR_DEFAULTS["SchedulerWorkers"], RangeValidator(1, 32), restart=True)
+    bulkConcurrency = RangeConfigItem("LatexOCR", "BulkConcurrency", LATEX_OCR_DEFAULTS["BulkConcurrency"], RangeValidator(1, 32), restart=True)
+    offlineQueueEnabled = ConfigItem("LatexOCR", "OfflineQueueEnabled", LATEX_OCR_DEFAULTS["OfflineQueueEnabled"], BoolValidator(), restart=True)
+    tracingEnabled = ConfigItem("LatexOCR", "TracingEnabled", LATEX_OCR_DEFAULTS["TracingEnabled"], BoolValidator())
+    traceEventsEnabled = ConfigItem("LatexOCR", "TraceEventsEnabled", LATEX_OCR_DEFAULTS["TraceEventsEnabled"], BoolValidator())
+    clipboardWatchEnabled = ConfigItem("LatexOCR", "ClipboardWatchEnabled", LATEX_OCR_DEFAULTS["ClipboardWatchEnabled"], BoolValidator())
+    clipboardWriteBack = ConfigItem("LatexOCR", "ClipboardWriteBack", LATEX_OCR_DEFAULTS["ClipboardWriteBack"], BoolValidator())
 
 YEAR = 2025
 AUTHOR = "andy"
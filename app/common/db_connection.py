@@ -0,0 +1,239 @@
+# coding: utf-8
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# 每个连接打开后执行的参数：WAL 下 NORMAL 同步只在检查点时 fsync，崩溃不会损坏数据库，
+# 最多丢失最近提交的事务；页缓存 16 MB（负数单位为 KiB），读通过 256 MB 内存映射
+CONNECTION_PRAGMAS = (
+    ('busy_timeout', 5000),
+    ('synchronous', 'NORMAL'),
+    ('cache_size', -16000),
+    ('mmap_size', 256 * 1024 * 1024),
+    ('temp_store', 'MEMORY'),
+)
+
+# 预编译语句缓存的条目数（sqlite3 默认 128）
+STATEMENT_CACHE_SIZE = 256
+
+# 读连接池上限：每个连接各有页缓存和内存映射，短命线程不再各自占用一个连接
+MAX_READERS = 4
+
+# 出现这些异常说明连接本身已不可用，丢弃后下次使用时重新打开
+_BROKEN_ERRORS = (sqlite3.ProgrammingError, sqlite3.InterfaceError)
+
+
+class ConnectionManager:
+    """
+    SQLite 长连接管理
+
+    - 写：全进程共用一个写连接，由锁串行化，每次 write() 是一个 BEGIN IMMEDIATE 事务
+    - 读：最多 max_readers 个只读连接组成的池，read() 借出、退出时归还，WAL 模式下读不阻塞写
+    - 连接只打开一次，参数调优和预编译语句缓存随连接复用；fork 后或连接失效时自动重建
+    """
+
+    def __init__(self, db_path, max_readers=MAX_READERS):
+        self.db_path = db_path
+        self.max_readers = max_readers
+        self._write_lock = threading.RLock()
+        self._writer = None
+        self._local = threading.local()  # 当前线程借出的读连接，嵌套的 read() 复用它
+        self._readers = []  # 池中所有读连接（含已借出的）
+        self._idle = []  # 空闲的读连接
+        self._readers_cond = threading.Condition()
+        self._pid = os.getpid()
+        self._functions = {}  # name -> (参数个数, 函数)
+
+    def connect(self, readonly=False):
+        """打开一个调优后的新连接（自动提交模式，事务由调用方显式控制）"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=5,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
+        for name, value in CONNECTION_PRAGMAS:
+            conn.execute(f'PRAGMA {name} = {value}')
+        for name, (num_params, func) in self._functions.items():
+            conn.create_function(name, num_params, func, deterministic=True)
+        if readonly:
+            conn.execute('PRAGMA query_only = 1')
+        else:
+            conn.execute('PRAGMA journal_mode = WAL')
+        return conn
+
+    def register_function(self, name, num_params, func):
+        """
+        注册 SQL 函数（触发器中调用的函数必须在所有写连接上可用），已打开的连接同时生效
+        Args:
+            name: SQL 中的函数名
+            num_params: 参数个数
+            func: 确定性的 Python 函数
+        """
+        self._functions[name] = (num_params, func)
+        with self._write_lock:
+            connections = [self._writer] if self._writer is not None else []
+        with self._readers_cond:
+            connections += self._readers
+        for conn in connections:
+            conn.create_function(name, num_params, func, deterministic=True)
+
+    def _check_fork(self):
+        # 子进程不能继续使用父进程打开的连接
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._writer = None
+            self._local = threading.local()
+            self._readers = []
+            self._idle = []
+
+    @staticmethod
+    def _healthy(conn):
+        try:
+            conn.total_changes  # 已关闭的连接会抛出 ProgrammingError
+            return True
+        except sqlite3.Error:
+            return False
+
+    @contextmanager
+    def write(self):
+        """
+        获取写连接并开启事务，正常退出时提交，异常时回滚
+        用法：
+            with manager.write() as conn:
+                conn.execute(...)
+        """
+        with self._write_lock:
+            self._check_fork()
+            if self._writer is None or not self._healthy(self._writer):
+                self._writer = self.connect()
+            conn = self._writer
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException as e:
+                try:
+                    conn.execute('ROLLBACK')
+                except sqlite3.Error:
+                    pass
+                if isinstance(e, _BROKEN_ERRORS):
+                    self._discard(conn)
+                    self._writer = None
+                raise
+            else:
+                conn.execute('COMMIT')
+
+    @contextmanager
+    def read(self):
+        """从池中借出一个只读连接，退出 with 块时归还；池满时等待其他线程归还"""
+        self._check_fork()
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            # 同一线程嵌套读取（如遍历生成器期间再查询）复用已借出的连接，避免池满时自锁
+            yield held
+            return
+
+        conn = self._checkout()
+        self._local.conn = conn
+        broken = False
+        try:
+            yield conn
+        except _BROKEN_ERRORS:
+            broken = True
+            raise
+        finally:
+            self._local.conn = None
+            if broken:
+                self._discard(conn)
+            else:
+                self._checkin(conn)
+
+    def _checkout(self):
+        while True:
+            with self._readers_cond:
+                while not self._idle and len(self._readers) >= self.max_readers:
+                    self._readers_cond.wait()
+                if self._idle:
+                    conn = self._idle.pop()
+                else:
+                    conn = self.connect(readonly=True)
+                    self._readers.append(conn)
+            if self._healthy(conn):
+                return conn
+            self._discard(conn)
+
+    def _checkin(self, conn):
+        with self._readers_cond:
+            if conn in self._readers:
+                self._idle.append(conn)
+                self._readers_cond.notify()
+                return
+        # 借出期间连接池已被 close()，直接关闭
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def _discard(self, conn):
+        with self._readers_cond:
+            if conn in self._readers:
+                self._readers.remove(conn)
+            if conn in self._idle:
+                self._idle.remove(conn)
+            self._readers_cond.notify()
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def check(self):
+        """
+        健康检查
+        Returns:
+            bool: 数据库可读写且完整性检查通过
+        """
+        try:
+            with self.read() as conn:
+                ok = conn.execute('PRAGMA quick_check').fetchone()[0] == 'ok'
+            with self.write() as conn:
+                conn.execute('SELECT 1')
+            return ok
+        except sqlite3.Error as e:
+            print(f"数据库健康检查失败: {e}")
+            return False
+
+    def close(self):
+        """关闭所有连接（退出前调用）"""
+        with self._write_lock:
+            if self._writer is not None:
+                try:
+                    self._writer.execute('PRAGMA optimize')
+                except sqlite3.Error:
+                    pass
+                self._discard(self._writer)
+                self._writer = None
+        with self._readers_cond:
+            readers, self._readers, self._idle = self._readers, [], []
+            self._readers_cond.notify_all()
+        for conn in readers:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_connection_manager(db_path):
+    """同一个数据库文件在进程内共用一个 ConnectionManager，保证只有一个写连接"""
+    key = os.path.abspath(db_path)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = _managers[key] = ConnectionManager(db_path)
+        return manager
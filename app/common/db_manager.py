@@ -1,239 +1,682 @@
 import sqlite3
 import base64
+import threading
+import time
+import uuid
 from datetime import datetime
 import os
-from ..common.user_manager import userManager
+from ..common.db_connection import get_connection_manager
+from ..common.latex_search import FTS_TOKENIZE, FTS_VERSION, build_match_query, latex_tokens
+from ..common.thumbnail import thumbnail_from_png
+from ..common.tracing import tracer
+
+# 离线补识别失败的占位记录的 request_id 前缀
+FAILED_REQUEST_PREFIX = 'failed-'
+
+# 全文索引命中不超过该数量时按相关度排序，否则按时间倒序
+RANKED_SEARCH_LIMIT = 1000
+# 按相关度排序时游标的首个元素，用于区分两种游标
+RANKED_CURSOR = 'rank'
+
+
+def _user_manager():
+    """延迟导入用户管理器（依赖 Qt），命令行等无界面调用方应显式传入 user_id"""
+    from ..common.user_manager import userManager
+    return userManager
+
+
+def decode_image(image_blob, image_data):
+    """
+    取出记录中的 PNG 字节：已迁移的记录存于 image_blob，旧记录为 image_data 中的 base64 文本
+    Returns:
+        bytes: 图片数据，无法解码时为空
+    """
+    if image_blob:
+        return bytes(image_blob)
+    if image_data:
+        try:
+            return base64.b64decode(image_data)
+        except (ValueError, TypeError):
+            return b''
+    return b''
+
 
 class DatabaseManager:
     def __init__(self, db_path='app/data/history.db'):
         self.db_path = db_path
         # 确保数据库目录存在
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        # 长连接：一个写连接 + 每线程一个读连接（WAL）
+        self.connections = get_connection_manager(self.db_path)
+        # 全文索引触发器中调用，需在建表前注册
+        self.connections.register_function('latex_tokens', 1, latex_tokens)
+        self.search_ready = False  # 全文索引已覆盖所有记录，可代替 LIKE 搜索
         self.init_db()
 
     def init_db(self):
         """初始化数据库"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # 检查历史记录表是否已存在
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='history'")
-            table_exists = cursor.fetchone()
-            
-            if not table_exists:
-                # 创建包含user_id的新历史记录表
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS history (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        timestamp DATETIME NOT NULL,
-                        image_data TEXT NOT NULL,
-                        latex_result TEXT NOT NULL,
-                        confidence REAL NOT NULL,
-                        request_id TEXT NOT NULL,
-                        user_id TEXT NOT NULL,
-                        UNIQUE(request_id)
-                    )
-                ''')
-            else:
-                # 检查表中是否已有user_id列
-                try:
-                    cursor.execute("SELECT user_id FROM history LIMIT 1")
-                except sqlite3.OperationalError:
-                    # 如果没有user_id列，添加它
-                    cursor.execute("ALTER TABLE history ADD COLUMN user_id TEXT")
-                    # 将现有记录更新为默认用户ID
-                    cursor.execute("UPDATE history SET user_id = 'default' WHERE user_id IS NULL")
-                    print("已将user_id列添加到history表并更新现有记录")
-            
-            conn.commit()
+            with self.connections.write() as conn:
+                self._migrate(conn.cursor())
         except sqlite3.Error as e:
             print(f"数据库初始化错误: {e}")
-        finally:
-            if conn:
-                conn.close()
-
-    def add_record(self, image_data, latex_result, confidence, request_id, user_id=None):
-        """添加记录"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+
+    def _migrate(self, cursor):
+        """建表，并为旧版本数据库补齐新增的列"""
+        # 检查历史记录表是否已存在
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='history'")
+        table_exists = cursor.fetchone()
         
-        # 将图片转换为base64
-        if isinstance(image_data, bytes):
-            image_base64 = base64.b64encode(image_data).decode('utf-8')
+        if not table_exists:
+            # 创建包含user_id的新历史记录表
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp DATETIME NOT NULL,
+                    image_data TEXT NOT NULL DEFAULT '',
+                    latex_result TEXT NOT NULL,
+                    confidence REAL NOT NULL,
+                    request_id TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    phash INTEGER,
+                    image_blob BLOB,
+                    UNIQUE(request_id)
+                )
+            ''')
         else:
-            image_base64 = image_data
-            
+            # 检查表中是否已有user_id列
+            try:
+                cursor.execute("SELECT user_id FROM history LIMIT 1")
+            except sqlite3.OperationalError:
+                # 如果没有user_id列，添加它
+                cursor.execute("ALTER TABLE history ADD COLUMN user_id TEXT")
+                # 将现有记录更新为默认用户ID
+                cursor.execute("UPDATE history SET user_id = 'default' WHERE user_id IS NULL")
+                print("已将user_id列添加到history表并更新现有记录")
+
+            # 检查表中是否已有phash列（感知哈希，用于相似图片查找）
+            columns = [row[1] for row in cursor.execute("PRAGMA table_info(history)")]
+            if 'phash' not in columns:
+                cursor.execute("ALTER TABLE history ADD COLUMN phash INTEGER")
+            # 图片改为 BLOB 存储，旧记录由 migrate_images 在后台逐批转换
+            if 'image_blob' not in columns:
+                cursor.execute("ALTER TABLE history ADD COLUMN image_blob BLOB")
+
+        # 按用户分页的复合索引，与 ORDER BY timestamp DESC, id DESC 一致，翻页时按索引定位无需排序
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_history_user_time
+            ON history (user_id, timestamp DESC, id DESC)
+        ''')
+
+        self._create_search_index(cursor)
+
+        # 缩略图单独成表：列表页只读小图，不经过原图所在的溢出页
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS thumbnails (
+                id INTEGER PRIMARY KEY,
+                data BLOB NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS history_thumbnail_delete AFTER DELETE ON history
+            BEGIN
+                DELETE FROM thumbnails WHERE id = old.id;
+            END
+        ''')
+
+    def _create_search_index(self, cursor):
+        """
+        创建 LaTeX 全文索引（FTS5），由触发器与 history 保持同步；已有记录由 backfill_search_index 补建
+        SQLite 未编译 FTS5 时跳过，搜索回退到 LIKE；分词规则变化（FTS_VERSION 不同）时删除旧索引重建
+        """
+        cursor.execute("CREATE TABLE IF NOT EXISTS history_meta (key TEXT PRIMARY KEY, value)")
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='history_fts'")
+        if cursor.fetchone():
+            cursor.execute("SELECT value FROM history_meta WHERE key='fts_version'")
+            row = cursor.fetchone()
+            # 未记录版本的索引由第一版分词规则建立
+            if (row[0] if row else 1) == FTS_VERSION:
+                return
+            for trigger in ('history_fts_insert', 'history_fts_delete', 'history_fts_update'):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            cursor.execute("DROP TABLE history_fts")
+            print("全文索引分词规则已更新，将在后台重建")
         try:
-            # 如果没有提供user_id，使用当前用户ID
-            if user_id is None:
-                current_user = userManager.get_current_user()
-                user_id = current_user['id'] if current_user else 'default'
-                
-            cursor.execute('''
-                INSERT INTO history (timestamp, image_data, latex_result, confidence, request_id, user_id)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (datetime.now(), image_base64, latex_result, confidence, request_id, user_id))
-            conn.commit()
-            # 获取新插入记录的ID
-            record_id = cursor.lastrowid
-            print(f"Added new record with ID: {record_id}")
-            return record_id  # 返回新记录的ID
-        except sqlite3.IntegrityError:
-            # 如果request_id已存在，则更新记录
-            # 如果没有提供user_id，使用当前用户ID
-            if user_id is None:
-                current_user = userManager.get_current_user()
-                user_id = current_user['id'] if current_user else 'default'
-                
-            cursor.execute('''
-                UPDATE history 
-                SET timestamp=?, image_data=?, latex_result=?, confidence=?, user_id=?
-                WHERE request_id=?
-            ''', (datetime.now(), image_base64, latex_result, confidence, user_id, request_id))
-            conn.commit()
-            # 获取更新记录的ID
-            cursor.execute('SELECT id FROM history WHERE request_id=?', (request_id,))
-            record_id = cursor.fetchone()[0]
-            print(f"Updated existing record with ID: {record_id}")
-            return record_id  # 返回更新记录的ID
-        finally:
-            conn.close()
+            cursor.execute(f'''
+                CREATE VIRTUAL TABLE history_fts USING fts5(
+                    tokens,
+                    tokenize="{FTS_TOKENIZE}",
+                    prefix='2 3'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            print(f"全文索引不可用，搜索将使用 LIKE: {e}")
+            return
+        cursor.execute('''
+            CREATE TRIGGER history_fts_insert AFTER INSERT ON history
+            BEGIN
+                INSERT INTO history_fts (rowid, tokens) VALUES (new.id, latex_tokens(new.latex_result));
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER history_fts_delete AFTER DELETE ON history
+            BEGIN
+                DELETE FROM history_fts WHERE rowid = old.id;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER history_fts_update AFTER UPDATE OF latex_result ON history
+            BEGIN
+                DELETE FROM history_fts WHERE rowid = old.id;
+                INSERT INTO history_fts (rowid, tokens) VALUES (new.id, latex_tokens(new.latex_result));
+            END
+        ''')
+        # 建表前已有的记录（id 不超过 until）需要补建索引，last 记录补建进度
+        cursor.execute('''
+            INSERT OR REPLACE INTO history_meta (key, value)
+            VALUES ('fts_backfill_until', (SELECT IFNULL(MAX(id), 0) FROM history)), ('fts_backfill_last', 0),
+                   ('fts_version', ?)
+        ''', (FTS_VERSION,))
 
+    def _search_progress(self, conn):
+        """返回全文索引补建进度 (last, until)，没有全文索引时为 None"""
+        rows = dict(conn.execute(
+            "SELECT key, value FROM history_meta WHERE key IN ('fts_backfill_last', 'fts_backfill_until')"
+        ).fetchall())
+        if len(rows) != 2:
+            return None
+        return rows['fts_backfill_last'], rows['fts_backfill_until']
+
+    def is_search_ready(self):
+        """全文索引是否已覆盖所有记录（补建完成前搜索使用 LIKE，结果不会遗漏）"""
+        if not self.search_ready:
+            with self.connections.read() as conn:
+                progress = self._search_progress(conn)
+            self.search_ready = progress is not None and progress[0] >= progress[1]
+        return self.search_ready
+
+    def backfill_search_index(self, batch_size=500, pause=0.02, stop_event=None):
+        """
+        为全文索引建立之前的记录逐批补建索引（进度保存在 history_meta，可随时中断，参数同 migrate_images）
+        Returns:
+            int: 本次补建的记录数
+        """
+        indexed = 0
+        while stop_event is None or not stop_event.is_set():
+            with self.connections.read() as conn:
+                progress = self._search_progress(conn)
+                if progress is None or progress[0] >= progress[1]:
+                    break
+                last_id, until = progress
+                rows = conn.execute('''
+                    SELECT id, latex_result FROM history
+                    WHERE id > ? AND id <= ? ORDER BY id LIMIT ?
+                ''', (last_id, until, batch_size)).fetchall()
+
+            items = [(record_id, latex_tokens(latex), record_id, record_id) for record_id, latex in rows]
+            with self.connections.write() as conn:
+                # 期间被修改的记录已由触发器建立索引，被删除的记录不再补建
+                conn.executemany('''
+                    INSERT INTO history_fts (rowid, tokens)
+                    SELECT ?, ?
+                    WHERE NOT EXISTS (SELECT 1 FROM history_fts WHERE rowid = ?)
+                      AND EXISTS (SELECT 1 FROM history WHERE id = ?)
+                ''', items)
+                conn.execute(
+                    "UPDATE history_meta SET value = ? WHERE key = 'fts_backfill_last'",
+                    (rows[-1][0] if rows else until,))
+            indexed += len(rows)
+            time.sleep(pause)
+        if indexed:
+            print(f"已为 {indexed} 条历史记录建立全文索引")
+        return indexed
+
+    @tracer.traced('db.add_record')
+    def add_record(self, image_data, latex_result, confidence, request_id, user_id=None, phash=None, thumbnail=None):
+        """
+        添加记录
+        Args:
+            image_data: PNG 字节，也接受 base64 文本
+            phash: 有符号 64 位感知哈希，可选
+            thumbnail: PNG 缩略图（见 thumbnail.make_thumbnail），未提供时由原图生成
+        """
+        # 图片以二进制直接写入 image_blob，image_data 仅保留给未迁移的旧记录
+        image_blob = image_data if isinstance(image_data, (bytes, bytearray, memoryview)) else base64.b64decode(image_data)
+        if thumbnail is None:
+            with tracer.span('db.thumbnail'):
+                thumbnail = thumbnail_from_png(image_blob)
+
+        # 如果没有提供user_id，使用当前用户ID
+        if user_id is None:
+            current_user = _user_manager().get_current_user()
+            user_id = current_user['id'] if current_user else 'default'
+
+        with self.connections.write() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute('''
+                    INSERT INTO history (timestamp, image_data, image_blob, latex_result, confidence, request_id, user_id, phash)
+                    VALUES (?, '', ?, ?, ?, ?, ?, ?)
+                ''', (datetime.now(), image_blob, latex_result, confidence, request_id, user_id, phash))
+                # 获取新插入记录的ID
+                record_id = cursor.lastrowid
+                print(f"Added new record with ID: {record_id}")
+            except sqlite3.IntegrityError:
+                # 如果request_id已存在，则更新记录
+                cursor.execute('''
+                    UPDATE history 
+                    SET timestamp=?, image_data='', image_blob=?, latex_result=?, confidence=?, user_id=?, phash=?
+                    WHERE request_id=?
+                ''', (datetime.now(), image_blob, latex_result, confidence, user_id, phash, request_id))
+                # 获取更新记录的ID
+                cursor.execute('SELECT id FROM history WHERE request_id=?', (request_id,))
+                record_id = cursor.fetchone()[0]
+                print(f"Updated existing record with ID: {record_id}")
+            if thumbnail is not None:
+                cursor.execute('INSERT OR REPLACE INTO thumbnails (id, data) VALUES (?, ?)', (record_id, thumbnail))
+        return record_id
+
+    @tracer.traced('db.get_records')
     def get_records(self, page=1, page_size=10, search_text=None, user_id=None):
         """获取记录（支持分页和搜索）"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # 构建查询条件
+        return self._query_page(page, page_size, search_text, user_id)
+
+    def _filters(self, search_text, user_id):
+        """构建用户和搜索条件，返回 (条件列表, 参数列表)"""
         where_clauses = []
         params = []
         
         # 如果未提供用户ID，使用当前用户ID
         if user_id is None:
-            current_user = userManager.get_current_user()
+            current_user = _user_manager().get_current_user()
             user_id = current_user['id'] if current_user else 'default'
         
         # 添加用户ID条件
         where_clauses.append("user_id = ?")
         params.append(user_id)
         
-        # 添加搜索条件
-        if search_text:
+        # 添加搜索条件：优先使用全文索引，输入中没有可索引的词元或索引未就绪时回退到 LIKE
+        match = self._search_match(search_text)
+        if match:
+            where_clauses.append("history.id IN (SELECT rowid FROM history_fts WHERE history_fts MATCH ?)")
+            params.append(match)
+        elif search_text:
             where_clauses.append("latex_result LIKE ?")
             params.append(f"%{search_text}%")
-        
+        return where_clauses, params
+
+    def _search_match(self, search_text):
+        """搜索文本对应的 FTS5 MATCH 表达式，不能使用全文索引时为 None"""
+        if not search_text or not self.is_search_ready():
+            return None
+        return build_match_query(search_text)
+
+    def _query_page(self, page, page_size, search_text, user_id, thumbnails=False):
+        where_clauses, params = self._filters(search_text, user_id)
         # 组合所有条件
         where_clause = f"WHERE {' AND '.join(where_clauses)}" if where_clauses else ""
-        
-        # 获取总记录数
-        count_sql = f"SELECT COUNT(*) FROM history {where_clause}"
-        cursor.execute(count_sql, params)
-        total_count = cursor.fetchone()[0]
-        
-        # 获取分页数据
-        offset = (page - 1) * page_size
-        sql = f"""
-            SELECT id, timestamp, image_data, latex_result, confidence, request_id 
-            FROM history {where_clause}
-            ORDER BY timestamp DESC
-            LIMIT ? OFFSET ?
-        """
-        cursor.execute(sql, params + [page_size, offset])
-        records = cursor.fetchall()
-        
-        conn.close()
-        
+
+        with self.connections.read() as conn:
+            # 获取总记录数
+            count_sql = f"SELECT COUNT(*) FROM history {where_clause}"
+            total_count = conn.execute(count_sql, params).fetchone()[0]
+
+            # 获取分页数据
+            offset = (page - 1) * page_size
+            if thumbnails:
+                sql = f"""
+                    SELECT history.id, timestamp, thumbnails.data, latex_result, confidence, request_id
+                    FROM history LEFT JOIN thumbnails ON thumbnails.id = history.id {where_clause}
+                    ORDER BY timestamp DESC, history.id DESC
+                    LIMIT ? OFFSET ?
+                """
+            else:
+                sql = f"""
+                    SELECT id, timestamp, image_blob, image_data, latex_result, confidence, request_id 
+                    FROM history {where_clause}
+                    ORDER BY timestamp DESC, id DESC
+                    LIMIT ? OFFSET ?
+                """
+            rows = conn.execute(sql, params + [page_size, offset]).fetchall()
+
+        if thumbnails:
+            return self._fill_thumbnails(rows), total_count
+        # 新旧两种存储格式统一返回 PNG 字节
+        records = [(row[0], row[1], decode_image(row[2], row[3])) + row[4:] for row in rows]
         return records, total_count
 
+    def _fill_thumbnails(self, rows):
+        """为尚未生成缩略图的旧记录补算并保存缩略图"""
+        missing = {row[0]: thumbnail_from_png(self.get_image(row[0])) for row in rows if row[2] is None}
+        if not missing:
+            return rows
+        generated = [(record_id, data) for record_id, data in missing.items() if data is not None]
+        if generated:
+            with self.connections.write() as conn:
+                conn.executemany('INSERT OR REPLACE INTO thumbnails (id, data) VALUES (?, ?)', generated)
+        return [
+            (row[0], row[1], missing.get(row[0]) or b'') + row[3:] if row[2] is None else row
+            for row in rows
+        ]
+
+    @tracer.traced('db.delete_record')
     def delete_record(self, record_id):
         """删除记录"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("DELETE FROM history WHERE id=?", (record_id,))
-        conn.commit()
-        conn.close()
+        with self.connections.write() as conn:
+            conn.execute("DELETE FROM history WHERE id=?", (record_id,))
 
+    @tracer.traced('db.clear_history')
     def clear_history(self, user_id=None):
         """清空历史记录"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         # 如果指定了用户ID，只清除该用户的历史记录
         if user_id is None:
-            current_user = userManager.get_current_user()
+            current_user = _user_manager().get_current_user()
             user_id = current_user['id'] if current_user else 'default'
-            
-        cursor.execute("DELETE FROM history WHERE user_id = ?", (user_id,))
-        conn.commit()
-        conn.close()
+
+        with self.connections.write() as conn:
+            conn.execute("DELETE FROM history WHERE user_id = ?", (user_id,))
 
     def get_connection(self):
-        """获取数据库连接"""
-        return sqlite3.connect(self.db_path)
+        """获取一个新的数据库连接（已调优、自动提交模式，调用方负责关闭）"""
+        return self.connections.connect()
+
+    def check(self):
+        """数据库健康检查"""
+        return self.connections.check()
 
+    def close(self):
+        """关闭长连接"""
+        self.connections.close()
+
+    @tracer.traced('db.update_latex')
     def update_latex(self, record_id, latex):
         """更新记录的 LaTeX 内容"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            sql = 'UPDATE history SET latex_result = ? WHERE id = ?'
-            params = (latex, record_id)
-            print(f"Executing SQL: {sql} with params: {params}")  # 打印SQL语句和参数
-            cursor.execute(sql, params)
-            conn.commit()
-            print(f"Rows affected: {cursor.rowcount}")  # 打印受影响的行数
-            conn.close()
+            with self.connections.write() as conn:
+                sql = 'UPDATE history SET latex_result = ? WHERE id = ?'
+                params = (latex, record_id)
+                print(f"Executing SQL: {sql} with params: {params}")  # 打印SQL语句和参数
+                cursor = conn.execute(sql, params)
+                print(f"Rows affected: {cursor.rowcount}")  # 打印受影响的行数
             return True
         except Exception as e:
             print(f"Error updating latex: {e}")
             return False 
 
+    @tracer.traced('db.get_history_records')
     def get_history_records(self, page=1, page_size=10, search_text=None, user_id=None):
-        """获取历史记录"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # 构建查询条件
-        where_clauses = []
-        params = []
-        
-        # 如果未提供用户ID，使用当前用户ID
-        if user_id is None:
-            current_user = userManager.get_current_user()
-            user_id = current_user['id'] if current_user else 'default'
-        
-        # 添加用户ID条件
-        where_clauses.append("user_id = ?")
-        params.append(user_id)
-        
-        # 添加搜索条件
-        if search_text:
-            where_clauses.append("latex_result LIKE ?")
-            params.append(f"%{search_text}%")
-        
-        # 组合所有条件
-        where_clause = f"WHERE {' AND '.join(where_clauses)}" if where_clauses else ""
-            
-        # 获取总记录数
-        count_sql = f"SELECT COUNT(*) FROM history {where_clause}"
-        cursor.execute(count_sql, params)
-        total_count = cursor.fetchone()[0]
-        
-        # 计算偏移量
-        offset = (page - 1) * page_size
-        
-        # 获取分页数据
+        """获取历史记录（用于列表显示，图片列为缩略图，原图通过 get_image 获取）"""
+        return self._query_page(page, page_size, search_text, user_id, thumbnails=True)
+
+    @tracer.traced('db.get_history_page')
+    def get_history_page(self, page_size=10, search_text=None, user_id=None, after=None):
+        """
+        按游标获取一页历史记录（键集分页，耗时与页码无关）
+        全文索引命中不超过 RANKED_SEARCH_LIMIT 条时按相关度（bm25）排序，否则按时间倒序
+        （命中很多时相关度区分不大，而对全部命中打分的耗时随命中数线性增长）
+        Args:
+            page_size: 每页记录数
+            search_text: 搜索文本，支持前缀和引号短语，见 latex_search.build_match_query
+            user_id: 用户 ID，None 表示当前用户
+            after: 上一页返回的游标，None 表示第一页
+        Returns:
+            tuple: (records, next_cursor)，records 格式同 get_history_records；
+                   没有下一页时 next_cursor 为 None
+        """
+        match = self._search_match(search_text)
+        # 排序方式在第一页决定，之后的页沿用游标记录的方式
+        if match and (after[0] == RANKED_CURSOR if after else self._ranked_search(match, user_id)):
+            return self._search_page(match, page_size, user_id, after)
+
+        where_clauses, params = self._filters(search_text, user_id)
+        if after is not None:
+            # 行值比较可直接在 (user_id, timestamp DESC, id DESC) 索引上定位
+            where_clauses.append("(timestamp, history.id) < (?, ?)")
+            params.extend(after)
         sql = f"""
-            SELECT id, timestamp, image_data, latex_result, confidence, request_id 
-            FROM history {where_clause}
-            ORDER BY timestamp DESC
-            LIMIT ? OFFSET ?
+            SELECT history.id, timestamp, thumbnails.data, latex_result, confidence, request_id
+            FROM history LEFT JOIN thumbnails ON thumbnails.id = history.id
+            WHERE {' AND '.join(where_clauses)}
+            ORDER BY timestamp DESC, history.id DESC
+            LIMIT ?
         """
-        cursor.execute(sql, params + [page_size, offset])
-        records = cursor.fetchall()
-        
-        conn.close()
-        
-        return records, total_count 
\ No newline at end of file
+        with self.connections.read() as conn:
+            # 多取一条判断是否还有下一页
+            rows = conn.execute(sql, params + [page_size + 1]).fetchall()
+
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = (rows[-1][1], rows[-1][0])
+        return self._fill_thumbnails(rows), next_cursor
+
+    def _ranked_search(self, match, user_id):
+        """该用户的全文索引命中数不超过 RANKED_SEARCH_LIMIT 时按相关度排序（只计数到上限为止）"""
+        where_clauses, params = self._filters(None, user_id)
+        where_clauses.insert(0, "history_fts MATCH ?")
+        params.insert(0, match)
+        with self.connections.read() as conn:
+            hits = conn.execute(f"""
+                SELECT COUNT(*) FROM (
+                    SELECT 1 FROM history_fts
+                    JOIN history ON history.id = history_fts.rowid
+                    WHERE {' AND '.join(where_clauses)}
+                    LIMIT ?
+                )
+            """, params + [RANKED_SEARCH_LIMIT + 1]).fetchone()[0]
+        return hits <= RANKED_SEARCH_LIMIT
+
+    def _search_page(self, match, page_size, user_id, after):
+        """按相关度排序的全文索引搜索的一页，游标为 (RANKED_CURSOR, rank, id)"""
+        where_clauses, params = self._filters(None, user_id)
+        where_clauses.insert(0, "history_fts MATCH ?")
+        params.insert(0, match)
+        if after is not None:
+            where_clauses.append("(history_fts.rank, history.id) > (?, ?)")
+            params.extend(after[1:])
+        sql = f"""
+            SELECT history.id, timestamp, thumbnails.data, latex_result, confidence, request_id, history_fts.rank
+            FROM history_fts
+            JOIN history ON history.id = history_fts.rowid
+            LEFT JOIN thumbnails ON thumbnails.id = history.id
+            WHERE {' AND '.join(where_clauses)}
+            ORDER BY history_fts.rank, history.id
+            LIMIT ?
+        """
+        with self.connections.read() as conn:
+            rows = conn.execute(sql, params + [page_size + 1]).fetchall()
+
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = (RANKED_CURSOR, rows[-1][6], rows[-1][0])
+        return self._fill_thumbnails([row[:6] for row in rows]), next_cursor
+
+    @tracer.traced('db.count_history_records')
+    def count_history_records(self, search_text=None, user_id=None):
+        """符合条件的历史记录总数"""
+        where_clauses, params = self._filters(search_text, user_id)
+        with self.connections.read() as conn:
+            return conn.execute(
+                f"SELECT COUNT(*) FROM history WHERE {' AND '.join(where_clauses)}", params
+            ).fetchone()[0]
+
+    @tracer.traced('db.get_image')
+    def get_image(self, record_id):
+        """获取记录的原图（PNG 字节），记录不存在时为 None"""
+        with self.connections.read() as conn:
+            row = conn.execute('SELECT image_blob, image_data FROM history WHERE id=?', (record_id,)).fetchone()
+        return decode_image(*row) if row else None
+
+    @tracer.traced('db.get_record')
+    def get_record(self, record_id):
+        """获取单条记录（不含图片）"""
+        with self.connections.read() as conn:
+            return conn.execute('''
+                SELECT id, latex_result, confidence, request_id, user_id
+                FROM history WHERE id=?
+            ''', (record_id,)).fetchone()
+
+    def iter_phashes(self, batch_size=10000):
+        """分批遍历所有已计算感知哈希的记录，产出 (id, phash)"""
+        last_id = 0
+        while True:
+            # 每批单独取连接，不在 yield 期间占用读事务
+            with self.connections.read() as conn:
+                rows = conn.execute('''
+                    SELECT id, phash FROM history
+                    WHERE id > ? AND phash IS NOT NULL
+                    ORDER BY id LIMIT ?
+                ''', (last_id, batch_size)).fetchall()
+            if not rows:
+                break
+            yield from rows
+            last_id = rows[-1][0]
+
+    def get_records_without_phash(self, limit=100):
+        """获取尚未计算感知哈希的记录，返回 [(id, PNG 字节)]"""
+        with self.connections.read() as conn:
+            rows = conn.execute('''
+                SELECT id, image_blob, image_data FROM history
+                WHERE phash IS NULL ORDER BY id LIMIT ?
+            ''', (limit,)).fetchall()
+        return [(record_id, decode_image(blob, text)) for record_id, blob, text in rows]
+
+    def update_phashes(self, items):
+        """批量写入感知哈希，items 为 [(phash, id)]"""
+        with self.connections.write() as conn:
+            conn.executemany('UPDATE history SET phash = ? WHERE id = ?', items)
+
+    @tracer.traced('db.update_record_result')
+    def update_record_result(self, record_id, latex_result, confidence, request_id):
+        """回填识别结果（离线队列中的占位记录在识别完成后调用）"""
+        with self.connections.write() as conn:
+            cursor = conn.execute('''
+                UPDATE history SET latex_result = ?, confidence = ?, request_id = ?
+                WHERE id = ?
+            ''', (latex_result, confidence, request_id, record_id))
+            return cursor.rowcount == 1
+
+    def mark_record_failed(self, record_id, message):
+        """
+        将离线队列的占位记录标记为识别失败（以 LaTeX 注释写明原因，不再显示为空白记录）
+        Returns:
+            bool: 记录是否存在
+        """
+        with self.connections.write() as conn:
+            cursor = conn.execute('''
+                UPDATE history SET latex_result = ?, confidence = 0, request_id = ?
+                WHERE id = ?
+            ''', (f'% 识别失败：{message}', f'{FAILED_REQUEST_PREFIX}{uuid.uuid4().hex}', record_id))
+            return cursor.rowcount == 1
+
+    def has_legacy_images(self):
+        """是否还有未迁移为 BLOB 存储的记录"""
+        with self.connections.read() as conn:
+            return conn.execute(
+                "SELECT EXISTS (SELECT 1 FROM history WHERE image_blob IS NULL AND image_data != '')"
+            ).fetchone()[0] == 1
+
+    def migrate_images(self, batch_size=100, pause=0.02, stop_event=None):
+        """
+        将旧记录的 base64 图片逐批转换为 BLOB（可随时中断，下次从未迁移的记录继续）
+
+        解码在写锁外完成，每批一个短事务，批次之间让出写锁，迁移期间界面和识别照常读写。
+        Args:
+            batch_size: 每个事务转换的记录数
+            pause: 批次之间的间隔（秒）
+            stop_event: threading.Event，置位后在当前批次结束时停止
+        Returns:
+            int: 本次迁移的记录数
+        """
+        migrated = 0
+        last_id = 0
+        while stop_event is None or not stop_event.is_set():
+            with self.connections.read() as conn:
+                rows = conn.execute('''
+                    SELECT id, image_data FROM history
+                    WHERE id > ? AND image_blob IS NULL AND image_data != ''
+                    ORDER BY id LIMIT ?
+                ''', (last_id, batch_size)).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            items = []
+            broken = []
+            for record_id, image_data in rows:
+                try:
+                    items.append((base64.b64decode(image_data), record_id))
+                except (ValueError, TypeError):
+                    # 无法解码的记录保留原文，写入空 BLOB 避免反复尝试
+                    print(f"Error decoding image of record {record_id}")
+                    broken.append((record_id,))
+
+            with self.connections.write() as conn:
+                # 迁移期间被覆盖或删除的记录由 image_blob IS NULL 条件跳过
+                conn.executemany(
+                    "UPDATE history SET image_blob = ?, image_data = '' WHERE id = ? AND image_blob IS NULL", items)
+                conn.executemany(
+                    "UPDATE history SET image_blob = X'' WHERE id = ? AND image_blob IS NULL", broken)
+            migrated += len(rows)
+            time.sleep(pause)
+        if migrated:
+            print(f"已将 {migrated} 条历史记录的图片迁移为二进制存储")
+        return migrated
+
+    def has_missing_thumbnails(self):
+        """是否还有未生成缩略图的记录"""
+        with self.connections.read() as conn:
+            return conn.execute('''
+                SELECT EXISTS (
+                    SELECT 1 FROM history WHERE NOT EXISTS (SELECT 1 FROM thumbnails WHERE thumbnails.id = history.id)
+                )
+            ''').fetchone()[0] == 1
+
+    def backfill_thumbnails(self, batch_size=50, pause=0.02, stop_event=None):
+        """
+        为旧记录逐批生成缩略图（可随时中断，参数同 migrate_images）
+        Returns:
+            int: 本次生成的缩略图数
+        """
+        generated = 0
+        last_id = 0
+        while stop_event is None or not stop_event.is_set():
+            with self.connections.read() as conn:
+                rows = conn.execute('''
+                    SELECT id, image_blob, image_data FROM history
+                    WHERE id > ? AND NOT EXISTS (SELECT 1 FROM thumbnails WHERE thumbnails.id = history.id)
+                    ORDER BY id LIMIT ?
+                ''', (last_id, batch_size)).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            items = []
+            for record_id, image_blob, image_data in rows:
+                # 无法解码的图片存空缩略图，避免反复尝试
+                items.append((record_id, thumbnail_from_png(decode_image(image_blob, image_data)) or b''))
+            with self.connections.write() as conn:
+                # 只补缺失的缩略图，期间新写入的不覆盖；已删除的记录不再补
+                conn.executemany('''
+                    INSERT OR IGNORE INTO thumbnails (id, data)
+                    SELECT ?, ? WHERE EXISTS (SELECT 1 FROM history WHERE id = ?)
+                ''', [(record_id, data, record_id) for record_id, data in items])
+            generated += len(items)
+            time.sleep(pause)
+        if generated:
+            print(f"已为 {generated} 条历史记录生成缩略图")
+        return generated
+
+    def _migrate_storage(self):
+        self.backfill_search_index()
+        self.migrate_images()
+        self.backfill_thumbnails()
+
+    def migrate_images_async(self):
+        """在后台线程中补建全文索引、迁移图片存储并补齐缩略图，没有待处理记录时不启动线程"""
+        if self.is_search_ready() and not self.has_legacy_images() and not self.has_missing_thumbnails():
+            return None
+        thread = threading.Thread(target=self._migrate_storage, name='ImageStorageMigration', daemon=True)
+        thread.start()
+        return thread
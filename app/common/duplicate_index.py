@@ -0,0 +1,105 @@
+# coding: utf-8
+import threading
+
+import cv2
+import numpy as np
+
+from .db_manager import FAILED_REQUEST_PREFIX
+from .hamming_index import MultiIndexHash
+from .image_hash import dhash, to_signed64, from_signed64
+
+
+class DuplicateIndex:
+    """历史记录图片的感知哈希索引，用于在调用识别接口前查找近似重复的图片"""
+
+    def __init__(self, db, max_distance=5):
+        """
+        Args:
+            db: DatabaseManager 数据库管理器
+            max_distance: 视为近似重复的最大汉明距离（64 位 dHash）
+        """
+        self.db = db
+        self.max_distance = max_distance
+        self.hashes = MultiIndexHash()
+        self.deleted = set()
+        self.ready = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        """补算缺失的哈希并从数据库构建索引（耗时操作，应在后台线程调用）"""
+        self.backfill()
+        hashes = MultiIndexHash()
+        for record_id, phash in self.db.iter_phashes():
+            # 0 表示空白或无法解码的图片，不参与匹配
+            if phash:
+                hashes.insert(from_signed64(phash), record_id)
+
+        with self._lock:
+            # 加载期间新增的记录合并进新索引
+            pending = self.hashes
+            self.hashes = hashes
+            for key, record_id in pending.items():
+                hashes.insert(key, record_id)
+            self.ready = True
+        print(f"相似图片索引已加载: {len(hashes)} 条")
+
+    def loadAsync(self):
+        """在后台线程中构建索引"""
+        threading.Thread(target=self.load, name='DuplicateIndexLoader', daemon=True).start()
+
+    def backfill(self, batch_size=200):
+        """为旧记录补算感知哈希"""
+        while True:
+            records = self.db.get_records_without_phash(batch_size)
+            if not records:
+                break
+
+            items = []
+            for record_id, image_data in records:
+                try:
+                    data = np.frombuffer(image_data, np.uint8)
+                    image = cv2.imdecode(data, cv2.IMREAD_COLOR)
+                    # 无法解码的图片记为 0，避免反复尝试
+                    items.append((to_signed64(dhash(image)) if image is not None else 0, record_id))
+                except Exception as e:
+                    print(f"Error hashing record {record_id}: {e}")
+                    items.append((0, record_id))
+            self.db.update_phashes(items)
+
+    def add(self, phash, record_id):
+        """新增一条记录到索引"""
+        with self._lock:
+            self.hashes.insert(phash, record_id)
+            self.deleted.discard(record_id)
+
+    def lookup(self, phash, user_id=None, max_distance=None):
+        """
+        查找近似重复的历史记录
+        Args:
+            phash: 待查图片的无符号 dHash
+            user_id: 只匹配该用户的记录，None 表示不限
+            max_distance: 覆盖默认的距离阈值
+        Returns:
+            tuple | None: (distance, record)，record 为 DatabaseManager.get_record 的结果
+        """
+        if max_distance is None:
+            max_distance = self.max_distance
+
+        with self._lock:
+            candidates = self.hashes.search(phash, max_distance)
+
+        for distance, _, record_id in candidates:
+            if record_id in self.deleted:
+                continue
+            record = self.db.get_record(record_id)
+            if record is None:
+                # 记录已被删除，惰性标记
+                with self._lock:
+                    self.deleted.add(record_id)
+                continue
+            if not record[1] or (record[3] or '').startswith(FAILED_REQUEST_PREFIX):
+                # 离线队列中尚未识别或补识别失败的占位记录
+                continue
+            if user_id is None or record[4] == user_id:
+                return distance, record
+        return None
@@ -0,0 +1,182 @@
+# coding: utf-8
+import os
+import sqlite3
+import threading
+import time
+
+from .batch_engine import IMAGE_EXTENSIONS, BatchRecognizer
+
+
+class WatchCheckpoint:
+    """监视文件夹的处理记录，重启后不再重复识别已处理的文件"""
+
+    def __init__(self, db_path='app/data/watch_checkpoint.db'):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=10)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS processed (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                status INTEGER NOT NULL,
+                record_id INTEGER,
+                processed_at REAL NOT NULL
+            )
+        ''')
+        self._conn.commit()
+
+    def is_processed(self, path, size, mtime_ns):
+        """文件（按路径、大小和修改时间）是否已处理过，内容被覆盖后视为新文件"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT size, mtime_ns FROM processed WHERE path = ?', (path,)
+            ).fetchone()
+        return row is not None and row[0] == size and row[1] == mtime_ns
+
+    def mark(self, path, size, mtime_ns, status, record_id=None):
+        with self._lock:
+            self._conn.execute('''
+                INSERT OR REPLACE INTO processed (path, size, mtime_ns, status, record_id, processed_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (path, size, mtime_ns, int(bool(status)), record_id, time.time()))
+            self._conn.commit()
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM processed').fetchone()[0]
+
+
+class FolderWatcher:
+    """
+    监视文件夹，自动识别新出现的图片
+
+    - 轮询目录（os.scandir），不依赖平台相关的文件系统通知
+    - 防抖：文件大小和修改时间在连续两次扫描中保持不变，且距最后修改已超过 settle 秒，才认为写入完成
+    - 每轮扫描发现的文件交给 BatchRecognizer 以有界并发识别，结果逐条写入检查点
+    """
+
+    def __init__(self, directory, service, db, checkpoint, recursive=False, interval=1.0, settle=1.0,
+                 workers=2, user_id=None, max_attempts=3, on_result=None):
+        """
+        Args:
+            directory: 监视的目录
+            service: BaseOcrService 识别服务（应使用批量优先级）
+            db: DatabaseManager 数据库管理器，为 None 时不写历史记录
+            checkpoint: WatchCheckpoint 处理记录
+            recursive: 是否包含子目录
+            interval: 扫描间隔（秒）
+            settle: 文件最后修改后需静置的秒数
+            workers: 同时识别的图片数
+            user_id: 历史记录所属用户
+            max_attempts: 瞬时错误的最大尝试次数，超过后记为失败不再重试
+            on_result: 每张图片处理完成时回调 callback(item)
+        """
+        self.directory = os.path.abspath(directory)
+        self.service = service
+        self.db = db
+        self.checkpoint = checkpoint
+        self.recursive = recursive
+        self.interval = interval
+        self.settle = settle
+        self.workers = workers
+        self.user_id = user_id
+        self.max_attempts = max_attempts
+        self.on_result = on_result
+        self._pending = {}   # path -> (size, mtime_ns)，上一轮扫描时看到的状态
+        self._attempts = {}  # path -> 瞬时错误次数
+        self._stopped = threading.Event()
+        self._recognizer = None
+
+    def _scan(self, directory):
+        """产出目录下图片的 (path, size, mtime_ns)"""
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if self.recursive:
+                                yield from self._scan(entry.path)
+                        elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                            stat = entry.stat()
+                            yield entry.path, stat.st_size, stat.st_mtime_ns
+                    except OSError:
+                        # 扫描期间被删除或无权限的文件跳过
+                        continue
+        except OSError:
+            return
+
+    def poll(self):
+        """
+        扫描一次目录
+        Returns:
+            list: 已写入完成、尚未处理的文件 [(path, size, mtime_ns)]
+        """
+        now_ns = time.time_ns()
+        settle_ns = int(self.settle * 1e9)
+        seen = {}
+        ready = []
+        for path, size, mtime_ns in self._scan(self.directory):
+            if self.checkpoint.is_processed(path, size, mtime_ns):
+                continue
+            seen[path] = (size, mtime_ns)
+            if self._pending.get(path) == (size, mtime_ns) and size > 0 and now_ns - mtime_ns >= settle_ns:
+                ready.append((path, size, mtime_ns))
+        self._pending = seen
+        ready.sort(key=lambda item: item[2])
+        return ready
+
+    def skip_existing(self):
+        """将目录中现有的图片全部记为已处理，只识别此后新增的文件"""
+        count = 0
+        for path, size, mtime_ns in self._scan(self.directory):
+            if not self.checkpoint.is_processed(path, size, mtime_ns):
+                self.checkpoint.mark(path, size, mtime_ns, False)
+                count += 1
+        return count
+
+    def _on_item(self, files, item):
+        path = item['path']
+        size, mtime_ns = files[path]
+        if not item['status'] and item.get('retryable'):
+            attempts = self._attempts.get(path, 0) + 1
+            if attempts < self.max_attempts:
+                # 网络类错误留到下一轮扫描重试
+                self._attempts[path] = attempts
+                self._notify(item)
+                return
+        self._attempts.pop(path, None)
+        self.checkpoint.mark(path, size, mtime_ns, item['status'], item.get('record_id'))
+        self._notify(item)
+
+    def _notify(self, item):
+        if self.on_result is not None:
+            self.on_result(item)
+
+    def process(self, ready):
+        """识别一批已就绪的文件（阻塞至完成）"""
+        files = {path: (size, mtime_ns) for path, size, mtime_ns in ready}
+        self._recognizer = BatchRecognizer(
+            self.service, self.db,
+            workers=self.workers,
+            user_id=self.user_id,
+            progress_callback=lambda snapshot, item: self._on_item(files, item)
+        )
+        if self._stopped.is_set():
+            self._recognizer.cancel()
+        return self._recognizer.run(list(files))
+
+    def run(self):
+        """持续监视直到 stop() 被调用"""
+        while not self._stopped.is_set():
+            ready = self.poll()
+            if ready:
+                self.process(ready)
+            self._stopped.wait(self.interval)
+
+    def stop(self):
+        """停止监视，正在识别的图片会处理完"""
+        self._stopped.set()
+        if self._recognizer is not None:
+            self._recognizer.cancel()
@@ -0,0 +1,81 @@
+# coding: utf-8
+from itertools import combinations
+
+from .image_hash import hamming_distance
+
+
+class MultiIndexHash:
+    """ Multi-index hashing over 64-bit keys for hamming range search
+
+    The key is split into ``chunks`` substrings, each indexed by its own hash
+    table. By the pigeonhole principle, any key within distance ``d`` of the
+    query matches at least one substring within ``d // chunks``, so a search
+    only probes a few buckets per table instead of scanning every key.
+    """
+
+    def __init__(self, bits=64, chunks=4):
+        self.bits = bits
+        self.chunks = chunks
+        self.chunkBits = bits // chunks
+        self.chunkMask = (1 << self.chunkBits) - 1
+        self.tables = [{} for _ in range(chunks)]
+        self.values = {}  # key -> [value]
+        self.size = 0
+        self._probeMasks = {}
+
+    def _split(self, key):
+        return [(key >> (i * self.chunkBits)) & self.chunkMask for i in range(self.chunks)]
+
+    def _masks(self, radius):
+        """ all chunk masks with at most radius bits set """
+        masks = self._probeMasks.get(radius)
+        if masks is None:
+            masks = [0]
+            for r in range(1, radius + 1):
+                for positions in combinations(range(self.chunkBits), r):
+                    mask = 0
+                    for p in positions:
+                        mask |= 1 << p
+                    masks.append(mask)
+            self._probeMasks[radius] = masks
+        return masks
+
+    def insert(self, key: int, value):
+        """ insert item, values of identical keys share one entry """
+        self.size += 1
+        values = self.values.get(key)
+        if values is not None:
+            values.append(value)
+            return
+
+        self.values[key] = [value]
+        for table, chunk in zip(self.tables, self._split(key)):
+            table.setdefault(chunk, []).append(key)
+
+    def search(self, key: int, max_distance: int):
+        """ search items within max_distance, sorted by distance """
+        masks = self._masks(min(max_distance // self.chunks, self.chunkBits))
+        candidates = set()
+        for table, chunk in zip(self.tables, self._split(key)):
+            for mask in masks:
+                bucket = table.get(chunk ^ mask)
+                if bucket:
+                    candidates.update(bucket)
+
+        result = []
+        for candidate in candidates:
+            d = hamming_distance(key, candidate)
+            if d <= max_distance:
+                result.extend((d, candidate, v) for v in self.values[candidate])
+
+        result.sort(key=lambda i: i[0])
+        return result
+
+    def items(self):
+        """ iterate all (key, value) items """
+        for key, values in self.values.items():
+            for v in values:
+                yield key, v
+
+    def __len__(self):
+        return self.size
@@ -0,0 +1,86 @@
+# coding: utf-8
+import hashlib
+
+import cv2
+import numpy as np
+
+
+def pixel_digest(image):
+    """
+    计算解码后像素数据的内容摘要
+    Args:
+        image: OpenCV格式的图像数据
+    Returns:
+        str: 十六进制摘要，尺寸/通道/像素任一不同摘要即不同
+    """
+    arr = np.ascontiguousarray(image)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f'{arr.shape}|{arr.dtype.str}'.encode())
+    h.update(arr.data)
+    return h.hexdigest()
+
+
+def content_bbox(gray, threshold=20):
+    """
+    计算与背景色（左上角像素）差异明显的内容区域
+    Args:
+        gray: 灰度图像
+        threshold: 与背景的灰度差阈值
+    Returns:
+        tuple | None: (x, y, w, h)，整张图都是背景时返回 None
+    """
+    diff = cv2.absdiff(gray, np.full_like(gray, gray[0, 0]))
+    points = cv2.findNonZero((diff > threshold).astype(np.uint8))
+    if points is None:
+        return None
+    return cv2.boundingRect(points)
+
+
+def crop_to_content(image, threshold=20):
+    """
+    裁掉与背景色相近的四周留白，使不同截取范围的同一公式对齐
+    Args:
+        image: OpenCV格式的图像数据
+        threshold: 与背景（左上角像素）的灰度差阈值
+    Returns:
+        numpy.ndarray: 裁剪后的灰度图像
+    """
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    bbox = content_bbox(gray, threshold)
+    if bbox is None:
+        return gray
+    x, y, w, h = bbox
+    return gray[y:y + h, x:x + w]
+
+
+def dhash(image, hash_size=8):
+    """
+    差值感知哈希（dHash），对缩放和轻微裁剪不敏感
+    Args:
+        image: OpenCV格式的图像数据
+        hash_size: 哈希边长，返回 hash_size * hash_size 位
+    Returns:
+        int: 无符号感知哈希值
+    """
+    gray = crop_to_content(image)
+    resized = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (resized[:, 1:] > resized[:, :-1]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def hamming_distance(a, b):
+    """两个哈希值的汉明距离"""
+    return bin(a ^ b).count('1')
+
+
+def to_signed64(value):
+    """无符号 64 位哈希转为 SQLite INTEGER 可存储的有符号值"""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def from_signed64(value):
+    """SQLite 中读出的有符号值还原为无符号哈希"""
+    return value & ((1 << 64) - 1)
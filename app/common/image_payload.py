@@ -0,0 +1,75 @@
+# coding: utf-8
+import threading
+
+import cv2
+import numpy as np
+
+from .image_hash import pixel_digest
+from .thumbnail import make_thumbnail
+
+
+class ImagePayload:
+    """
+    一次识别流程中共享的图像数据
+
+    像素摘要和 PNG 编码结果在首次使用时计算并缓存，上传、缓存查找、请求合并、重试和保存历史记录
+    都复用同一份结果；编码结果以 memoryview 形式提供，传递时不复制字节。
+    """
+
+    def __init__(self, image, bypass_cache=False):
+        """
+        Args:
+            image: OpenCV格式的图像数据
+            bypass_cache: 为 True 时各层跳过结果缓存、成功结果复用和请求合并，强制调用识别接口（“重新识别”）
+        """
+        self.image = image
+        self.bypass_cache = bypass_cache
+        self._digest = None
+        self._encoded = {}  # 编码方式 -> numpy 字节数组
+        self._lock = threading.Lock()
+
+    @property
+    def digest(self):
+        """像素摘要（见 pixel_digest）"""
+        if self._digest is None:
+            self._digest = pixel_digest(self.image)
+        return self._digest
+
+    def encoded(self, key, encoder):
+        """
+        按 key 缓存的编码结果
+        Args:
+            key: 编码方式标识，相同 key 只编码一次
+            encoder: 编码函数 encoder(image)，返回 bytes 或 uint8 数组
+        Returns:
+            memoryview: 编码后字节的只读视图
+        """
+        with self._lock:
+            data = self._encoded.get(key)
+            if data is None:
+                result = encoder(self.image)
+                data = np.frombuffer(result, np.uint8) if isinstance(result, bytes) else result.reshape(-1)
+                self._encoded[key] = data
+        return memoryview(data).toreadonly()
+
+    def png(self):
+        """原图的 PNG 编码（上传与历史记录共用）"""
+        return self.encoded('png', _encode_png)
+
+    def thumbnail(self):
+        """历史记录列表使用的缩略图"""
+        return self.encoded('thumbnail', make_thumbnail)
+
+
+def _encode_png(image):
+    ok, encoded = cv2.imencode('.png', image)
+    if not ok:
+        raise ValueError('PNG 编码失败')
+    return encoded
+
+
+def as_payload(image_data):
+    """将 OpenCV 图像包装为 ImagePayload，已是 ImagePayload 时原样返回"""
+    if isinstance(image_data, ImagePayload):
+        return image_data
+    return ImagePayload(image_data)
@@ -0,0 +1,141 @@
+# coding: utf-8
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from .image_hash import content_bbox
+
+STEPS = ('autocrop', 'grayscale', 'binarize', 'downscale', 'encode')
+
+
+def autocrop(image, padding=8, threshold=20):
+    """裁掉四周留白，保留 padding 像素边距"""
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    bbox = content_bbox(gray, threshold)
+    if bbox is None:
+        return image
+    x, y, w, h = bbox
+    height, width = gray.shape
+    x0, y0 = max(0, x - padding), max(0, y - padding)
+    x1, y1 = min(width, x + w + padding), min(height, y + h + padding)
+    return image[y0:y1, x0:x1]
+
+
+def to_grayscale(image):
+    """转为单通道灰度图"""
+    return image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def binarize(image):
+    """Otsu 二值化，输出白底黑字"""
+    gray = to_grayscale(image)
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    # 保证背景为白色（深色背景截图反转）
+    if np.count_nonzero(binary) < binary.size // 2:
+        binary = cv2.bitwise_not(binary)
+    return binary
+
+
+def estimate_glyph_height(image):
+    """
+    估计字符高度：对墨迹做连通域分析，取高度中位数
+    Returns:
+        float | None: 像素高度，无墨迹时返回 None
+    """
+    ink = cv2.bitwise_not(binarize(image))
+    count, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    # 第 0 个连通域是背景，过滤掉噪点
+    heights = [stats[i, cv2.CC_STAT_HEIGHT] for i in range(1, count) if stats[i, cv2.CC_STAT_AREA] >= 4]
+    if not heights:
+        return None
+    return float(np.median(heights))
+
+
+def downscale(image, target_glyph_height=40):
+    """按估计的字符高度等比缩小，字符本就不大于目标高度时保持原样"""
+    glyph_height = estimate_glyph_height(image)
+    if not glyph_height or glyph_height <= target_glyph_height:
+        return image
+    scale = target_glyph_height / glyph_height
+    width = max(1, int(round(image.shape[1] * scale)))
+    height = max(1, int(round(image.shape[0] * scale)))
+    return cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+
+
+def encode_png(image, compression=3):
+    """编码为 PNG 字节，compression 取 0（最快）到 9（最小）"""
+    ok, encoded = cv2.imencode('.png', image, [cv2.IMWRITE_PNG_COMPRESSION, compression])
+    if not ok:
+        raise ValueError('PNG 编码失败')
+    return encoded.tobytes()
+
+
+class ImagePreprocessor:
+    """上传前的图像优化：裁边 → 灰度/二值化 → 按字高缩放 → PNG 压缩，各步骤独立计时"""
+
+    def __init__(self, crop=True, grayscale=True, binary=False, target_glyph_height=40, compression=3):
+        """
+        Args:
+            crop: 是否裁掉四周留白
+            grayscale: 是否转为灰度
+            binary: 是否二值化（隐含灰度）
+            target_glyph_height: 目标字高（像素），0 表示不缩放
+            compression: PNG 压缩级别 0-9
+        """
+        self.crop = crop
+        self.grayscale = grayscale
+        self.binary = binary
+        self.target_glyph_height = target_glyph_height
+        self.compression = compression
+        self._lock = threading.Lock()
+        self._totals = {step: 0.0 for step in STEPS}
+        self.count = 0
+        self.bytes_out = 0
+
+    def _steps(self):
+        if self.crop:
+            yield 'autocrop', autocrop
+        if self.binary:
+            yield 'binarize', binarize
+        elif self.grayscale:
+            yield 'grayscale', to_grayscale
+        if self.target_glyph_height:
+            yield 'downscale', lambda image: downscale(image, self.target_glyph_height)
+
+    def process(self, image):
+        """
+        执行预处理并编码
+        Args:
+            image: OpenCV格式的图像数据
+        Returns:
+            tuple: (png_bytes, report)，report 含各步骤耗时（毫秒）、输出尺寸和字节数
+        """
+        timings = {}
+        for name, step in self._steps():
+            start = time.perf_counter()
+            image = step(image)
+            timings[name] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        data = encode_png(image, self.compression)
+        timings['encode'] = (time.perf_counter() - start) * 1000
+
+        report = {'timings': timings, 'shape': image.shape, 'bytes': len(data)}
+        with self._lock:
+            self.count += 1
+            self.bytes_out += len(data)
+            for name, value in timings.items():
+                self._totals[name] += value
+        return data, report
+
+    def stats(self):
+        """累计统计：各步骤平均耗时（毫秒）和输出字节数"""
+        with self._lock:
+            count = self.count or 1
+            return {
+                'count': self.count,
+                'avg_ms': {name: total / count for name, total in self._totals.items()},
+                'avg_bytes': self.bytes_out / count
+            }
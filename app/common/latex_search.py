@@ -0,0 +1,79 @@
+# coding: utf-8
+"""
+LaTeX 历史记录全文搜索的分词与查询构造
+
+SQLite 的 Python 接口无法注册自定义 FTS5 分词器，因此由 latex_tokens() 先把公式拆成以空格分隔的
+词元，再交给 FTS5 的 unicode61 分词器（把 \\ _ ^ 视为词内字符）建立索引；查询串用同样的规则拆分，
+保证索引和查询的切分一致。命令同时以 \\frac 和 frac 两种形式索引，搜索命令名时不必输入反斜杠。
+"""
+import re
+
+# FTS5 表的分词器参数：\frac、_、^ 保持为完整词元
+FTS_TOKENIZE = "unicode61 remove_diacritics 0 tokenchars '\\_^'"
+
+# 索引格式版本，分词规则变化时递增，已建立的旧索引会被重建
+FTS_VERSION = 2
+
+_TOKEN_RE = re.compile(r'''
+    \\([A-Za-z]+)          # 命令：\frac \alpha \mathrm
+  | \\.                    # 转义符号与间距：\{ \, \;（不建索引）
+  | ([A-Za-z]+)            # 标识符：x sin dx
+  | (\d+(?:\.\d+)?)        # 数字：2 3.14
+  | ([_^])                 # 上下标
+''', re.VERBOSE)
+
+_QUERY_RE = re.compile(r'"([^"]*)"?|(\S+)')
+
+
+def _split(text, prefix=False):
+    """
+    拆分词元，命令展开为 \\name name
+    Args:
+        prefix: 最后一个词元用作前缀查询，此时末尾的命令只保留 \\name，使 \\fr 能匹配 \\frac
+    """
+    tokens = []
+    for match in _TOKEN_RE.finditer(text or ''):
+        command, token = match.group(1), match.group(2) or match.group(3) or match.group(4)
+        if command:
+            tokens += ['\\' + command, command]
+        elif token:
+            tokens.append(token)
+    if prefix and len(tokens) >= 2 and tokens[-2] == '\\' + tokens[-1]:
+        tokens.pop()
+    return tokens
+
+
+def latex_tokens(text):
+    """
+    将 LaTeX 公式拆分为词元
+    例如 \\frac{x_1}{2} -> "\\frac frac x _ 1 2"，花括号和运算符不建索引
+    Args:
+        text: LaTeX 文本
+    Returns:
+        str: 以空格分隔的词元
+    """
+    return ' '.join(_split(text))
+
+
+def build_match_query(text):
+    """
+    将搜索框输入转换为 FTS5 MATCH 查询
+
+    - 空格分隔的各部分须同时出现（AND）
+    - 引号内为精确短语，例如 "x^2" 只匹配 x ^ 2 连续出现
+    - 未加引号的部分按短语匹配且最后一个词元可为前缀，便于边输入边搜索，例如 \\fr 匹配 \\frac
+    - 命令名可不带反斜杠，例如 frac 匹配 \\frac；带反斜杠时只匹配命令
+    Args:
+        text: 用户输入
+    Returns:
+        str: MATCH 表达式；输入中没有可索引的词元时为 None（调用方应回退到 LIKE）
+    """
+    parts = []
+    for match in _QUERY_RE.finditer(text or ''):
+        quoted, word = match.group(1), match.group(2)
+        tokens = ' '.join(_split(quoted if quoted is not None else word, prefix=quoted is None))
+        if not tokens:
+            continue
+        # 词元只含字母、数字、\ _ ^，不会出现需要转义的引号
+        parts.append(f'"{tokens}"' if quoted is not None else f'"{tokens}" *')
+    return ' AND '.join(parts) or None
@@ -0,0 +1,45 @@
+# coding: utf-8
+import re
+
+
+def parse_multipart(body, content_type):
+    """
+    解析 multipart/form-data 请求体
+    Args:
+        body: 请求体字节
+        content_type: Content-Type 请求头（需包含 boundary）
+    Returns:
+        dict: {字段名: [(filename, content_type, data)]}，普通字段 filename 为 None
+    """
+    match = re.search(r'boundary="?([^";]+)"?', content_type or '')
+    if not match:
+        raise ValueError('缺少 multipart boundary')
+    delimiter = b'--' + match.group(1).encode('latin-1')
+
+    fields = {}
+    for part in body.split(delimiter)[1:]:
+        if part.startswith(b'--'):
+            break
+        # 每段以 CRLF 开头，以 CRLF 结尾
+        part = part[2:] if part.startswith(b'\r\n') else part
+        part = part[:-2] if part.endswith(b'\r\n') else part
+        header_block, sep, data = part.partition(b'\r\n\r\n')
+        if not sep:
+            continue
+
+        headers = {}
+        for line in header_block.decode('utf-8', 'replace').split('\r\n'):
+            key, _, value = line.partition(':')
+            headers[key.strip().lower()] = value.strip()
+
+        disposition = headers.get('content-disposition', '')
+        name = re.search(r'\bname="([^"]*)"', disposition)
+        if not name:
+            continue
+        filename = re.search(r'\bfilename="([^"]*)"', disposition)
+        fields.setdefault(name.group(1), []).append((
+            filename.group(1) if filename else None,
+            headers.get('content-type'),
+            data
+        ))
+    return fields
@@ -0,0 +1,162 @@
+# coding: utf-8
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# 内存命中的 last_hit 每攒够这么多条写回一次数据库
+HIT_FLUSH_BATCH = 32
+
+
+class OcrResultCache:
+    """按像素摘要寻址的识别结果缓存（内存 LRU + SQLite 持久化）"""
+
+    def __init__(self, db_path='app/data/ocr_cache.db', max_entries=5000,
+                 max_age_days=30, memory_entries=256):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 86400
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._pending_hits = {}  # 内存命中待写回的 last_hit：digest -> 时间
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.init_db()
+
+    def init_db(self):
+        """初始化缓存表"""
+        with self._lock:
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS ocr_cache (
+                    digest TEXT PRIMARY KEY,
+                    latex TEXT NOT NULL,
+                    confidence REAL NOT NULL,
+                    request_id TEXT,
+                    created REAL NOT NULL,
+                    last_hit REAL NOT NULL
+                )
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_ocr_cache_last_hit ON ocr_cache(last_hit)')
+            self._conn.commit()
+
+    def get(self, digest):
+        """
+        查询缓存
+        Returns:
+            dict | None: {'latex', 'confidence', 'request_id'}，未命中或已过期返回 None
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(digest)
+            if entry is not None and now - entry['created'] <= self.max_age:
+                self._memory.move_to_end(digest)
+                self.hits += 1
+                # 持久层按 last_hit 淘汰，内存命中也要记录，攒够一批再写回
+                self._pending_hits[digest] = now
+                if len(self._pending_hits) >= HIT_FLUSH_BATCH:
+                    self._flush_hits()
+                return entry
+
+            row = self._conn.execute(
+                'SELECT latex, confidence, request_id, created FROM ocr_cache WHERE digest=?',
+                (digest,)
+            ).fetchone()
+            if row is None or now - row[3] > self.max_age:
+                self._memory.pop(digest, None)
+                self.misses += 1
+                return None
+
+            self._conn.execute('UPDATE ocr_cache SET last_hit=? WHERE digest=?', (now, digest))
+            self._conn.commit()
+            entry = {'latex': row[0], 'confidence': row[1], 'request_id': row[2], 'created': row[3]}
+            self._remember(digest, entry)
+            self.hits += 1
+            return entry
+
+    def put(self, digest, latex, confidence, request_id):
+        """写入缓存，并按需执行淘汰"""
+        now = time.time()
+        entry = {'latex': latex, 'confidence': confidence, 'request_id': request_id, 'created': now}
+        with self._lock:
+            self._conn.execute('''
+                INSERT OR REPLACE INTO ocr_cache (digest, latex, confidence, request_id, created, last_hit)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (digest, latex, confidence, request_id, now, now))
+            self._conn.commit()
+            self._remember(digest, entry)
+            self._puts += 1
+            # 每写入一定次数才做一次淘汰，摊薄开销
+            if self._puts % 50 == 1:
+                self._evict(now)
+
+    def _flush_hits(self):
+        """将内存命中的 last_hit 写回数据库（调用方需持有锁）"""
+        if not self._pending_hits:
+            return
+        self._conn.executemany(
+            'UPDATE ocr_cache SET last_hit=? WHERE digest=?',
+            ((hit, digest) for digest, hit in self._pending_hits.items())
+        )
+        self._conn.commit()
+        self._pending_hits.clear()
+
+    def _remember(self, digest, entry):
+        self._memory[digest] = entry
+        self._memory.move_to_end(digest)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, now):
+        """按存活时间和条目数上限淘汰（调用方需持有锁）"""
+        self._flush_hits()
+        cursor = self._conn.execute('DELETE FROM ocr_cache WHERE created < ?', (now - self.max_age,))
+        evicted = cursor.rowcount
+        count = self._conn.execute('SELECT COUNT(*) FROM ocr_cache').fetchone()[0]
+        if count > self.max_entries:
+            cursor = self._conn.execute('''
+                DELETE FROM ocr_cache WHERE digest IN (
+                    SELECT digest FROM ocr_cache ORDER BY last_hit ASC LIMIT ?
+                )
+            ''', (count - self.max_entries,))
+            evicted += cursor.rowcount
+        self._conn.commit()
+        if evicted:
+            self.evictions += evicted
+            self._memory.clear()
+
+    def evict(self):
+        """立即执行一次淘汰"""
+        with self._lock:
+            self._evict(time.time())
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute('DELETE FROM ocr_cache')
+            self._conn.commit()
+            self._memory.clear()
+            self._pending_hits.clear()
+
+    def stats(self):
+        """命中统计"""
+        with self._lock:
+            size = self._conn.execute('SELECT COUNT(*) FROM ocr_cache').fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+                'entries': size
+            }
+
+    def close(self):
+        with self._lock:
+            self._flush_hits()
+            self._conn.close()
@@ -0,0 +1,167 @@
+# coding: utf-8
+import contextvars
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+PRIORITY_INTERACTIVE = 0  # 粘贴、手写、重新识别等用户正在等待的请求
+PRIORITY_BULK = 1         # 批量、监视文件夹等后台请求
+
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: 'interactive', PRIORITY_BULK: 'bulk'}
+
+_priority = contextvars.ContextVar('ocr_priority', default=PRIORITY_INTERACTIVE)
+
+
+def current_priority():
+    """当前调用链上的请求优先级"""
+    return _priority.get()
+
+
+@contextmanager
+def priority_scope(priority):
+    """在 with 块内以指定优先级发起识别请求"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def percentile(values, p):
+    """简单百分位数（values 无需有序）"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(p / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+class _Job:
+    __slots__ = ('priority', 'seq', 'enqueued', 'fn', 'args', 'future')
+
+    def __init__(self, priority, seq, fn, args):
+        self.priority = priority
+        self.seq = seq
+        self.enqueued = time.monotonic()
+        self.fn = fn
+        self.args = args
+        self.future = Future()
+
+
+class OcrScheduler:
+    """
+    区分交互与批量流量的优先级调度器
+
+    - 每类请求各有并发上限，批量请求永远占不满全部工作线程，交互请求总有空位
+    - 排队中的批量请求会被后到的交互请求插队
+    - 老化：排队越久有效优先级越高，每等待 aging_interval 秒提升一级，批量请求不会饿死
+    """
+
+    def __init__(self, max_workers=4, limits=None, aging_interval=10.0):
+        """
+        Args:
+            max_workers: 工作线程总数
+            limits: {优先级: 并发上限}，默认交互不限、批量为 max_workers - 1
+            aging_interval: 提升一级优先级所需的排队秒数
+        """
+        self.max_workers = max_workers
+        self.limits = limits or {
+            PRIORITY_INTERACTIVE: max_workers,
+            PRIORITY_BULK: max(1, max_workers - 1)
+        }
+        self.aging_interval = aging_interval
+        self._queues = {p: deque() for p in self.limits}
+        self._running = dict.fromkeys(self.limits, 0)
+        self._completed = dict.fromkeys(self.limits, 0)
+        self._latencies = {p: deque(maxlen=1000) for p in self.limits}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._workers = []
+        self._shutdown = False
+
+    def _ensure_workers(self):
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._work, name=f'OcrScheduler-{len(self._workers)}', daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def submit(self, fn, *args, priority=PRIORITY_INTERACTIVE):
+        """
+        提交任务
+        Returns:
+            Future: 任务结果
+        """
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError('scheduler has been shut down')
+            job = _Job(priority, next(self._seq), fn, args)
+            self._queues[priority].append(job)
+            self._ensure_workers()
+            self._cond.notify()
+        return job.future
+
+    def _next_job(self, now):
+        """选出有效优先级最高的可运行任务（调用方需持有锁）"""
+        best = None
+        best_key = None
+        for priority, queue in self._queues.items():
+            if not queue or self._running[priority] >= self.limits[priority]:
+                continue
+            # 同类队列按 FIFO，队首等待最久，只需比较各队首
+            job = queue[0]
+            effective = priority - (now - job.enqueued) / self.aging_interval
+            key = (effective, job.seq)
+            if best_key is None or key < best_key:
+                best, best_key = job, key
+        if best is not None:
+            self._queues[best.priority].popleft()
+        return best
+
+    def _work(self):
+        while True:
+            with self._cond:
+                job = self._next_job(time.monotonic())
+                while job is None:
+                    if self._shutdown:
+                        return
+                    self._cond.wait()
+                    job = self._next_job(time.monotonic())
+                self._running[job.priority] += 1
+
+            if job.future.set_running_or_notify_cancel():
+                try:
+                    # 工作线程不继承提交方的上下文，在任务内恢复优先级，供下游的限流器排队使用
+                    with priority_scope(job.priority):
+                        job.future.set_result(job.fn(*job.args))
+                except BaseException as e:
+                    job.future.set_exception(e)
+
+            with self._cond:
+                self._running[job.priority] -= 1
+                self._completed[job.priority] += 1
+                self._latencies[job.priority].append(time.monotonic() - job.enqueued)
+                # 释放的并发名额可能让其他类别的任务变为可运行
+                self._cond.notify_all()
+
+    def stats(self):
+        """各类请求的排队数、运行数、完成数和延迟百分位（秒）"""
+        with self._cond:
+            return {
+                PRIORITY_NAMES.get(p, str(p)): {
+                    'queued': len(self._queues[p]),
+                    'running': self._running[p],
+                    'completed': self._completed[p],
+                    'p50': percentile(self._latencies[p], 50),
+                    'p95': percentile(self._latencies[p], 95)
+                }
+                for p in self.limits
+            }
+
+    def shutdown(self):
+        """停止接收新任务，已排队的任务执行完后工作线程退出"""
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
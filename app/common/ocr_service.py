@@ -1,7 +1,21 @@
 from abc import ABC, abstractmethod
+import contextvars
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 import requests
-import cv2
-from ..common.config import cfg
+from requests.adapters import HTTPAdapter
+from ..common.settings import cfg
+from ..common.image_payload import as_payload
+from ..common.ocr_cache import OcrResultCache
+from ..common.image_preprocess import ImagePreprocessor
+from ..common.rate_limiter import TokenBucket, QuotaLedger
+from ..common.resilience import CircuitBreaker, RetryPolicy, ResilienceMetrics
+from ..common.ocr_scheduler import OcrScheduler, PRIORITY_INTERACTIVE, PRIORITY_BULK, current_priority, priority_scope
+from ..common.tracing import tracer
 
 class BaseOcrService(ABC):
     """公式识别服务的抽象基类"""
@@ -11,39 +25,221 @@ class BaseOcrService(ABC):
         """
         识别图片中的公式
         Args:
-            image_data: OpenCV格式的图像数据
+            image_data: OpenCV格式的图像数据或 ImagePayload（包装层应原样向下传递，以复用摘要和编码结果）
         Returns:
             dict: {
                 'status': bool,      # 识别是否成功
                 'latex': str,        # LaTeX公式
                 'confidence': float, # 置信度
                 'request_id': str,   # 请求ID
-                'message': str       # 错误信息（如果有）
+                'message': str,      # 错误信息（如果有）
+                'retryable': bool    # 失败时是否为可重试的瞬时错误（可选）
             }
         """
         pass
 
+    def remaining_quota(self):
+        """
+        当日剩余的接口调用额度
+        Returns:
+            int | None: 剩余次数，不限额或无法统计时返回 None
+        """
+        return None
+
+def failure_result(message, retryable=False):
+    """
+    构造识别失败的返回值
+    Args:
+        message: 错误信息
+        retryable: 是否为瞬时错误（网络异常、限流、服务端错误），可以重试
+    """
+    return {
+        'status': False,
+        'latex': None,
+        'confidence': 0,
+        'request_id': None,
+        'message': message,
+        'retryable': retryable
+    }
+
+_cancel_event = contextvars.ContextVar('ocr_cancel_event', default=None)
+
+
+@contextmanager
+def cancel_scope(event):
+    """在 with 块内发起的识别请求可通过 event 取消（尚未发出的请求不再发出）"""
+    token = _cancel_event.set(event)
+    try:
+        yield
+    finally:
+        _cancel_event.reset(token)
+
+
+def is_cancelled():
+    """当前调用链上的请求是否已被取消"""
+    event = _cancel_event.get()
+    return event is not None and event.is_set()
+
+
+def cancelled_result():
+    return failure_result('请求已取消')
+
+class RequestTimingStats:
+    """请求耗时统计，区分新建连接和复用连接的请求"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.last = None
+        self.cold_count = 0
+        self.cold_total = 0.0
+        self.warm_count = 0
+        self.warm_total = 0.0
+
+    def record(self, elapsed, new_connection):
+        """记录一次请求的耗时（秒）"""
+        with self._lock:
+            self.last = {'elapsed': elapsed, 'new_connection': new_connection}
+            if new_connection:
+                self.cold_count += 1
+                self.cold_total += elapsed
+            else:
+                self.warm_count += 1
+                self.warm_total += elapsed
+
+    def summary(self):
+        """
+        汇总统计
+        Returns:
+            dict: 冷/热请求平均耗时，以及按差值估算的连接复用节省时间（秒）
+        """
+        with self._lock:
+            cold_avg = self.cold_total / self.cold_count if self.cold_count else None
+            warm_avg = self.warm_total / self.warm_count if self.warm_count else None
+            saved = 0.0
+            if cold_avg is not None and warm_avg is not None:
+                saved = max(0.0, cold_avg - warm_avg) * self.warm_count
+            return {
+                'requests': self.cold_count + self.warm_count,
+                'new_connections': self.cold_count,
+                'reused_connections': self.warm_count,
+                'cold_avg': cold_avg,
+                'warm_avg': warm_avg,
+                'handshake_saved': saved,
+                'last': self.last
+            }
+
+
 class SimpletexService(BaseOcrService):
     """Simpletex的公式识别服务实现"""
-    
+
+    def __init__(self, limiter=None, ledger=None):
+        """
+        Args:
+            limiter: TokenBucket 限流器，为 None 时不限流
+            ledger: QuotaLedger 额度账本，为 None 时不记账
+        """
+        self.limiter = limiter
+        self.ledger = ledger
+        # 服务自持的连接池会话，复用 TCP/TLS 连接
+        pool_size = cfg.poolSize.value
+        self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session = requests.Session()
+        self.session.mount('https://', self._adapter)
+        self.session.mount('http://', self._adapter)
+        self.timing = RequestTimingStats()
+        # 上传前的图像优化，减小请求体积
+        self.preprocessor = None
+        if cfg.preprocessEnabled.value:
+            self.preprocessor = ImagePreprocessor(
+                binary=cfg.preprocessBinarize.value,
+                target_glyph_height=cfg.targetGlyphHeight.value,
+                compression=cfg.pngCompression.value
+            )
+
+    def _connection_count(self):
+        """统计连接池累计新建的连接数"""
+        pools = self._adapter.poolmanager.pools
+        count = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                count += pool.num_connections
+        return count
+
+    def close(self):
+        """关闭会话并释放连接池"""
+        self.session.close()
+
+    def remaining_quota(self):
+        if self.ledger is None:
+            return None
+        return self.ledger.remaining(cfg.token.value)
+
     def recognize(self, image_data):
+        payload = as_payload(image_data)
+        token = cfg.token.value
+        if is_cancelled():
+            return cancelled_result()
+        # 先占用额度，再按限流节奏发出请求
+        with tracer.span('ocr.quota'):
+            reserved = self.ledger is None or self.ledger.try_reserve(token)
+        if not reserved:
+            return failure_result('今日识别额度已用完')
+        with tracer.span('ocr.rate_limit'):
+            acquired = self.limiter is None or self.limiter.acquire(
+                timeout=cfg.readTimeout.value, cancel_event=_cancel_event.get())
+        cancelled = is_cancelled()
+        if not acquired or cancelled:
+            # 拿到令牌后才发现取消的，退还令牌
+            if acquired and self.limiter is not None:
+                self.limiter.cancel()
+            if self.ledger is not None:
+                self.ledger.release(token)
+            if cancelled:
+                return cancelled_result()
+            return failure_result('请求排队超时，请稍后再试', retryable=True)
+
+        def refund():
+            # 请求未被服务端受理（未发出、传输失败或非 2xx 响应），不计入额度
+            if self.ledger is not None:
+                self.ledger.release(token)
+
+        response = None
         try:
             # 将图像编码为二进制
-            _, img_encoded = cv2.imencode('.png', image_data)
+            # 编码结果缓存在 payload 上，重试、对冲和保存历史记录时不再重复编码
+            with tracer.span('ocr.encode'):
+                if self.preprocessor is not None:
+                    img_bytes = payload.encoded(self.preprocessor, lambda image: self.preprocessor.process(image)[0])
+                else:
+                    img_bytes = payload.png()
             
             # 构造请求参数
-            files = [('file', ('formula.png', img_encoded.tobytes(), 'image/png'))]
-            headers = {'token': cfg.token.value}
+            files = [('file', ('formula.png', img_bytes, 'image/png'))]
+            headers = {'token': token}
             
-            # 发送请求
-            response = requests.post(
-                cfg.api_url.value,
-                files=files,
-                headers=headers
-            )
+            # 发送请求（连接超时, 读取超时）
+            connections_before = self._connection_count()
+            start = time.perf_counter()
+            with tracer.span('ocr.http', bytes=len(img_bytes)):
+                response = self.session.post(
+                    cfg.api_url.value,
+                    files=files,
+                    headers=headers,
+                    timeout=(cfg.connectTimeout.value, cfg.readTimeout.value)
+                )
+            elapsed = time.perf_counter() - start
+            self.timing.record(elapsed, self._connection_count() > connections_before)
+
+            if not 200 <= response.status_code < 300:
+                refund()
+            # 限流和服务端错误属于瞬时错误
+            if response.status_code == 429 or response.status_code >= 500:
+                return failure_result(f'服务端繁忙（HTTP {response.status_code}）', retryable=True)
             
             # 解析响应
-            result = response.json()
+            with tracer.span('ocr.json'):
+                result = response.json()
             
             if result.get('status') is True:
                 res_data = result.get('res', {})
@@ -55,37 +251,446 @@ class SimpletexService(BaseOcrService):
                     'message': None
                 }
             else:
-                return {
-                    'status': False,
-                    'latex': None,
-                    'confidence': 0,
-                    'request_id': None,
-                    'message': result.get('message', '未知错误')
-                }
+                return failure_result(result.get('message', '未知错误'))
                 
+        except (requests.ConnectionError, requests.Timeout) as e:
+            # 超时的请求即使已被服务端处理，也会由重试重新占用额度，这里先退还
+            refund()
+            return failure_result(str(e), retryable=True)
         except Exception as e:
+            if response is None:
+                refund()
+            return failure_result(str(e))
+
+class CachedOcrService(BaseOcrService):
+    """带结果缓存的识别服务，相同像素的图片不再重复调用接口"""
+
+    def __init__(self, service, cache):
+        """
+        Args:
+            service: 被包装的识别服务
+            cache: OcrResultCache 缓存实例
+        """
+        self.service = service
+        self.cache = cache
+
+    def remaining_quota(self):
+        return self.service.remaining_quota()
+
+    def recognize(self, image_data):
+        payload = as_payload(image_data)
+        with tracer.span('ocr.cache_lookup'):
+            digest = payload.digest
+            # 强制识别不读缓存，但仍用新结果覆盖旧条目
+            entry = None if payload.bypass_cache else self.cache.get(digest)
+        if entry is not None:
             return {
-                'status': False,
-                'latex': None,
-                'confidence': 0,
-                'request_id': None,
-                'message': str(e)
+                'status': True,
+                'latex': entry['latex'],
+                'confidence': entry['confidence'],
+                # 历史记录以 request_id 去重，缓存命中需要新的 ID
+                'request_id': f'cache-{uuid.uuid4().hex}',
+                'message': None,
+                'cached': True
             }
 
+        result = self.service.recognize(payload)
+        if result['status']:
+            with tracer.span('ocr.cache_store'):
+                self.cache.put(digest, result['latex'], result['confidence'], result['request_id'])
+        return result
+
+
+class ResilientOcrService(BaseOcrService):
+    """带重试、指数退避和熔断的识别服务包装"""
+
+    def __init__(self, service, policy, breaker, metrics=None, idempotency_ttl=60.0):
+        """
+        Args:
+            service: 被包装的识别服务
+            policy: RetryPolicy 重试策略
+            breaker: CircuitBreaker 熔断器
+            metrics: ResilienceMetrics 指标，为 None 时新建
+            idempotency_ttl: 同一图片成功结果的复用时间（秒），避免重试重复消耗额度
+        """
+        self.service = service
+        self.policy = policy
+        self.breaker = breaker
+        self.metrics = metrics or ResilienceMetrics()
+        self.idempotency_ttl = idempotency_ttl
+        self._recent = {}  # 图片摘要 -> (完成时间, 结果)
+        self._lock = threading.Lock()
+
+    def remaining_quota(self):
+        return self.service.remaining_quota()
+
+    def _recent_result(self, key):
+        now = time.monotonic()
+        with self._lock:
+            # 顺带清理过期条目
+            expired = [k for k, (t, _) in self._recent.items() if now - t > self.idempotency_ttl]
+            for k in expired:
+                del self._recent[k]
+            entry = self._recent.get(key)
+        return dict(entry[1]) if entry else None
+
+    def recognize(self, image_data):
+        self.metrics.incr('calls')
+        payload = as_payload(image_data)
+        key = payload.digest
+        recent = None if payload.bypass_cache else self._recent_result(key)
+        if recent is not None:
+            self.metrics.incr('deduplicated')
+            return recent
+
+        result = None
+        for attempt in range(1, self.policy.max_attempts + 1):
+            if is_cancelled():
+                self.metrics.incr('failures')
+                return cancelled_result()
+            if not self.breaker.allow():
+                self.metrics.incr('short_circuited')
+                self.metrics.incr('failures')
+                return failure_result(
+                    f'识别服务暂不可用，请 {self.breaker.retry_after():.0f} 秒后再试', retryable=True)
+
+            self.metrics.incr('attempts')
+            try:
+                result = self.service.recognize(payload)
+            except BaseException:
+                self.breaker.release()
+                raise
+            if result['status']:
+                self.breaker.record_success()
+                self.metrics.incr('successes')
+                with self._lock:
+                    self._recent[key] = (time.monotonic(), result)
+                return result
+
+            if not result.get('retryable'):
+                # 非瞬时错误（额度用完、令牌错误等）不重试，也不计入熔断；
+                # 但若本次是半开探测，必须结束探测，否则熔断器会一直拒绝请求
+                self.breaker.release()
+                self.metrics.incr('failures')
+                return result
+
+            self.breaker.record_failure()
+            if attempt < self.policy.max_attempts:
+                self.metrics.incr('retries')
+                delay = self.policy.delay(attempt)
+                # 诊断信息写到 stderr，stdout 只输出识别结果
+                print(f"Retry {attempt}/{self.policy.max_attempts - 1} for {key[:8]} in {delay:.2f}s: {result['message']}",
+                      file=sys.stderr)
+                event = _cancel_event.get()
+                if event is not None:
+                    event.wait(delay)
+                else:
+                    time.sleep(delay)
+
+        self.metrics.incr('failures')
+        return result
+
+
+class SingleFlightOcrService(BaseOcrService):
+    """合并并发的相同请求：同一像素摘要在途时，后来者等待并共享首个请求的结果"""
+
+    def __init__(self, service):
+        """
+        Args:
+            service: 被包装的识别服务
+        """
+        self.service = service
+        self._inflight = {}  # 图片摘要 -> Future
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.collapsed = 0
+
+    def remaining_quota(self):
+        return self.service.remaining_quota()
+
+    def stats(self):
+        with self._lock:
+            return {'calls': self.calls, 'collapsed': self.collapsed, 'inflight': len(self._inflight)}
+
+    def recognize(self, image_data):
+        payload = as_payload(image_data)
+        if payload.bypass_cache:
+            # 强制识别不共享他人的结果
+            return self.service.recognize(payload)
+        key = payload.digest
+        with self._lock:
+            self.calls += 1
+        while True:
+            with self._lock:
+                future = self._inflight.get(key)
+                leader = future is None
+                if leader:
+                    future = self._inflight[key] = Future()
+                else:
+                    self.collapsed += 1
+            if leader:
+                break
+            shared = future.result()
+            if shared is None:
+                # 首个请求被取消或中断，其结果不代表这张图片，重新识别
+                continue
+            result = dict(shared)
+            if result['status']:
+                # 历史记录以 request_id 去重，合并的请求需要新的 ID
+                result['request_id'] = f'flight-{uuid.uuid4().hex}'
+                result['collapsed'] = True
+            return result
+
+        result = None
+        try:
+            result = self.service.recognize(payload)
+        except Exception as e:
+            result = failure_result(str(e))
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            # 任何情况下都要唤醒等待者（包括 BaseException）；取消的结果只属于首个请求自己
+            cancelled = result is not None and not result['status'] and is_cancelled()
+            future.set_result(None if result is None or cancelled else result)
+        return result
+
+
+class ScheduledOcrService(BaseOcrService):
+    """经优先级调度器排队后再调用识别服务，优先级取自调用链上的 priority_scope"""
+
+    def __init__(self, service, scheduler):
+        """
+        Args:
+            service: 被包装的识别服务
+            scheduler: OcrScheduler 调度器
+        """
+        self.service = service
+        self.scheduler = scheduler
+
+    def remaining_quota(self):
+        return self.service.remaining_quota()
+
+    def recognize(self, image_data):
+        future = self.scheduler.submit(self.service.recognize, as_payload(image_data), priority=current_priority())
+        return future.result()
+
+
+class PriorityOcrService(BaseOcrService):
+    """以固定优先级调用同一条服务链，用于区分交互请求和批量请求"""
+
+    def __init__(self, service, priority):
+        """
+        Args:
+            service: 共享的识别服务链
+            priority: PRIORITY_INTERACTIVE 或 PRIORITY_BULK
+        """
+        self.service = service
+        self.priority = priority
+
+    def remaining_quota(self):
+        return self.service.remaining_quota()
+
+    def recognize(self, image_data):
+        with priority_scope(self.priority):
+            return self.service.recognize(image_data)
+
+
+class HedgedOcrService(BaseOcrService):
+    """
+    对冲请求：同一张图片按各自的延迟依次发给多个识别服务（或同一服务），
+    首个请求足够快时后续请求根本不会发出；返回最先成功或置信度最高的结果。
+    选定结果后取消其余请求：未开始的不再执行，已开始的在发出 HTTP 请求前放弃（见 cancel_scope）。
+    """
+
+    def __init__(self, providers, mode='first', best_window=0.5, max_workers=8):
+        """
+        Args:
+            providers: [(service, delay)]，delay 为相对首个请求的启动延迟（秒）
+            mode: 'first' 返回最先成功的结果；'best' 在首个成功后再等 best_window 秒，取置信度最高者
+            best_window: 'best' 模式下首个成功后额外等待的秒数
+            max_workers: 执行请求的线程数
+        """
+        self.providers = sorted(providers, key=lambda p: p[1])
+        self.mode = mode
+        self.best_window = best_window
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='HedgedOcr')
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'hedges_launched': 0, 'hedges_skipped': 0, 'hedges_cancelled': 0, 'hedge_wins': 0}
+
+    def remaining_quota(self):
+        return self.providers[0][0].remaining_quota()
+
+    def _count(self, key, value=1):
+        with self._lock:
+            self.stats[key] += value
+
+    def recognize(self, image_data):
+        self._count('calls')
+        payload = as_payload(image_data)
+        cond = threading.Condition()
+        finished = []  # [(provider_index, result)]
+        futures = []
+        cancel_event = threading.Event()
+        priority = current_priority()
+
+        def run(index, service):
+            try:
+                with cancel_scope(cancel_event), priority_scope(priority):
+                    result = service.recognize(payload)
+            except Exception as e:
+                result = failure_result(str(e), retryable=True)
+            with cond:
+                finished.append((index, result))
+                cond.notify_all()
+
+        start = time.monotonic()
+        launched = 0
+        first_success_at = None
+        with cond:
+            while True:
+                now = time.monotonic()
+                successes = [(i, r) for i, r in finished if r['status']]
+                if successes and first_success_at is None:
+                    first_success_at = now
+                if successes and (self.mode == 'first' or len(finished) == launched
+                                  or now - first_success_at >= self.best_window):
+                    break
+                if not successes and launched == len(self.providers) and len(finished) == launched:
+                    break
+
+                # 尚无成功结果时，启动所有已到启动时间的请求；已发出的请求全部失败时立即启动下一个
+                while not successes and launched < len(self.providers) and (
+                        now - start >= self.providers[launched][1] or len(finished) == launched):
+                    if launched > 0:
+                        self._count('hedges_launched')
+                    futures.append(self._executor.submit(run, launched, self.providers[launched][0]))
+                    launched += 1
+
+                # 等待到下一个请求的启动时间，或有请求完成
+                timeouts = []
+                if not successes and launched < len(self.providers):
+                    timeouts.append(start + self.providers[launched][1] - now)
+                if first_success_at is not None:
+                    timeouts.append(first_success_at + self.best_window - now)
+                cond.wait(max(0.0, min(timeouts)) if timeouts else None)
+
+            # 未启动的对冲请求不再发出；已提交的请求取消，尚未占用额度和令牌的不再发出
+            self._count('hedges_skipped', len(self.providers) - launched)
+            cancel_event.set()
+            pending = [future for future in futures if not future.done()]
+            self._count('hedges_cancelled', sum(future.cancel() for future in pending))
+            if not successes:
+                return finished[-1][1]
+            index, result = max(successes, key=lambda item: item[1]['confidence']) \
+                if self.mode == 'best' else successes[0]
+
+        if index > 0:
+            self._count('hedge_wins')
+        return result
+
+
 class OcrServiceFactory:
     """公式识别服务工厂类"""
+
+    # 同一进程内所有服务实例共享的限流器、额度账本和调度器
+    _limiter = None
+    _ledger = None
+    _scheduler = None
+
+    @classmethod
+    def shared_limiter(cls):
+        """共享的令牌桶限流器"""
+        if cls._limiter is None:
+            cls._limiter = TokenBucket(cfg.requestsPerMinute.value / 60, cfg.rateBurst.value)
+            cfg.requestsPerMinute.valueChanged.connect(lambda v: cls._limiter.set_rate(v / 60))
+            cfg.rateBurst.valueChanged.connect(lambda v: cls._limiter.set_rate(cls._limiter.rate, v))
+        return cls._limiter
+
+    @classmethod
+    def shared_ledger(cls):
+        """共享的额度账本"""
+        if cls._ledger is None:
+            cls._ledger = QuotaLedger(daily_limit=cfg.dailyQuota.value)
+            cfg.dailyQuota.valueChanged.connect(lambda v: setattr(cls._ledger, 'daily_limit', v))
+        return cls._ledger
     
+    @classmethod
+    def shared_scheduler(cls):
+        """共享的优先级调度器"""
+        if cls._scheduler is None:
+            workers = cfg.schedulerWorkers.value
+            cls._scheduler = OcrScheduler(workers, {
+                PRIORITY_INTERACTIVE: workers,
+                PRIORITY_BULK: min(workers, cfg.bulkConcurrency.value)
+            })
+        return cls._scheduler
+
     @staticmethod
-    def create_service():
+    def with_priority(service, priority):
         """
-        根据配置创建对应的识别服务
+        以指定优先级复用已创建的服务链
+        Args:
+            service: create_service 返回的服务
+            priority: PRIORITY_INTERACTIVE 或 PRIORITY_BULK
+        """
+        return PriorityOcrService(service, priority)
+
+    @staticmethod
+    def create_backend(service_type):
+        """
+        创建单个识别服务商的实现（带重试和熔断）
+        Args:
+            service_type: 服务类型名称
         Returns:
             BaseOcrService: 识别服务实例
         """
-        service_type = cfg.type.value
-        
         if service_type == 'Simpletex':
-            return SimpletexService()
+            service = SimpletexService(
+                limiter=OcrServiceFactory.shared_limiter(),
+                ledger=OcrServiceFactory.shared_ledger()
+            )
         # 在这里添加其他服务的实现
         else:
-            raise ValueError(f'Unsupported OCR service type: {service_type}') 
\ No newline at end of file
+            raise ValueError(f'Unsupported OCR service type: {service_type}')
+
+        return ResilientOcrService(
+            service,
+            RetryPolicy(max_attempts=cfg.retryMaxAttempts.value),
+            CircuitBreaker(
+                failure_threshold=cfg.circuitFailureThreshold.value,
+                recovery_timeout=cfg.circuitRecoverySeconds.value
+            )
+        )
+
+    @staticmethod
+    def create_service():
+        """
+        根据配置创建对应的识别服务
+        Returns:
+            BaseOcrService: 识别服务实例
+        """
+        service_type = cfg.type.value
+        service = OcrServiceFactory.create_backend(service_type)
+
+        if cfg.hedgeEnabled.value:
+            # 未配置其他服务商时，对冲请求发给同一服务商
+            delay = cfg.hedgeDelayMs.value / 1000
+            providers = [(service, 0.0)]
+            for i, name in enumerate(cfg.hedgeProviders.value or [service_type], 1):
+                backend = service if name == service_type else OcrServiceFactory.create_backend(name)
+                providers.append((backend, i * delay))
+            service = HedgedOcrService(providers, mode=cfg.hedgeMode.value)
+
+        # 交互请求优先于批量请求出队
+        service = ScheduledOcrService(service, OcrServiceFactory.shared_scheduler())
+
+        # 合并相同图片的并发请求，节省额度和带宽
+        service = SingleFlightOcrService(service)
+
+        if cfg.cacheEnabled.value:
+            cache = OcrResultCache(
+                max_entries=cfg.cacheMaxEntries.value,
+                max_age_days=cfg.cacheMaxAgeDays.value
+            )
+            service = CachedOcrService(service, cache)
+        return service
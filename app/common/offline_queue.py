@@ -0,0 +1,199 @@
+# coding: utf-8
+import os
+import socket
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+import cv2
+import numpy as np
+
+
+class OfflineQueue:
+    """持久化的离线识别队列：网络不可用时暂存图片，恢复后按入队顺序重新识别"""
+
+    def __init__(self, db_path='app/data/offline_queue.db'):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=10)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS pending (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created REAL NOT NULL,
+                image BLOB NOT NULL,
+                user_id TEXT,
+                record_id INTEGER,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt REAL NOT NULL DEFAULT 0,
+                last_error TEXT
+            )
+        ''')
+        self._conn.commit()
+
+    def enqueue(self, image_png, user_id, record_id):
+        """
+        加入队列
+        Args:
+            image_png: PNG 编码的图片字节
+            user_id: 所属用户
+            record_id: 对应的占位历史记录 ID
+        Returns:
+            int: 队列条目 ID
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT INTO pending (created, image, user_id, record_id) VALUES (?, ?, ?, ?)',
+                (time.time(), image_png, user_id, record_id)
+            )
+            self._conn.commit()
+            return cursor.lastrowid
+
+    def head(self):
+        """
+        最早入队的条目
+        Returns:
+            tuple | None: (id, image, user_id, record_id, attempts, next_attempt)
+        """
+        with self._lock:
+            return self._conn.execute('''
+                SELECT id, image, user_id, record_id, attempts, next_attempt
+                FROM pending ORDER BY id LIMIT 1
+            ''').fetchone()
+
+    def defer(self, entry_id, error, delay):
+        """记录失败并推迟下次尝试"""
+        with self._lock:
+            self._conn.execute('''
+                UPDATE pending SET attempts = attempts + 1, last_error = ?, next_attempt = ?
+                WHERE id = ?
+            ''', (error, time.time() + delay, entry_id))
+            self._conn.commit()
+
+    def remove(self, entry_id):
+        with self._lock:
+            self._conn.execute('DELETE FROM pending WHERE id = ?', (entry_id,))
+            self._conn.commit()
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM pending').fetchone()[0]
+
+
+def is_reachable(url, timeout=3.0):
+    """TCP 探测识别服务端点是否可达，不消耗接口额度"""
+    parsed = urlparse(url)
+    port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+    try:
+        with socket.create_connection((parsed.hostname, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+class QueueDrainer:
+    """后台线程：端点可达时按顺序重新识别离线队列中的图片，并回填历史记录"""
+
+    def __init__(self, queue, service, db, url_getter, on_finished=None,
+                 poll_interval=15.0, max_backoff=300.0, max_attempts=20):
+        """
+        Args:
+            queue: OfflineQueue 离线队列
+            service: BaseOcrService 识别服务（应使用批量优先级）
+            db: DatabaseManager 数据库管理器
+            url_getter: 返回当前接口地址的函数，用于探测连通性
+            on_finished: 条目处理完成回调 callback(record_id, result)
+            poll_interval: 队列为空或端点不可达时的轮询间隔（秒）
+            max_backoff: 单个条目失败后的最大推迟秒数
+            max_attempts: 瞬时错误的最大尝试次数，超过后放弃该条目（非瞬时错误首次即放弃）
+        """
+        self.queue = queue
+        self.service = service
+        self.db = db
+        self.url_getter = url_getter
+        self.on_finished = on_finished
+        self.poll_interval = poll_interval
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='OfflineQueueDrainer', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def notify(self):
+        """有新条目入队时唤醒"""
+        self._wakeup.set()
+
+    def _sleep(self, seconds):
+        self._wakeup.wait(seconds)
+        self._wakeup.clear()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self._step()
+            except Exception as e:
+                # 数据库错误（如超过 busy_timeout 仍被锁定）等不能让后台线程退出，稍后重试
+                print(f"Offline queue drainer error: {e}")
+                self._sleep(self.poll_interval)
+
+    def _step(self):
+        """处理一轮：队首未到重试时间或端点不可达时等待，否则识别队首条目"""
+        entry = self.queue.head()
+        if entry is None:
+            self._sleep(self.poll_interval)
+            return
+
+        entry_id, image_png, user_id, record_id, attempts, next_attempt = entry
+        wait = next_attempt - time.time()
+        if wait > 0:
+            self._sleep(min(wait, self.poll_interval))
+            return
+        if not is_reachable(self.url_getter()):
+            self._sleep(self.poll_interval)
+            return
+
+        self.drain_one(entry_id, image_png, record_id, attempts)
+
+    def drain_one(self, entry_id, image_png, record_id, attempts):
+        """处理队首条目"""
+        image = cv2.imdecode(np.frombuffer(image_png, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            return self._give_up(entry_id, record_id, '图片无法解码')
+
+        try:
+            result = self.service.recognize(image)
+        except Exception as e:
+            result = {'status': False, 'message': str(e), 'retryable': True}
+
+        if result['status']:
+            self.db.update_record_result(record_id, result['latex'], result['confidence'], result['request_id'])
+            self.queue.remove(entry_id)
+            print(f"Offline recognition finished for record {record_id}")
+            if self.on_finished is not None:
+                self.on_finished(record_id, result)
+            return
+
+        # 非瞬时错误（令牌无效、额度用完等）重试也不会成功，只会继续消耗额度
+        if not result.get('retryable') or attempts + 1 >= self.max_attempts:
+            return self._give_up(entry_id, record_id, result['message'] or '未知错误')
+
+        # 队首失败时推迟整个队列，保持处理顺序
+        delay = min(self.max_backoff, self.poll_interval * (2 ** min(attempts, 10)))
+        self.queue.defer(entry_id, result['message'], delay)
+
+    def _give_up(self, entry_id, record_id, message):
+        """放弃条目，并把占位记录标记为识别失败"""
+        print(f"Offline recognition gave up for record {record_id}: {message}")
+        # 先出队：即使随后写历史记录失败，也不会再次调用接口
+        self.queue.remove(entry_id)
+        self.db.mark_record_failed(record_id, message)
@@ -0,0 +1,225 @@
+# coding: utf-8
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from .image_payload import ImagePayload
+from .image_preprocess import binarize
+from .tracing import tracer
+
+
+class Region:
+    """页面中的一个待识别区域"""
+
+    __slots__ = ('order', 'line', 'x', 'y', 'w', 'h')
+
+    def __init__(self, order, line, x, y, w, h):
+        self.order = order
+        self.line = line
+        self.x, self.y, self.w, self.h = x, y, w, h
+
+    @property
+    def bbox(self):
+        return self.x, self.y, self.w, self.h
+
+    def crop(self, image, padding=6):
+        """按区域裁剪原图，保留 padding 像素边距"""
+        height, width = image.shape[:2]
+        x0, y0 = max(0, self.x - padding), max(0, self.y - padding)
+        x1, y1 = min(width, self.x + self.w + padding), min(height, self.y + self.h + padding)
+        return image[y0:y1, x0:x1]
+
+    def __repr__(self):
+        return f'Region(order={self.order}, line={self.line}, bbox={self.bbox})'
+
+
+def _row_runs(profile):
+    """投影中连续非零的区间 [(start, end)]"""
+    ink = np.concatenate(([0], (profile > 0).astype(np.int8), [0]))
+    edges = np.flatnonzero(np.diff(ink))
+    return list(zip(edges[::2], edges[1::2]))
+
+
+def _line_bands(ink, line_gap_ratio):
+    """水平投影切分文本行，间距很小的相邻行（分式的分子/分母、上下标）合并为一行"""
+    runs = _row_runs(np.count_nonzero(ink, axis=1))
+    if not runs:
+        return []
+    median_height = float(np.median([end - start for start, end in runs]))
+    min_gap = max(2, int(median_height * line_gap_ratio))
+    bands = [list(runs[0])]
+    for start, end in runs[1:]:
+        if start - bands[-1][1] < min_gap:
+            bands[-1][1] = end
+        else:
+            bands.append([start, end])
+
+    # 很薄的行（分数线、上划线）与上下相邻的行属于同一个公式
+    thin = median_height * 0.4
+    merged = []
+    attach_next = False
+    for start, end in bands:
+        is_thin = end - start < thin
+        near_prev = merged and start - merged[-1][1] < median_height
+        if near_prev and (attach_next or is_thin):
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+        attach_next = is_thin
+    return merged
+
+
+def segment_regions(image, line_gap_ratio=0.25, word_gap_ratio=1.0, min_area=12, max_regions=64):
+    """
+    版面分析：找出页面截图中的公式/文本块
+    1. 二值化后用连通域去掉噪点
+    2. 水平投影切分文本行
+    3. 行内按连通域的水平间距聚类，间距超过 word_gap_ratio 倍行高的视为不同区域
+    Args:
+        image: OpenCV格式的图像数据
+        line_gap_ratio: 行间距小于该比例 × 行高中位数时合并为一行
+        word_gap_ratio: 行内水平间距大于该比例 × 行高时拆分区域
+        min_area: 小于该面积（像素）的连通域视为噪点
+        max_regions: 区域数上限，超过时按行合并
+    Returns:
+        list[Region]: 按阅读顺序（自上而下、自左向右）排列的区域
+    """
+    ink = cv2.bitwise_not(binarize(image))
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    keep = np.zeros(count, dtype=bool)
+    keep[1:] = stats[1:, cv2.CC_STAT_AREA] >= min_area
+    ink = np.where(keep[labels], 255, 0).astype(np.uint8)
+
+    bands = _line_bands(ink, line_gap_ratio)
+    if not bands:
+        return []
+
+    # 连通域按垂直中心归入所在的行
+    components = [[] for _ in bands]
+    starts = np.array([start for start, _ in bands])
+    for i in np.flatnonzero(keep):
+        x, y, w, h = stats[i, :4]
+        band = int(np.searchsorted(starts, y + h / 2, side='right')) - 1
+        components[max(0, band)].append((x, y, w, h))
+
+    lines = []
+    for (top, bottom), boxes in zip(bands, components):
+        if not boxes:
+            continue
+        boxes.sort()
+        word_gap = max(8, (bottom - top) * word_gap_ratio)
+        clusters = []
+        for x, y, w, h in boxes:
+            if clusters and x - clusters[-1][2] <= word_gap:
+                cluster = clusters[-1]
+                cluster[1] = min(cluster[1], y)
+                cluster[2] = max(cluster[2], x + w)
+                cluster[3] = max(cluster[3], y + h)
+            else:
+                clusters.append([x, y, x + w, y + h])
+        lines.append(clusters)
+
+    # 区域过多时（如整页正文）以整行为单位识别
+    if sum(len(clusters) for clusters in lines) > max_regions:
+        lines = [[[min(c[0] for c in clusters), min(c[1] for c in clusters),
+                   max(c[2] for c in clusters), max(c[3] for c in clusters)]] for clusters in lines]
+
+    regions = []
+    for line, clusters in enumerate(lines):
+        for x0, y0, x1, y1 in clusters:
+            regions.append(Region(len(regions), line, int(x0), int(y0), int(x1 - x0), int(y1 - y0)))
+    return regions[:max_regions]
+
+
+class PageRecognizer:
+    """整页识别：版面分析后并行识别各区域，每个区域写入一条历史记录"""
+
+    def __init__(self, service, db, workers=4, user_id=None, padding=6):
+        """
+        Args:
+            service: BaseOcrService 识别服务
+            db: DatabaseManager 数据库管理器，为 None 时不写历史记录
+            workers: 并行识别的区域数
+            user_id: 历史记录所属用户
+            padding: 裁剪区域时保留的边距（像素）
+        """
+        self.service = service
+        self.db = db
+        self.workers = workers
+        self.user_id = user_id
+        self.padding = padding
+
+    def recognize_region(self, image, region):
+        """识别单个区域"""
+        payload = ImagePayload(region.crop(image, self.padding))
+        result = self.service.recognize(payload)
+        item = {
+            'order': region.order,
+            'line': region.line,
+            'bbox': region.bbox,
+            'status': result['status'],
+            'latex': result.get('latex', ''),
+            'confidence': result.get('confidence', 0.0),
+            'request_id': result.get('request_id', ''),
+            'message': result.get('message'),
+            'record_id': None
+        }
+        if result['status'] and self.db is not None:
+            item['record_id'] = self.db.add_record(
+                payload.png(),
+                result['latex'],
+                result['confidence'],
+                result['request_id'],
+                user_id=self.user_id,
+                thumbnail=payload.thumbnail()
+            )
+        return item
+
+    def recognize(self, image, regions=None, progress_callback=None):
+        """
+        识别整页
+        Args:
+            image: OpenCV格式的图像数据
+            regions: 预先分析好的区域，为 None 时自动分析
+            progress_callback: 每个区域完成时回调 callback(done, total)
+        Returns:
+            list[dict]: 按阅读顺序排列的识别结果，含 order、line、bbox、latex、confidence、record_id 等
+        """
+        if regions is None:
+            with tracer.span('page.segment'):
+                regions = segment_regions(image)
+        if not regions:
+            return []
+
+        results = []
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(regions)),
+                                thread_name_prefix='PageRecognizer') as executor:
+            futures = [executor.submit(self.recognize_region, image, region) for region in regions]
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    region = regions[len(results)]
+                    results.append({
+                        'order': region.order, 'line': region.line, 'bbox': region.bbox,
+                        'status': False, 'latex': '', 'confidence': 0.0, 'request_id': '',
+                        'message': str(e), 'record_id': None
+                    })
+                if progress_callback is not None:
+                    progress_callback(len(results), len(regions))
+        return results
+
+
+def join_results(results, separator='\n\n'):
+    """按阅读顺序拼接区域结果，同一行的区域以空格连接"""
+    lines = []
+    current = None
+    for item in results:
+        if not item['status']:
+            continue
+        if item['line'] != current:
+            lines.append([])
+            current = item['line']
+        lines[-1].append(item['latex'])
+    return separator.join(' '.join(parts) for parts in lines)
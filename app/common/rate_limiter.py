@@ -0,0 +1,192 @@
+# coding: utf-8
+import hashlib
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+
+from .ocr_scheduler import PRIORITY_INTERACTIVE, current_priority
+
+# 等待令牌期间检查取消事件的间隔（秒）
+CANCEL_POLL_INTERVAL = 0.05
+
+
+class TokenBucket:
+    """
+    令牌桶限流器
+
+    令牌不足时调用方排队，令牌恢复时逐个发放给有效优先级最高的等待者：交互请求先于批量请求，
+    同优先级先到先得；与 OcrScheduler 相同的老化规则保证批量请求不会饿死。
+    桶内预留少量令牌只给交互请求，持续的批量负载耗尽令牌时交互请求也不必等待令牌恢复。
+    多个调用方因此被均匀地错开，而不是在令牌恢复的瞬间一起涌向服务端。
+    """
+
+    def __init__(self, rate, burst=1, aging_interval=10.0, interactive_reserve=1):
+        """
+        Args:
+            rate: 每秒补充的令牌数
+            burst: 桶容量，即允许的最大突发请求数
+            aging_interval: 排队等待者提升一级优先级所需的秒数
+            interactive_reserve: 交互请求专用的令牌数，批量请求只在桶内令牌多于该数时取用（不超过 burst - 1）
+        """
+        self.rate = float(rate)
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.aging_interval = aging_interval
+        self.interactive_reserve = interactive_reserve
+        self._cond = threading.Condition()
+        self._waiters = []  # [(优先级, 序号, 入队时间)]
+        self._seq = itertools.count()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _head(self, now):
+        """有效优先级最高的等待者（调用方需持有锁）"""
+        return min(self._waiters, key=lambda w: (w[0] - (now - w[2]) / self.aging_interval, w[1]))
+
+    def _needed(self, priority):
+        """取走一个令牌时桶内至少要有的令牌数"""
+        if priority <= PRIORITY_INTERACTIVE:
+            return 1
+        return 1 + max(0, min(self.interactive_reserve, self.capacity - 1))
+
+    def cancel(self):
+        """退还一个已获取但未使用的令牌"""
+        with self._cond:
+            self.tokens = min(self.capacity, self.tokens + 1)
+            self._cond.notify_all()
+
+    def acquire(self, timeout=None, cancel_event=None, priority=None):
+        """
+        获取一个令牌，必要时排队等待
+        Args:
+            timeout: 最长等待秒数，None 表示一直等待
+            cancel_event: threading.Event，等待期间被设置时放弃排队并返回 False
+            priority: 排队优先级，None 表示取调用链上的 current_priority()
+        Returns:
+            bool: 是否获取成功
+        """
+        now = time.monotonic()
+        waiter = (current_priority() if priority is None else priority, next(self._seq), now)
+        deadline = None if timeout is None else now + timeout
+        with self._cond:
+            self._waiters.append(waiter)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    head = self._head(now) is waiter
+                    needed = self._needed(waiter[0])
+                    if head and self.tokens >= needed:
+                        self.tokens -= 1
+                        return True
+                    if (cancel_event is not None and cancel_event.is_set()) or \
+                            (deadline is not None and now >= deadline):
+                        return False
+                    # 队首等到下一个令牌恢复；其他等待者等队首取走令牌后被唤醒，
+                    # 但至少在下一个令牌恢复时重新比较一次（老化可能改变队首）
+                    wait = max((needed - self.tokens) / self.rate, CANCEL_POLL_INTERVAL if not head else 0.0)
+                    if deadline is not None:
+                        wait = min(wait, deadline - now)
+                    if cancel_event is not None:
+                        wait = min(wait, CANCEL_POLL_INTERVAL)
+                    self._cond.wait(wait)
+            finally:
+                self._waiters.remove(waiter)
+                # 队首变化，唤醒其他等待者重新比较
+                self._cond.notify_all()
+
+    def set_rate(self, rate, burst=None):
+        """调整速率和容量"""
+        with self._cond:
+            self._refill(time.monotonic())
+            self.rate = float(rate)
+            if burst is not None:
+                self.capacity = float(burst)
+                self.tokens = min(self.tokens, self.capacity)
+            self._cond.notify_all()
+
+
+class QuotaLedger:
+    """按令牌、按自然日持久化记录接口调用次数"""
+
+    def __init__(self, db_path='app/data/quota.db', daily_limit=500):
+        """
+        Args:
+            db_path: 账本数据库路径
+            daily_limit: 每日调用上限，0 表示不限
+        """
+        self.db_path = db_path
+        self.daily_limit = daily_limit
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=10)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS quota_usage (
+                token_key TEXT NOT NULL,
+                day TEXT NOT NULL,
+                used INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (token_key, day)
+            )
+        ''')
+        self._conn.commit()
+
+    @staticmethod
+    def _key(token):
+        # 不落盘明文令牌
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()[:16]
+
+    def used(self, token, day=None):
+        """当日已用次数"""
+        day = day or date.today().isoformat()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT used FROM quota_usage WHERE token_key=? AND day=?',
+                (self._key(token), day)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def remaining(self, token):
+        """当日剩余次数，不限额时返回 None"""
+        if not self.daily_limit:
+            return None
+        return max(0, self.daily_limit - self.used(token))
+
+    def try_reserve(self, token):
+        """
+        占用一次额度（跨进程原子）
+        Returns:
+            bool: 额度是否充足
+        """
+        key, day = self._key(token), date.today().isoformat()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR IGNORE INTO quota_usage (token_key, day, used) VALUES (?, ?, 0)',
+                (key, day)
+            )
+            if self.daily_limit:
+                cursor = self._conn.execute(
+                    'UPDATE quota_usage SET used = used + 1 WHERE token_key=? AND day=? AND used < ?',
+                    (key, day, self.daily_limit)
+                )
+            else:
+                cursor = self._conn.execute(
+                    'UPDATE quota_usage SET used = used + 1 WHERE token_key=? AND day=?',
+                    (key, day)
+                )
+            self._conn.commit()
+            return cursor.rowcount == 1
+
+    def release(self, token):
+        """退还一次额度（请求未到达服务端时）"""
+        with self._lock:
+            self._conn.execute(
+                'UPDATE quota_usage SET used = used - 1 WHERE token_key=? AND day=? AND used > 0',
+                (self._key(token), date.today().isoformat())
+            )
+            self._conn.commit()
@@ -0,0 +1,278 @@
+# coding: utf-8
+import itertools
+import threading
+import time
+import uuid
+
+import cv2
+import numpy as np
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QImage
+
+from .image_hash import dhash, to_signed64
+from .image_payload import ImagePayload
+from .page_segment import PageRecognizer, segment_regions
+from .tracing import tracer
+from .user_manager import userManager
+
+
+def qimage_to_bgr(image):
+    """
+    将 QImage 转换为 OpenCV 的 BGR 数组
+    Args:
+        image: QImage 对象（任意格式）
+    Returns:
+        numpy.ndarray: BGR 格式的图像数据
+    """
+    with tracer.span('task.qimage_to_numpy'):
+        image = image.convertToFormat(QImage.Format_RGBA8888)
+        width = image.width()
+        height = image.height()
+        bytes_per_line = image.bytesPerLine()
+        ptr = image.constBits()
+        ptr.setsize(height * bytes_per_line)
+        # 按行跨度读取，避免行尾填充字节导致图像错位
+        arr = np.frombuffer(ptr, np.uint8).reshape((height, bytes_per_line // 4, 4))[:, :width]
+    with tracer.span('task.cvtColor'):
+        return cv2.cvtColor(arr, cv2.COLOR_RGBA2BGR)
+
+
+class RecognitionSignals(QObject):
+    """ 识别任务信号，任务均以 task_id 区分 """
+
+    stageChanged = pyqtSignal(int, str)
+    finished = pyqtSignal(int, dict)
+    failed = pyqtSignal(int, str)
+    cancelled = pyqtSignal(int)
+    deferred = pyqtSignal(int, int, str)  # (task_id, 占位记录 ID, 失败原因)
+
+
+class RecognitionTask(QRunnable):
+    """ 在线程池中执行的公式识别任务：图像转换 → 识别 → 保存记录 """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, service, db, image, index=None, force=False, offline_queue=None):
+        """
+        Args:
+            service: BaseOcrService 识别服务
+            db: DatabaseManager 数据库管理器
+            image: QImage 待识别图像（会复制一份，与界面对象解耦）
+            index: DuplicateIndex 相似图片索引，为 None 时不查重
+            force: 为 True 时跳过相似图片查找和结果缓存，强制调用识别接口
+            offline_queue: OfflineQueue 离线队列，网络类错误时暂存图片，为 None 时直接报错
+        """
+        super().__init__()
+        self.id = next(self._ids)
+        self.service = service
+        self.db = db
+        self.image = QImage(image).copy()
+        self.index = index
+        self.force = force
+        self.offline_queue = offline_queue
+        current_user = userManager.get_current_user()
+        self.user_id = current_user['id'] if current_user else 'default'
+        self.signals = RecognitionSignals()
+        self._cancelled = threading.Event()
+        self.created = tracer.now()
+
+    def cancel(self):
+        """请求取消任务，在下一个阶段边界生效"""
+        self._cancelled.set()
+
+    def isCancelled(self):
+        return self._cancelled.is_set()
+
+    def _checkpoint(self, stage):
+        """进入新阶段前检查取消状态并报告进度"""
+        if self.isCancelled():
+            return False
+        self.signals.stageChanged.emit(self.id, stage)
+        return True
+
+    def _accept(self, payload):
+        """图像转换后、识别前的过滤钩子，返回 False 时任务以取消结束"""
+        return True
+
+    def run(self):
+        started = tracer.now()
+        tracer.record('task.queue_wait', self.created, started - self.created)
+        try:
+            with tracer.span('task.run', task_id=self.id):
+                self._run()
+        except Exception as e:
+            print(f"Recognition task {self.id} error: {str(e)}")
+            self.signals.failed.emit(self.id, str(e))
+
+    def _run(self):
+        if not self._checkpoint('正在转换图像...'):
+            return self.signals.cancelled.emit(self.id)
+        img = qimage_to_bgr(self.image)
+        self.image = None
+        payload = ImagePayload(img, bypass_cache=self.force)
+        if not self._accept(payload):
+            return self.signals.cancelled.emit(self.id)
+
+        phash = None
+        if self.index is not None:
+            with tracer.span('task.dhash'):
+                phash = dhash(img)
+            if not self.force and self.index.ready:
+                with tracer.span('task.duplicate_lookup'):
+                    match = self.index.lookup(phash, self.user_id)
+                if match is not None:
+                    distance, record = match
+                    return self.signals.finished.emit(self.id, {
+                        'status': True,
+                        'latex': record[1],
+                        'confidence': record[2],
+                        'request_id': record[3],
+                        'message': None,
+                        'record_id': record[0],
+                        'duplicate_distance': distance
+                    })
+
+        if not self._checkpoint('正在识别...'):
+            return self.signals.cancelled.emit(self.id)
+        with tracer.span('task.recognize'):
+            result = self.service.recognize(payload)
+
+        if not result['status']:
+            if self.offline_queue is not None and result.get('retryable'):
+                return self._defer(payload, phash, result['message'] or '未知错误')
+            return self.signals.failed.emit(self.id, result['message'] or '未知错误')
+
+        if not self._checkpoint('正在保存记录...'):
+            return self.signals.cancelled.emit(self.id)
+        # 未做上传预处理时，这里直接复用上传时的 PNG 编码结果
+        with tracer.span('task.imencode'):
+            image_png = payload.png()
+        result['record_id'] = self.db.add_record(
+            image_png,
+            result['latex'],
+            result['confidence'],
+            result['request_id'],
+            user_id=self.user_id,
+            phash=to_signed64(phash) if phash is not None else None,
+            thumbnail=payload.thumbnail()
+        )
+        if phash is not None:
+            self.index.add(phash, result['record_id'])
+        self.signals.finished.emit(self.id, result)
+
+    def _defer(self, payload, phash, message):
+        """写入占位历史记录并加入离线队列，待网络恢复后补识别"""
+        image_png = payload.png()
+        record_id = self.db.add_record(
+            image_png, '', 0.0, f'offline-{uuid.uuid4().hex}',
+            user_id=self.user_id,
+            phash=to_signed64(phash) if phash is not None else None,
+            thumbnail=payload.thumbnail()
+        )
+        self.offline_queue.enqueue(image_png, self.user_id, record_id)
+        if phash is not None:
+            # 占位记录在补识别完成前不会被查重命中
+            self.index.add(phash, record_id)
+        self.signals.deferred.emit(self.id, record_id, message)
+
+
+class PageRecognitionTask(QRunnable):
+    """ 整页识别任务：版面分析 → 并行识别各区域 → 每个区域保存一条记录 """
+
+    def __init__(self, service, db, image, workers=4):
+        """
+        Args:
+            service: BaseOcrService 识别服务
+            db: DatabaseManager 数据库管理器
+            image: QImage 待识别的页面截图
+            workers: 并行识别的区域数
+        """
+        super().__init__()
+        self.id = next(RecognitionTask._ids)
+        self.image = QImage(image).copy()
+        current_user = userManager.get_current_user()
+        self.recognizer = PageRecognizer(
+            service, db, workers,
+            user_id=current_user['id'] if current_user else 'default'
+        )
+        self.signals = RecognitionSignals()
+        self.created = tracer.now()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """请求取消任务，已发出的区域请求会继续完成"""
+        self._cancelled.set()
+
+    def _onProgress(self, done, total):
+        self.signals.stageChanged.emit(self.id, f'正在识别区域 {done}/{total}...')
+
+    def run(self):
+        try:
+            with tracer.span('page.run', task_id=self.id):
+                self.signals.stageChanged.emit(self.id, '正在分析版面...')
+                img = qimage_to_bgr(self.image)
+                self.image = None
+                with tracer.span('page.segment'):
+                    regions = segment_regions(img)
+                if not regions:
+                    return self.signals.failed.emit(self.id, '未找到可识别的区域')
+                if self._cancelled.is_set():
+                    return self.signals.cancelled.emit(self.id)
+
+                self._onProgress(0, len(regions))
+                results = self.recognizer.recognize(img, regions, self._onProgress)
+            if not any(item['status'] for item in results):
+                return self.signals.failed.emit(self.id, results[0]['message'] or '未知错误')
+            self.signals.finished.emit(self.id, {'status': True, 'regions': results})
+        except Exception as e:
+            print(f"Page recognition task {self.id} error: {str(e)}")
+            self.signals.failed.emit(self.id, str(e))
+
+
+class BatchSignals(QObject):
+    """ 批量识别信号 """
+
+    progress = pyqtSignal(dict)
+    finished = pyqtSignal(dict)
+
+
+class BatchTask(QRunnable):
+    """ 在线程池中运行的批量识别任务 """
+
+    def __init__(self, recognizer, source, recursive=False):
+        """
+        Args:
+            recognizer: BatchRecognizer 批量识别引擎
+            source: 目录、glob 通配符或文件路径列表
+            recursive: 是否递归子目录
+        """
+        super().__init__()
+        self.recognizer = recognizer
+        self.source = source
+        self.recursive = recursive
+        self.signals = BatchSignals()
+        self._lastEmit = 0
+        recognizer.progress_callback = self._onProgress
+
+    def cancel(self):
+        self.recognizer.cancel()
+
+    def _onProgress(self, snapshot, item):
+        # 限制刷新频率，避免大量信号挤占界面事件循环
+        now = time.monotonic()
+        if now - self._lastEmit >= 0.2 or snapshot['done'] == snapshot['total']:
+            self._lastEmit = now
+            self.signals.progress.emit(snapshot)
+
+    def run(self):
+        try:
+            snapshot = self.recognizer.run(self.source, self.recursive)
+        except Exception as e:
+            print(f"Batch task error: {str(e)}")
+            snapshot = {'total': 0, 'done': 0, 'succeeded': 0, 'failed': 0, 'error': str(e)}
+        self.signals.finished.emit(snapshot)
+
+
+# 识别任务专用线程池，与界面线程分离
+recognitionPool = QThreadPool()
+recognitionPool.setMaxThreadCount(4)
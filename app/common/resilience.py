@@ -0,0 +1,114 @@
+# coding: utf-8
+import random
+import threading
+import time
+
+
+class CircuitBreaker:
+    """
+    熔断器：连续失败达到阈值后断开，在恢复期内直接拒绝请求；
+    恢复期过后放行一个探测请求（半开），成功则闭合，失败则重新断开；
+    探测请求既无成功也无失败时（非瞬时错误、异常）须调用 release() 结束探测。
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30.0):
+        """
+        Args:
+            failure_threshold: 连续失败多少次后断开
+            recovery_timeout: 断开后多少秒允许探测
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._probe_owner = None  # 发出探测请求的线程
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """是否允许发出请求"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.recovery_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probing = False
+            # 半开状态同一时间只放行一个探测请求
+            if self._probing:
+                return False
+            self._probing = True
+            self._probe_owner = threading.get_ident()
+            return True
+
+    def release(self):
+        """结束当前线程发出的探测请求，不改变熔断状态（结果无法说明服务是否恢复时调用）"""
+        with self._lock:
+            if self._probing and self._probe_owner == threading.get_ident():
+                self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def retry_after(self):
+        """断开状态下距离允许探测的剩余秒数"""
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self.recovery_timeout - (time.monotonic() - self.opened_at))
+
+
+class RetryPolicy:
+    """带全抖动（full jitter）的指数退避重试策略"""
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=8.0):
+        """
+        Args:
+            max_attempts: 最多尝试次数（含首次）
+            base_delay: 首次重试的退避上限（秒）
+            max_delay: 单次退避的最大秒数
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt):
+        """第 attempt 次失败后的等待秒数（attempt 从 1 开始）"""
+        cap = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, cap)
+
+
+class ResilienceMetrics:
+    """重试与熔断的计数指标"""
+
+    FIELDS = ('calls', 'attempts', 'retries', 'successes', 'failures',
+              'short_circuited', 'deduplicated')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = dict.fromkeys(self.FIELDS, 0)
+
+    def incr(self, key, value=1):
+        with self._lock:
+            self.counters[key] += value
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counters)
@@ -0,0 +1,161 @@
+# coding: utf-8
+"""
+不依赖 Qt 的配置读取
+
+识别服务、数据库等核心模块通过本模块的 cfg 读取配置：图形界面已加载 app.common.config 时
+直接使用其中的 QConfig，命令行等无界面场景下只解析 config.json，不导入 PyQt5/qfluentwidgets。
+"""
+import json
+import os
+import sys
+
+CONFIG_PATH = 'app/config/config.json'
+
+# 公式识别配置项的默认值，app.common.config 中的同名配置项也使用这里的值
+LATEX_OCR_DEFAULTS = {
+    "Type": "Simpletex",
+    "ApiUrl": "https://server.simpletex.cn/api/latex_ocr",
+    "Token": "abc" * 10,
+    "ConnectTimeout": 5,
+    "ReadTimeout": 30,
+    "PoolSize": 4,
+    "CacheEnabled": True,
+    "CacheMaxEntries": 5000,
+    "CacheMaxAgeDays": 30,
+    "DuplicateLookupEnabled": True,
+    "DuplicateThreshold": 5,
+    "BatchWorkers": 4,
+    "PageWorkers": 4,
+    "PreprocessEnabled": False,
+    "PreprocessBinarize": False,
+    "TargetGlyphHeight": 48,
+    "PngCompression": 6,
+    "DailyQuota": 500,
+    "RequestsPerMinute": 60,
+    "RateBurst": 3,
+    "RetryMaxAttempts": 3,
+    "CircuitFailureThreshold": 5,
+    "CircuitRecoverySeconds": 30,
+    "HedgeEnabled": False,
+    "HedgeDelayMs": 1500,
+    "HedgeMode": "first",
+    "HedgeProviders": [],
+    "SchedulerWorkers": 4,
+    "BulkConcurrency": 3,
+    "OfflineQueueEnabled": True,
+    "TracingEnabled": True,
+    "TraceEventsEnabled": False,
+    "ClipboardWatchEnabled": False,
+    "ClipboardWriteBack": False,
+}
+
+
+class _Signal:
+    """与 pyqtSignal 接口兼容的简单回调列表"""
+
+    def __init__(self):
+        self._slots = []
+
+    def connect(self, slot):
+        self._slots.append(slot)
+
+    def emit(self, *args):
+        for slot in list(self._slots):
+            slot(*args)
+
+
+class SettingItem:
+    """无界面模式下的配置项，接口与 qfluentwidgets.ConfigItem 的 value/valueChanged 一致"""
+
+    def __init__(self, group, name, default, value):
+        self.group = group
+        self.name = name
+        self.defaultValue = default
+        self._value = value
+        self.valueChanged = _Signal()
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        if value != self._value:
+            self._value = value
+            self.valueChanged.emit(value)
+
+
+class HeadlessConfig:
+    """只读取 config.json 的配置对象，属性名与 app.common.config.Config 一致"""
+
+    GROUPS = {'LatexOCR': LATEX_OCR_DEFAULTS}
+
+    def __init__(self, path=CONFIG_PATH):
+        self.path = path
+        self._items = {}
+        self._data = {}
+        self.load(path)
+
+    def load(self, path):
+        """重新读取配置文件，文件不存在或损坏时使用默认值"""
+        self.path = path
+        try:
+            with open(path, encoding='utf-8') as f:
+                self._data = json.load(f)
+        except (OSError, ValueError):
+            self._data = {}
+        for item in self._items.values():
+            item.value = self._data.get(item.group, {}).get(item.name, item.defaultValue)
+
+    @staticmethod
+    def _key(attr):
+        # api_url -> ApiUrl, connectTimeout -> ConnectTimeout
+        return ''.join(part[:1].upper() + part[1:] for part in attr.split('_'))
+
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        key = self._key(attr)
+        for group, defaults in self.GROUPS.items():
+            if key in defaults:
+                item = self._items.get(attr)
+                if item is None:
+                    value = self._data.get(group, {}).get(key, defaults[key])
+                    item = self._items[attr] = SettingItem(group, key, defaults[key], value)
+                return item
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{attr}'")
+
+    def get(self, item):
+        return item.value
+
+    def set(self, item, value):
+        item.value = value
+
+
+_headless = None
+
+
+def headless_config():
+    """无界面模式的全局配置对象"""
+    global _headless
+    if _headless is None:
+        _headless = HeadlessConfig(os.environ.get('LATEXOCR_CONFIG', CONFIG_PATH))
+    return _headless
+
+
+def _resolve():
+    # 图形界面启动时 main.py 会先导入 app.common.config，此时与界面共用同一份配置
+    module = sys.modules.get(__package__ + '.config')
+    if module is not None and hasattr(module, 'cfg'):
+        return module.cfg
+    return headless_config()
+
+
+class _ConfigProxy:
+    """按需转发到界面配置或无界面配置"""
+
+    def __getattr__(self, attr):
+        return getattr(_resolve(), attr)
+
+
+cfg = _ConfigProxy()
@@ -9,6 +9,7 @@ class SignalBus(QObject):
     micaEnableChanged = pyqtSignal(bool)
     supportSignal = pyqtSignal()
     userChanged = pyqtSignal(dict)  # 用户信息变更信号
+    offlineRecognitionFinished = pyqtSignal(int, dict)  # 离线队列补识别完成信号 (record_id, result)
 
 
 signalBus = SignalBus()
\ No newline at end of file
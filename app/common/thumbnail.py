@@ -0,0 +1,41 @@
+# coding: utf-8
+import cv2
+import numpy as np
+
+# 历史记录列表按 80×80 显示，按 2 倍分辨率生成以兼顾高分屏
+THUMBNAIL_SIZE = 160
+
+
+def make_thumbnail(image, size=THUMBNAIL_SIZE):
+    """
+    生成缩略图
+    Args:
+        image: OpenCV 格式的图像数据
+        size: 缩略图最长边（不放大小图）
+    Returns:
+        numpy.ndarray: PNG 编码后的字节数组
+    """
+    height, width = image.shape[:2]
+    scale = size / max(height, width, 1)
+    if scale < 1:
+        image = cv2.resize(
+            image,
+            (max(1, round(width * scale)), max(1, round(height * scale))),
+            interpolation=cv2.INTER_AREA
+        )
+    ok, encoded = cv2.imencode('.png', image, [cv2.IMWRITE_PNG_COMPRESSION, 9])
+    if not ok:
+        raise ValueError('缩略图编码失败')
+    return encoded
+
+
+def thumbnail_from_png(data, size=THUMBNAIL_SIZE):
+    """
+    由编码后的图片生成缩略图（用于未随记录传入缩略图的调用方和旧记录的补算）
+    Returns:
+        bytes: PNG 缩略图，无法解码时为 None
+    """
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR) if data else None
+    if image is None:
+        return None
+    return make_thumbnail(image, size).tobytes()
@@ -0,0 +1,181 @@
+# coding: utf-8
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class LatencyHistogram:
+    """
+    HDR 风格的对数-线性直方图（微秒）
+
+    按 2 的幂分段，每段再等分为 2^(sub_bits-1) 个桶，任意量级下相对误差不超过 2^-(sub_bits-1)，
+    记录为 O(1)，内存只与出现过的桶数有关。
+    """
+
+    def __init__(self, sub_bits=7):
+        self.sub_bits = sub_bits
+        self.buckets = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _bucket(self, value):
+        shift = max(0, value.bit_length() - self.sub_bits)
+        return (value >> shift) << shift
+
+    def record(self, value_us):
+        value = max(0, int(value_us))
+        bucket = self._bucket(value)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, p):
+        """第 p 百分位的近似值（桶下界，微秒）"""
+        if not self.count:
+            return None
+        rank = max(1, int(round(p / 100 * self.count)))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return max(bucket, self.min)
+        return self.max
+
+    def summary(self):
+        """统计摘要（毫秒）"""
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'mean': self.total / self.count / 1000,
+            'min': self.min / 1000,
+            'p50': self.percentile(50) / 1000,
+            'p90': self.percentile(90) / 1000,
+            'p99': self.percentile(99) / 1000,
+            'max': self.max / 1000
+        }
+
+
+class Tracer:
+    """
+    进程内的分段耗时追踪器
+
+    - span 按名称累计到直方图，用于查看各阶段的延迟分布（内存只与 span 名称数有关）
+    - 开启 capture_events 时，最近的 span 另存于环形缓冲区，可导出为 Chrome trace-event JSON
+      （chrome://tracing、Perfetto）；每个事件是一个字典，默认不保存
+    """
+
+    def __init__(self, max_events=20000, enabled=True, capture_events=False):
+        """
+        Args:
+            max_events: 环形缓冲区保留的事件数
+            enabled: 是否启用，关闭时 span 几乎没有开销
+            capture_events: 是否保存单个事件供导出
+        """
+        self.enabled = enabled
+        self.capture_events = capture_events
+        self.pid = os.getpid()
+        self._events = deque(maxlen=max_events)
+        self._histograms = {}
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def now():
+        """当前时间戳（微秒），与 span 使用同一时钟"""
+        return time.perf_counter_ns() // 1000
+
+    def record(self, name, start_us, duration_us, **args):
+        """记录一个已结束的 span，用于跨线程或无法用 with 包裹的区间"""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = LatencyHistogram()
+            histogram.record(duration_us)
+        if not self.capture_events:
+            return
+        thread = threading.current_thread()
+        event = {
+            'name': name,
+            'cat': name.split('.', 1)[0],
+            'ph': 'X',
+            'ts': start_us,
+            'dur': duration_us,
+            'pid': self.pid,
+            'tid': thread.ident
+        }
+        if args:
+            event['args'] = args
+        with self._lock:
+            self._events.append(event)
+            self._threads[thread.ident] = thread.name
+
+    @contextmanager
+    def span(self, name, **args):
+        """统计 with 块的耗时"""
+        if not self.enabled:
+            yield
+            return
+        start = self.now()
+        try:
+            yield
+        finally:
+            self.record(name, start, self.now() - start, **args)
+
+    def traced(self, name):
+        """装饰器：统计函数调用耗时"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def summary(self):
+        """各 span 的延迟统计（毫秒）"""
+        with self._lock:
+            return {name: histogram.summary() for name, histogram in sorted(self._histograms.items())}
+
+    def export_chrome_trace(self, path):
+        """
+        导出 Chrome trace-event JSON
+        Returns:
+            int: 导出的事件数
+        """
+        with self._lock:
+            events = list(self._events)
+            threads = dict(self._threads)
+        metadata = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid, 'args': {'name': name}}
+            for tid, name in threads.items()
+        ]
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'traceEvents': metadata + events,
+                'displayTimeUnit': 'ms',
+                'otherData': {'summary': self.summary()}
+            }, f, ensure_ascii=False)
+        return len(events)
+
+    def reset(self):
+        with self._lock:
+            self._events.clear()
+            self._histograms.clear()
+            self._threads.clear()
+
+
+tracer = Tracer()
@@ -0,0 +1,463 @@
+# coding: utf-8
+"""
+本地 HTTP 识别服务，不导入 PyQt5/qfluentwidgets
+
+多个工具共用一个进程，共享结果缓存、请求合并、限流和额度账本。用法（在项目根目录执行）：
+    python -m app.server --port 8866 --workers 8
+
+接口：
+    POST /recognize          请求体为图片（image/*），或 multipart 的 file 字段，返回单个结果
+    POST /recognize/batch    multipart 的多个 file 字段，按上传顺序返回 {"results": [...]}
+    GET  /history            分页查询历史记录：page、page_size、search、include_image
+                             （user 指定其他用户仅在以 --allow-any-user 启动时允许，识别接口同）
+    GET  /metrics            服务端计数、各接口延迟分布及识别服务链各层的统计
+"""
+import argparse
+import base64
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import cv2
+import numpy as np
+
+from .cli import create_core, default_user_id
+from .common.image_payload import ImagePayload
+from .common.multipart import parse_multipart
+from .common.ocr_scheduler import PRIORITY_BULK, priority_scope
+from .common.settings import cfg
+from .common.tracing import LatencyHistogram, tracer
+
+SERVER_VERSION = 'LatexOCR/1.0'
+
+
+class RequestError(Exception):
+    """请求不合法，以对应的 HTTP 状态码返回"""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+class ServerMetrics:
+    """服务端计数与各接口延迟分布"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.counters = {'requests': 0, 'inflight': 0, 'rejected': 0, 'bytes_in': 0, 'bytes_out': 0,
+                         'images': 0, 'connections': 0}
+        self.status = {}
+        self.latency = {}
+
+    def incr(self, key, value=1):
+        with self._lock:
+            self.counters[key] += value
+
+    def observe(self, endpoint, status, seconds):
+        with self._lock:
+            self.status[str(status)] = self.status.get(str(status), 0) + 1
+            histogram = self.latency.get(endpoint)
+            if histogram is None:
+                histogram = self.latency[endpoint] = LatencyHistogram()
+            histogram.record(seconds * 1e6)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'uptime': time.time() - self.started,
+                'counters': dict(self.counters),
+                'status': dict(self.status),
+                'latency_ms': {name: h.summary() for name, h in self.latency.items()}
+            }
+
+
+def collect_service_stats(service):
+    """沿 .service 链收集各层的统计信息"""
+    layers = []
+    seen = set()
+    while service is not None and id(service) not in seen:
+        seen.add(id(service))
+        entry = {'layer': type(service).__name__}
+        stats = getattr(service, 'stats', None)
+        if callable(stats):
+            entry['stats'] = stats()
+        elif isinstance(stats, dict):
+            entry['stats'] = dict(stats)
+        if hasattr(service, 'cache'):
+            entry['cache'] = service.cache.stats()
+        if hasattr(service, 'scheduler'):
+            entry['scheduler'] = service.scheduler.stats()
+        if hasattr(service, 'metrics'):
+            entry['metrics'] = service.metrics.snapshot()
+        if hasattr(service, 'breaker'):
+            entry['breaker'] = service.breaker.state
+        if hasattr(service, 'timing'):
+            entry['timing'] = service.timing.summary()
+        if getattr(service, 'preprocessor', None) is not None:
+            entry['preprocess'] = service.preprocessor.stats()
+        layers.append(entry)
+        service = getattr(service, 'service', None)
+    return layers
+
+
+class OcrRequestHandler(BaseHTTPRequestHandler):
+    """识别服务请求处理（HTTP/1.1 长连接）"""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = SERVER_VERSION
+
+    def setup(self):
+        self.timeout = self.server.request_timeout
+        super().setup()
+        self.server.metrics.incr('connections')
+
+    def handle_one_request(self):
+        # 等待下一个请求行时使用较短的空闲超时：空闲的长连接尽快断开，让出工作线程
+        self.connection.settimeout(self.server.keepalive_timeout)
+        super().handle_one_request()
+
+    def parse_request(self):
+        # 已收到请求行，读取请求头和请求体使用正常的请求超时
+        self.connection.settimeout(self.server.request_timeout)
+        return super().parse_request()
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, code, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if self.server.backlogged():
+            # 有连接在等待工作线程时不保持长连接，避免空闲连接占住线程
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.metrics.incr('bytes_out', len(body))
+        return code
+
+    def read_body(self):
+        """按 Content-Length 读取请求体，并检查大小限制"""
+        length = self.headers.get('Content-Length')
+        if length is None:
+            raise RequestError(411, '缺少 Content-Length')
+        try:
+            length = int(length)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # 无法确定请求体边界，连接不能继续复用
+            self.close_connection = True
+            raise RequestError(400, 'Content-Length 不合法')
+        if length > self.server.max_body:
+            # 请求体未读取，连接无法继续复用
+            self.close_connection = True
+            raise RequestError(413, f'请求体超过 {self.server.max_body // (1024 * 1024)} MB 上限')
+        body = self.rfile.read(length)
+        self.server.metrics.incr('bytes_in', len(body))
+        return body
+
+    def read_images(self, max_count):
+        """读取请求中的图片，返回 [(filename, bytes)]"""
+        body = self.read_body()
+        content_type = self.headers.get('Content-Type', '')
+        if content_type.startswith('multipart/form-data'):
+            try:
+                files = parse_multipart(body, content_type).get('file', [])
+            except ValueError as e:
+                raise RequestError(400, str(e))
+            images = [(filename, data) for filename, _, data in files]
+        else:
+            images = [(None, body)] if body else []
+        if not images:
+            raise RequestError(400, '缺少图片（请求体或 multipart 的 file 字段）')
+        if len(images) > max_count:
+            raise RequestError(413, f'单次最多 {max_count} 张图片')
+        return images
+
+    def handle_request(self, method):
+        start = time.perf_counter()
+        url = urlsplit(self.path)
+        route = self.server.routes.get((method, url.path.rstrip('/') or '/'))
+        metrics = self.server.metrics
+        metrics.incr('requests')
+        metrics.incr('inflight')
+        try:
+            if route is None:
+                code = self.send_json(404, {'status': False, 'message': 'Not Found'})
+            elif self.server.api_key and self.headers.get('X-Api-Key') != self.server.api_key:
+                code = self.send_json(401, {'status': False, 'message': 'Invalid API key'})
+            else:
+                params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                code = route(self, params)
+        except RequestError as e:
+            code = self.send_json(e.code, {'status': False, 'message': str(e)})
+        except (ConnectionError, TimeoutError):
+            self.close_connection = True
+            code = 499
+        except Exception as e:
+            print(f"Server error on {self.path}: {str(e)}", file=sys.stderr)
+            code = self.send_json(500, {'status': False, 'message': str(e)})
+        finally:
+            metrics.incr('inflight', -1)
+        # 未知路径归为一类，避免指标按任意路径无限增长
+        metrics.observe(url.path.rstrip('/') if route else 'other', code, time.perf_counter() - start)
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    # 各接口实现
+
+    def route_recognize(self, params):
+        self.server.request_user(params)
+        filename, data = self.read_images(1)[0]
+        item = self.server.recognize_bytes(data, params)
+        item['filename'] = filename
+        return self.send_json(200, item)
+
+    def route_recognize_batch(self, params):
+        self.server.request_user(params)
+        images = self.read_images(self.server.max_batch)
+
+        def run(data):
+            with priority_scope(PRIORITY_BULK):
+                return self.server.recognize_bytes(data, params)
+
+        results = list(self.server.batch_executor.map(run, [data for _, data in images]))
+        for (filename, _), item in zip(images, results):
+            item['filename'] = filename
+        return self.send_json(200, {
+            'status': all(item['status'] for item in results),
+            'results': results
+        })
+
+    def route_history(self, params):
+        if self.server.db is None:
+            raise RequestError(404, '服务未启用历史记录')
+        try:
+            page = max(1, int(params.get('page', 1)))
+            page_size = min(200, max(1, int(params.get('page_size', 20))))
+        except ValueError:
+            raise RequestError(400, 'page 和 page_size 必须为整数')
+        include_image = params.get('include_image') in ('1', 'true')
+
+        # 不需要图片时只读缩略图列表，避免读取原图
+        query = self.server.db.get_records if include_image else self.server.db.get_history_records
+        records, total = query(page, page_size, params.get('search') or None, self.server.request_user(params))
+        items = []
+        for record_id, timestamp, image_data, latex, confidence, request_id in records:
+            item = {'id': record_id, 'timestamp': timestamp, 'latex': latex,
+                    'confidence': confidence, 'request_id': request_id}
+            if include_image:
+                item['image'] = base64.b64encode(image_data).decode('ascii')
+            items.append(item)
+        return self.send_json(200, {'total': total, 'page': page, 'page_size': page_size, 'records': items})
+
+    def route_metrics(self, params):
+        service = self.server.service
+        return self.send_json(200, {
+            'server': self.server.metrics.snapshot(),
+            'pool': {'workers': self.server.workers, 'max_queue': self.server.max_queue},
+            'quota_remaining': service.remaining_quota(),
+            'service': collect_service_stats(service),
+            'spans': tracer.summary()
+        })
+
+
+ROUTES = {
+    ('POST', '/recognize'): OcrRequestHandler.route_recognize,
+    ('POST', '/recognize/batch'): OcrRequestHandler.route_recognize_batch,
+    ('GET', '/history'): OcrRequestHandler.route_history,
+    ('GET', '/metrics'): OcrRequestHandler.route_metrics,
+}
+
+
+class OcrHTTPServer(HTTPServer):
+    """
+    固定大小工作线程池的 HTTP 服务
+
+    每个连接（含长连接上的后续请求）由一个工作线程处理；工作线程和等待队列都占满时，
+    新连接直接返回 503，而不是无限制地创建线程。长连接只在短暂的空闲超时内占用工作线程，
+    有连接排队时响应后即断开。
+    """
+
+    request_queue_size = 128
+
+    def __init__(self, address, service, db, workers=8, max_queue=64, max_body=20 * 1024 * 1024,
+                 max_batch=32, keepalive_timeout=2, request_timeout=30, user_id='default', allow_any_user=False,
+                 api_key=None, verbose=False):
+        """
+        Args:
+            address: (host, port)
+            service: BaseOcrService 识别服务链
+            db: DatabaseManager 数据库管理器，为 None 时不保存也不提供历史记录
+            workers: 处理连接的工作线程数
+            max_queue: 等待工作线程的连接数上限
+            max_body: 请求体字节数上限
+            max_batch: 批量接口单次最多图片数
+            keepalive_timeout: 长连接等待下一个请求的空闲超时（秒），应远小于 request_timeout
+            request_timeout: 读取请求头和请求体时的超时（秒）
+            user_id: 历史记录默认所属用户
+            allow_any_user: 是否允许请求通过 user 参数读写其他用户的历史记录
+            api_key: 非空时要求请求头 X-Api-Key 与之相同
+            verbose: 是否输出访问日志
+        """
+        super().__init__(address, OcrRequestHandler)
+        self.service = service
+        self.db = db
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_body = max_body
+        self.max_batch = max_batch
+        self.keepalive_timeout = keepalive_timeout
+        self.request_timeout = request_timeout
+        self.user_id = user_id
+        self.allow_any_user = allow_any_user
+        self.api_key = api_key
+        self.verbose = verbose
+        self.routes = ROUTES
+        self.metrics = ServerMetrics()
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._queued = 0  # 已接受、尚未分到工作线程的连接数
+        self._queued_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='OcrServer')
+        self.batch_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='OcrServerBatch')
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            self.metrics.incr('rejected')
+            try:
+                request.sendall(b'HTTP/1.1 503 Service Unavailable\r\n'
+                                b'Content-Length: 0\r\nConnection: close\r\nRetry-After: 1\r\n\r\n')
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        with self._queued_lock:
+            self._queued += 1
+        self._executor.submit(self._process, request, client_address)
+
+    def backlogged(self):
+        """是否有连接在等待工作线程"""
+        with self._queued_lock:
+            return self._queued > 0
+
+    def _process(self, request, client_address):
+        with self._queued_lock:
+            self._queued -= 1
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=False)
+        self.batch_executor.shutdown(wait=False)
+
+    def request_user(self, params):
+        """请求所属的用户，未获允许时不能指定启动用户以外的用户"""
+        user_id = params.get('user') or self.user_id
+        if user_id != self.user_id and not self.allow_any_user:
+            raise RequestError(403, '不允许访问其他用户的历史记录')
+        return user_id
+
+    def recognize_bytes(self, data, params):
+        """解码并识别一张图片，按需写入历史记录"""
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            return {'status': False, 'latex': None, 'confidence': 0, 'request_id': None,
+                    'message': '无法解码图片', 'record_id': None}
+
+        self.metrics.incr('images')
+        payload = ImagePayload(image)
+        result = self.service.recognize(payload)
+        item = {
+            'status': result['status'],
+            'latex': result.get('latex'),
+            'confidence': result.get('confidence', 0),
+            'request_id': result.get('request_id'),
+            'message': result.get('message'),
+            'record_id': None
+        }
+        for key in ('cached', 'collapsed', 'retryable'):
+            if key in result:
+                item[key] = result[key]
+        if result['status'] and self.db is not None and params.get('history') not in ('0', 'false'):
+            item['record_id'] = self.db.add_record(
+                payload.png(), result['latex'], result['confidence'], result['request_id'],
+                user_id=self.request_user(params), thumbnail=payload.thumbnail())
+        return item
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m app.server', description='LatexOCR 本地 HTTP 识别服务')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址，供局域网使用时设为 0.0.0.0')
+    parser.add_argument('--port', type=int, default=8866)
+    parser.add_argument('--config', help='配置文件路径')
+    parser.add_argument('--workers', type=int, default=8, help='处理连接的工作线程数')
+    parser.add_argument('--max-queue', type=int, default=64, help='等待处理的连接数上限，超出返回 503')
+    parser.add_argument('--max-body-mb', type=float, default=20, help='请求体大小上限（MB）')
+    parser.add_argument('--max-batch', type=int, default=32, help='批量接口单次最多图片数')
+    parser.add_argument('--keepalive', type=float, default=2, help='长连接等待下一个请求的空闲超时（秒）')
+    parser.add_argument('--request-timeout', type=float, default=30, help='读取请求的超时（秒）')
+    parser.add_argument('--user', help='历史记录默认所属用户 ID，默认图形界面当前用户')
+    parser.add_argument('--allow-any-user', action='store_true',
+                        help='允许请求通过 user 参数读写其他用户的历史记录，默认只能访问 --user 指定的用户')
+    parser.add_argument('--api-key', help='要求客户端在 X-Api-Key 请求头中携带该密钥')
+    parser.add_argument('--no-history', action='store_true', help='不保存也不提供历史记录')
+    parser.add_argument('--verbose', action='store_true', help='输出访问日志')
+    return parser
+
+
+def create_server(args):
+    # create_core 加载 --config 指定的配置，追踪开关需在其后读取
+    service, db = create_core(args)
+    tracer.enabled = cfg.tracingEnabled.value
+    tracer.capture_events = cfg.traceEventsEnabled.value
+    if db is not None:
+        db.migrate_images_async()
+    return OcrHTTPServer(
+        (args.host, args.port), service, db,
+        workers=args.workers,
+        max_queue=args.max_queue,
+        max_body=int(args.max_body_mb * 1024 * 1024),
+        max_batch=args.max_batch,
+        keepalive_timeout=args.keepalive,
+        request_timeout=args.request_timeout,
+        user_id=args.user or default_user_id(),
+        allow_any_user=args.allow_any_user,
+        api_key=args.api_key,
+        verbose=args.verbose
+    )
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    server = create_server(args)
+    host, port = server.server_address[:2]
+    print(f'LatexOCR server listening on http://{host}:{port} ({args.workers} workers)')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -8,7 +8,6 @@ from qfluentwidgets import (SearchLineEdit, PrimaryPushButton, TableWidget,
                           InfoBarPosition, MessageBox, PrimaryToolButton,
                           PushButton)
 from qfluentwidgets import FluentIcon as FIF
-import base64
 from datetime import datetime  # 添加到文件顶部的导入部分
 
 from ..common.db_manager import DatabaseManager
@@ -16,16 +15,22 @@ from ..common.user_manager import userManager
 from ..common.signal_bus import signalBus
 
 class ClickableLabel(QLabel):
-    """可点击的标签"""
-    def __init__(self, parent=None):
+    """可点击的标签（显示缩略图，点击时加载原图）"""
+    def __init__(self, parent=None, loader=None):
         super().__init__(parent)
+        self.loader = loader  # 返回原图 PNG 字节的函数
         self.setCursor(Qt.PointingHandCursor)
         
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
-            # 获取图片并复制到剪贴板
-            if self.pixmap():
-                QApplication.clipboard().setPixmap(self.pixmap())
+            # 获取原图并复制到剪贴板
+            pixmap = QPixmap()
+            if self.loader is not None:
+                pixmap.loadFromData(self.loader() or b'')
+            elif self.pixmap():
+                pixmap = self.pixmap()
+            if not pixmap.isNull():
+                QApplication.clipboard().setPixmap(pixmap)
                 self.showCopySuccess()
                 
     def showCopySuccess(self):
@@ -82,6 +87,8 @@ class HistoryInterface(QScrollArea):
         self.page_size = 15
         self.total_count = 0
         self.search_text = None
+        self.cursors = [None]  # 各页的起始游标，cursors[i] 对应第 i + 1 页
+        self.next_cursor = None
         
         # 获取当前用户ID
         self.current_user_id = None
@@ -171,34 +178,40 @@ class HistoryInterface(QScrollArea):
         self.vBoxLayout.addWidget(self.table)
         self.vBoxLayout.addLayout(self.paginationLayout)
         
-    def loadHistory(self, search_text=None, user_id=None):
-        """加载历史记录"""
+    def resetPages(self):
+        """回到第一页（搜索条件或用户变化后调用）"""
+        self.current_page = 1
+        self.cursors = [None]
+
+    def loadHistory(self, search_text=None, user_id=None, recount=True):
+        """加载历史记录（键集分页，按当前页的起始游标读取，翻页耗时与页码无关）"""
         self.search_text = search_text
         # 如果没有指定用户ID，使用当前用户ID
         if user_id is None:
             user_id = self.current_user_id
         
+        # 总数只在刷新时统计，前后翻页时沿用
+        if recount:
+            self.total_count = self.db.count_history_records(search_text, user_id)
+        total_pages = max(1, (self.total_count + self.page_size - 1) // self.page_size)
+        # 只能跳到已知起始游标的页
+        self.current_page = max(1, min(self.current_page, total_pages, len(self.cursors)))
+        del self.cursors[self.current_page:]
+
         # 获取记录数据
-        records, total_count = self.db.get_history_records(
-            page=self.current_page,
+        records, self.next_cursor = self.db.get_history_page(
             page_size=self.page_size,
             search_text=search_text,
-            user_id=user_id
+            user_id=user_id,
+            after=self.cursors[self.current_page - 1]
         )
-        self.total_count = total_count
-        
-        # 更新分页信息
-        total_pages = max(1, (total_count + self.page_size - 1) // self.page_size)
-        if self.current_page > total_pages:
-            self.current_page = total_pages
-            return self.loadHistory(search_text, user_id)
             
-        self.totalLabel.setText(f"共 {total_count} 条记录")
+        self.totalLabel.setText(f"共 {self.total_count} 条记录")
         self.pageLabel.setText(f"第 {self.current_page} / {total_pages} 页")
         
         # 更新按钮状态
         self.prevButton.setEnabled(self.current_page > 1)
-        self.nextButton.setEnabled(self.current_page < total_pages)
+        self.nextButton.setEnabled(self.next_cursor is not None)
         
         # 清空表格内容
         self.table.setRowCount(0)
@@ -210,19 +223,20 @@ class HistoryInterface(QScrollArea):
             
         # 添加新记录到表格
         for record in records:
-            record_id, timestamp, image_data, latex_result, confidence, request_id = record
+            record_id, timestamp, thumbnail, latex_result, confidence, request_id = record
             row = self.table.rowCount()
             self.table.insertRow(row)
             
             # ID
             self.table.setItem(row, 0, QTableWidgetItem(str(record_id)))
             
-            # 图片
-            image_label = ClickableLabel(self)
-            image_data = base64.b64decode(image_data)
+            # 图片（列表只加载缩略图，点击时再读取原图）
+            image_label = ClickableLabel(self, loader=lambda rid=record_id: self.db.get_image(rid))
             pixmap = QPixmap()
-            pixmap.loadFromData(image_data)
-            scaled_pixmap = pixmap.scaled(80, 80, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            pixmap.loadFromData(thumbnail)
+            ratio = self.devicePixelRatioF()
+            scaled_pixmap = pixmap.scaled(int(80 * ratio), int(80 * ratio), Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            scaled_pixmap.setDevicePixelRatio(ratio)
             image_label.setPixmap(scaled_pixmap)
             self.table.setCellWidget(row, 1, image_label)
             
@@ -267,18 +281,18 @@ class HistoryInterface(QScrollArea):
         """上一页"""
         if self.current_page > 1:
             self.current_page -= 1
-            self.loadHistory(self.search_text, self.current_user_id)
+            self.loadHistory(self.search_text, self.current_user_id, recount=False)
 
     def nextPage(self):
         """下一页"""
-        total_pages = (self.total_count + self.page_size - 1) // self.page_size
-        if self.current_page < total_pages:
+        if self.next_cursor is not None:
+            self.cursors.append(self.next_cursor)
             self.current_page += 1
-            self.loadHistory(self.search_text, self.current_user_id)
+            self.loadHistory(self.search_text, self.current_user_id, recount=False)
 
     def onSearchTextChanged(self):
         """搜索文本变化处理"""
-        self.current_page = 1  # 重置到第一页
+        self.resetPages()  # 重置到第一页
         text = self.searchEdit.text().strip()
         self.loadHistory(text if text else None, self.current_user_id)
 
@@ -295,7 +309,7 @@ class HistoryInterface(QScrollArea):
     def onSearch(self, text):
         """搜索"""
         self.search_text = text if text else None
-        self.current_page = 1
+        self.resetPages()
         self.loadData()
         
     def changePage(self, action):
@@ -349,7 +363,7 @@ class HistoryInterface(QScrollArea):
         )
         if w.exec_():
             self.db.clear_history(user_id=self.current_user_id)
-            self.current_page = 1
+            self.resetPages()
             self.loadData()
             InfoBar.success(
                 title='清空成功',
@@ -374,7 +388,7 @@ class HistoryInterface(QScrollArea):
         # 更新当前用户ID
         self.current_user_id = user['id'] if user else 'default'
         # 重置页码
-        self.current_page = 1
+        self.resetPages()
         # 重新加载数据
         self.loadData()
         print(f"历史记录已切换到用户: {user['name'] if user else 'default'}")
\ No newline at end of file
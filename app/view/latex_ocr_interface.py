@@ -11,11 +11,18 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout,
 from PyQt5.QtWebEngineWidgets import QWebEngineView
 from PyQt5.QtCore import QUrl
 from ..common.config import cfg
-import cv2
-import numpy as np
 from ..components.latex_renderer import LaTeXRenderer
 from ..common.db_manager import DatabaseManager
 from ..common.ocr_service import OcrServiceFactory
+from ..common.ocr_scheduler import PRIORITY_BULK
+from ..common.recognition_task import RecognitionTask, PageRecognitionTask, BatchTask, recognitionPool
+from ..common.batch_engine import BatchRecognizer
+from ..common.page_segment import join_results
+from ..common.duplicate_index import DuplicateIndex
+from ..common.offline_queue import OfflineQueue, QueueDrainer
+from ..common.clipboard_watcher import ClipboardWatcher
+from ..common.signal_bus import signalBus
+from ..common.tracing import tracer
 
 
 class DrawingBoard(QWidget):
@@ -251,6 +258,7 @@ class LatexOcrInterface(ScrollArea):
     def __init__(self, parent=None):
         super().__init__(parent=parent)
         self.db = DatabaseManager()
+        self.db.migrate_images_async()  # 旧记录的图片在后台转为二进制存储
         self.setObjectName('latexOcrInterface')
         # 添加样式
         self.setStyleSheet("""
@@ -268,10 +276,44 @@ class LatexOcrInterface(ScrollArea):
             }
         """)
         self.stateTooltip = None
+        self.batchTooltip = None
+        self.batchTask = None
         self.updateTimer = QTimer()
         self.updateTimer.setSingleShot(True)
         self.updateTimer.timeout.connect(self.doUpdateLatex)
         self.ocr_service = OcrServiceFactory.create_service()  # 创建识别服务
+        self.tasks = {}  # 进行中的识别任务 {task_id: RecognitionTask}
+        self.lastImage = None  # 最近一次识别的图像，用于强制重新识别
+        self.sourceImage = None  # 最近一次上传/粘贴的原始分辨率图像，用于整页识别
+        self.duplicate_index = None
+        if cfg.duplicateLookupEnabled.value:
+            self.duplicate_index = DuplicateIndex(self.db, cfg.duplicateThreshold.value)
+            cfg.duplicateThreshold.valueChanged.connect(self.onDuplicateThresholdChanged)
+            self.duplicate_index.loadAsync()
+        self.offline_queue = None
+        self.drainer = None
+        self.lastDeferredRecordId = None
+        if cfg.offlineQueueEnabled.value:
+            self.offline_queue = OfflineQueue()
+            self.drainer = QueueDrainer(
+                self.offline_queue,
+                OcrServiceFactory.with_priority(self.ocr_service, PRIORITY_BULK),
+                self.db,
+                lambda: cfg.api_url.value,
+                on_finished=signalBus.offlineRecognitionFinished.emit
+            )
+            signalBus.offlineRecognitionFinished.connect(self.onOfflineRecognitionFinished)
+            self.drainer.start()
+        self.clipboardWatcher = ClipboardWatcher(
+            self.ocr_service, self.db, self.duplicate_index, self.offline_queue,
+            write_back=cfg.clipboardWriteBack.value, parent=self
+        )
+        self.clipboardWatcher.recognized.connect(self.onClipboardRecognized)
+        self.clipboardWatcher.failed.connect(self.onClipboardFailed)
+        self.clipboardWatcher.deferred.connect(self.onClipboardDeferred)
+        self.clipboardWatcher.setEnabled(cfg.clipboardWatchEnabled.value)
+        cfg.clipboardWatchEnabled.valueChanged.connect(self.clipboardWatcher.setEnabled)
+        cfg.clipboardWriteBack.valueChanged.connect(self.clipboardWatcher.setWriteBack)
         self.initUI()
 
     def initUI(self):
@@ -298,10 +340,14 @@ class LatexOcrInterface(ScrollArea):
         # 两个主要按钮
         self.uploadButton = PrimaryPushButton('选择图片', self, FIF.PHOTO)
         self.drawButton = PrimaryPushButton('手写输入', self, FIF.EDIT)
+        self.batchButton = PushButton('批量识别', self, FIF.FOLDER)
+        self.pageButton = PushButton('整页识别', self, FIF.LAYOUT)
         
         # 添加按钮
         self.buttonLayout.addWidget(self.uploadButton)
         self.buttonLayout.addWidget(self.drawButton)
+        self.buttonLayout.addWidget(self.batchButton)
+        self.buttonLayout.addWidget(self.pageButton)
         
         # 添加提示文本
         self.tipLabel = QLabel('提示：直接粘贴也可上传图片', self)
@@ -417,6 +463,8 @@ class LatexOcrInterface(ScrollArea):
         # 绑定事件
         self.uploadButton.clicked.connect(self.uploadImage)
         self.drawButton.clicked.connect(self.showDrawingDialog)
+        self.batchButton.clicked.connect(self.batchRecognize)
+        self.pageButton.clicked.connect(self.pageRecognize)
         self.copyTextButton.clicked.connect(self.copyText)
         self.copyLatexButton.clicked.connect(self.copyLatex)
         self.copyImageButton.clicked.connect(self.copyImage)
@@ -436,6 +484,7 @@ class LatexOcrInterface(ScrollArea):
             self.stateTooltip.setContent(text)
         else:
             self.stateTooltip = StateToolTip(text, '请稍候', self)
+            self.stateTooltip.closedSignal.connect(self.cancelRecognition)
             self.stateTooltip.move(self.width() // 2 - self.stateTooltip.width() // 2,
                                  self.height() // 2 - self.stateTooltip.height() // 2)
         self.stateTooltip.show()
@@ -452,6 +501,7 @@ class LatexOcrInterface(ScrollArea):
         )
         if file_path:
             self.imageLabel.setImage(file_path)
+            self.sourceImage = QImage(file_path)
             InfoBar.success(
                 title='上传成功',
                 content='已成功上传图片',
@@ -461,94 +511,328 @@ class LatexOcrInterface(ScrollArea):
             )
             self.recognizeFormula()
             
-    def pasteImage(self):
-        self.handlePaste()
-        
-    def recognizeFormula(self, from_drawing=False, drawing_image=None):
-        """识别公式"""
-        # 显示加载状态
-        self.showLoading()
-        
-        try:
-            # 获取图像
-            if from_drawing and drawing_image:
-                # 从手写板获取图像
-                image = drawing_image
-                width = image.width()
-                height = image.height()
-                ptr = image.bits()
-                ptr.setsize(height * width * 3)
-                arr = np.frombuffer(ptr, np.uint8).reshape((height, width, 3))
-                img = cv2.cvtColor(arr, cv2.COLOR_RGB2BGR)
-            else:
-                # 从imageLabel获取图像
-                pixmap = self.imageLabel.pixmap()
-                if not pixmap:
-                    return
-                image = pixmap.toImage()
-                width = image.width()
-                height = image.height()
-                ptr = image.bits()
-                ptr.setsize(height * width * 4)
-                arr = np.frombuffer(ptr, np.uint8).reshape((height, width, 4))
-                img = cv2.cvtColor(arr, cv2.COLOR_RGBA2BGR)
-            
-            # 调用识别服务
-            result = self.ocr_service.recognize(img)
-            
-            if result['status']:
-                # 保存历史记录
-                _, img_encoded = cv2.imencode('.png', img)
-                record_id = self.db.add_record(
-                    img_encoded.tobytes(),
-                    result['latex'],
-                    result['confidence'],
-                    result['request_id']
-                )
-                self.current_record_id = record_id
-                
-                # 更新界面
-                self.resultEdit.setText(result['latex'])
-                
-                # 更新置信度显示
-                confidence_value = int(result['confidence'] * 100)
-                self.confidenceBar.setValue(confidence_value)
-                self.confidenceValueLabel.setText(f"{confidence_value}%")
-                
-                # 设置置信度颜色
-                self.updateConfidenceColor(confidence_value)
-                
-                # 显示成功信息
-                InfoBar.success(
-                    title='识别成功',
-                    content=f'置信度: {result["confidence"]:.2%}',
-                    duration=2000,
-                    position=InfoBarPosition.TOP,
-                    parent=self
-                )
-                
-                # 显示结果区域
-                self.showResult()
-            else:
-                InfoBar.error(
-                    title='识别失败',
-                    content=result['message'],
+    def batchRecognize(self):
+        """选择文件夹并批量识别其中的图片"""
+        if self.batchTask is not None:
+            InfoBar.warning(
+                title='提示',
+                content='已有批量识别任务正在进行',
+                duration=2000,
+                position=InfoBarPosition.TOP,
+                parent=self
+            )
+            return
+
+        folder = QFileDialog.getExistingDirectory(self, "选择图片文件夹", "./")
+        if not folder:
+            return
+
+        service = OcrServiceFactory.with_priority(self.ocr_service, PRIORITY_BULK)
+        recognizer = BatchRecognizer(service, self.db, workers=cfg.batchWorkers.value)
+        self.batchTask = BatchTask(recognizer, folder)
+        self.batchTask.signals.progress.connect(self.onBatchProgress)
+        self.batchTask.signals.finished.connect(self.onBatchFinished)
+
+        self.batchTooltip = StateToolTip('批量识别中', '正在扫描文件夹...', self)
+        self.batchTooltip.closedSignal.connect(self.onBatchCancelled)
+        self.batchTooltip.move(self.width() - self.batchTooltip.width() - 24, 24)
+        self.batchTooltip.show()
+        self.batchButton.setEnabled(False)
+        recognitionPool.start(self.batchTask)
+
+    def pageRecognize(self):
+        """对当前图片做版面分析，逐个区域识别"""
+        image = self.sourceImage
+        if image is None or image.isNull():
+            pixmap = self.imageLabel.pixmap()
+            if not pixmap:
+                InfoBar.warning(
+                    title='提示',
+                    content='请先上传或粘贴一张页面截图',
                     duration=2000,
                     position=InfoBarPosition.TOP,
                     parent=self
                 )
-                
-        except Exception as e:
-            print(f"Error details: {str(e)}")
+                return
+            image = pixmap.toImage()
+
+        task = PageRecognitionTask(self.ocr_service, self.db, image, workers=cfg.pageWorkers.value)
+        task.signals.stageChanged.connect(self.onRecognitionStage)
+        task.signals.finished.connect(self.onPageRecognitionFinished)
+        task.signals.failed.connect(self.onRecognitionFailed)
+        task.signals.cancelled.connect(self.onRecognitionCancelled)
+        self.tasks[task.id] = task
+
+        self.showLoading('正在分析版面...')
+        recognitionPool.start(task)
+
+    def onPageRecognitionFinished(self, task_id, result):
+        """整页识别完成"""
+        self.finishTask(task_id)
+        regions = result['regions']
+        succeeded = [item for item in regions if item['status']]
+
+        # 拼接后的结果不对应单条历史记录，编辑时不回写数据库
+        self.current_record_id = None
+        self.resultEdit.setText(join_results(regions))
+
+        confidence_value = int(sum(item['confidence'] for item in succeeded) / len(succeeded) * 100)
+        self.confidenceBar.setValue(confidence_value)
+        self.confidenceValueLabel.setText(f"{confidence_value}%")
+        self.updateConfidenceColor(confidence_value)
+
+        InfoBar.success(
+            title='整页识别完成',
+            content=f'共 {len(regions)} 个区域，成功 {len(succeeded)} 个，已逐条保存到历史记录',
+            duration=3000,
+            position=InfoBarPosition.TOP,
+            parent=self
+        )
+        self.showResult()
+
+    def onBatchProgress(self, snapshot):
+        """批量识别进度"""
+        if not self.batchTooltip:
+            return
+        eta = snapshot['eta']
+        eta_text = f"{int(eta) // 60:02d}:{int(eta) % 60:02d}" if eta is not None else '--:--'
+        self.batchTooltip.setContent(
+            f"{snapshot['done']}/{snapshot['total']} · {snapshot['throughput']:.1f} 张/秒 · 剩余 {eta_text}")
+
+    def onBatchCancelled(self):
+        """关闭批量识别提示即取消任务，已发出的请求完成后触发 onBatchFinished"""
+        # 提示框关闭后会被销毁，不再更新进度
+        self.batchTooltip = None
+        if self.batchTask is not None:
+            self.batchTask.cancel()
+
+    def onBatchFinished(self, snapshot):
+        """批量识别结束"""
+        self.batchTask = None
+        self.batchButton.setEnabled(True)
+        if self.batchTooltip:
+            self.batchTooltip.setContent('批量识别完成')
+            self.batchTooltip.setState(True)
+            self.batchTooltip = None
+
+        if snapshot.get('error'):
             InfoBar.error(
-                title='请求失败',
-                content=str(e),
-                duration=2000,
+                title='批量识别失败',
+                content=snapshot['error'],
+                duration=3000,
                 position=InfoBarPosition.TOP,
                 parent=self
             )
-        finally:
+            return
+
+        InfoBar.success(
+            title='批量识别结束',
+            content=f"共 {snapshot['total']} 张，成功 {snapshot['succeeded']}，失败 {snapshot['failed']}",
+            duration=3000,
+            position=InfoBarPosition.TOP,
+            parent=self
+        )
+
+    def pasteImage(self):
+        self.handlePaste()
+        
+    def recognizeFormula(self, from_drawing=False, drawing_image=None, force=False):
+        """识别公式（在线程池中执行，不阻塞界面）"""
+        # 获取图像
+        if from_drawing and drawing_image:
+            # 从手写板获取图像
+            image = drawing_image
+        else:
+            # 从imageLabel获取图像
+            pixmap = self.imageLabel.pixmap()
+            if not pixmap:
+                return
+            with tracer.span('ui.pixmap_to_image'):
+                image = pixmap.toImage()
+
+        self.lastImage = image
+        task = RecognitionTask(self.ocr_service, self.db, image, self.duplicate_index, force, self.offline_queue)
+        task.signals.stageChanged.connect(self.onRecognitionStage)
+        task.signals.finished.connect(self.onRecognitionFinished)
+        task.signals.failed.connect(self.onRecognitionFailed)
+        task.signals.deferred.connect(self.onRecognitionDeferred)
+        task.signals.cancelled.connect(self.onRecognitionCancelled)
+        self.tasks[task.id] = task
+
+        # 显示加载状态
+        self.showLoading()
+        recognitionPool.start(task)
+
+    def forceRecognize(self):
+        """跳过相似图片匹配，重新调用接口识别最近一次的图像"""
+        if self.lastImage is not None:
+            self.recognizeFormula(from_drawing=True, drawing_image=self.lastImage, force=True)
+
+    def onDuplicateThresholdChanged(self, value):
+        """相似度阈值变化"""
+        self.duplicate_index.max_distance = value
+
+    def cancelRecognition(self):
+        """取消所有进行中的识别任务"""
+        for task in self.tasks.values():
+            task.cancel()
+
+    def finishTask(self, task_id):
+        """任务结束后的清理"""
+        task = self.tasks.pop(task_id, None)
+        if task is not None:
+            # 从点击识别到结果回到界面线程的总耗时
+            tracer.record('ui.end_to_end', task.created, tracer.now() - task.created)
+        if not self.tasks:
             self.hideLoading()
+        else:
+            self.showLoading(f"正在识别...（剩余 {len(self.tasks)} 项）")
+
+    def onRecognitionStage(self, task_id, stage):
+        """识别阶段变化"""
+        if task_id in self.tasks and len(self.tasks) == 1:
+            self.showLoading(stage)
+
+    def onRecognitionFinished(self, task_id, result):
+        """识别成功"""
+        self.finishTask(task_id)
+        self.current_record_id = result['record_id']
+
+        # 更新界面
+        self.resultEdit.setText(result['latex'])
+
+        # 更新置信度显示
+        confidence_value = int(result['confidence'] * 100)
+        self.confidenceBar.setValue(confidence_value)
+        self.confidenceValueLabel.setText(f"{confidence_value}%")
+
+        # 设置置信度颜色
+        self.updateConfidenceColor(confidence_value)
+
+        # 命中相似的历史记录时，提供重新识别的入口
+        if 'duplicate_distance' in result:
+            bar = InfoBar.info(
+                title='已匹配历史记录',
+                content=f'找到相似图片的识别结果（差异 {result["duplicate_distance"]}），未消耗识别额度',
+                duration=5000,
+                position=InfoBarPosition.TOP,
+                parent=self
+            )
+            retryButton = PushButton('重新识别', bar)
+            retryButton.clicked.connect(self.forceRecognize)
+            retryButton.clicked.connect(bar.close)
+            bar.addWidget(retryButton)
+            self.showResult()
+            return
+
+        # 显示成功信息
+        content = f'置信度: {result["confidence"]:.2%}'
+        if result.get('cached'):
+            content += '（缓存结果）'
+        remaining = self.ocr_service.remaining_quota()
+        if remaining is not None:
+            content += f'，今日剩余 {remaining} 次'
+        InfoBar.success(
+            title='识别成功',
+            content=content,
+            duration=2000,
+            position=InfoBarPosition.TOP,
+            parent=self
+        )
+
+        # 显示结果区域
+        self.showResult()
+
+    def onRecognitionFailed(self, task_id, message):
+        """识别失败"""
+        self.finishTask(task_id)
+        InfoBar.error(
+            title='识别失败',
+            content=message,
+            duration=2000,
+            position=InfoBarPosition.TOP,
+            parent=self
+        )
+
+    def onRecognitionCancelled(self, task_id):
+        """识别已取消"""
+        self.finishTask(task_id)
+
+    def onRecognitionDeferred(self, task_id, record_id, message):
+        """网络不可用，图片已加入离线队列"""
+        self.finishTask(task_id)
+        self.lastDeferredRecordId = record_id
+        self.drainer.notify()
+        InfoBar.warning(
+            title='已加入离线队列',
+            content=f'{message}，网络恢复后将自动识别并保存到历史记录（待识别 {self.offline_queue.count()} 项）',
+            duration=4000,
+            position=InfoBarPosition.TOP,
+            parent=self
+        )
+
+    def onOfflineRecognitionFinished(self, record_id, result):
+        """离线队列中的图片补识别完成"""
+        # 用户没有开始新的识别时，直接展示最近一次被推迟的结果
+        if record_id == self.lastDeferredRecordId and not self.tasks:
+            self.lastDeferredRecordId = None
+            self.current_record_id = record_id
+            self.resultEdit.setText(result['latex'])
+            confidence_value = int(result['confidence'] * 100)
+            self.confidenceBar.setValue(confidence_value)
+            self.confidenceValueLabel.setText(f"{confidence_value}%")
+            self.updateConfidenceColor(confidence_value)
+            self.showResult()
+        InfoBar.success(
+            title='离线识别完成',
+            content=f'已补全历史记录，置信度: {result["confidence"]:.2%}',
+            duration=2000,
+            position=InfoBarPosition.TOP,
+            parent=self
+        )
+
+    def onClipboardRecognized(self, result):
+        """剪贴板图片自动识别完成"""
+        # 没有进行中的手动识别时展示结果
+        if not self.tasks:
+            self.current_record_id = result['record_id']
+            self.resultEdit.setText(result['latex'])
+            confidence_value = int(result['confidence'] * 100)
+            self.confidenceBar.setValue(confidence_value)
+            self.confidenceValueLabel.setText(f"{confidence_value}%")
+            self.updateConfidenceColor(confidence_value)
+            self.showResult()
+        content = f'置信度: {result["confidence"]:.2%}'
+        if self.clipboardWatcher.write_back:
+            content += '，LaTeX 已复制到剪贴板'
+        InfoBar.success(
+            title='剪贴板识别完成',
+            content=content,
+            duration=2000,
+            position=InfoBarPosition.TOP,
+            parent=self
+        )
+
+    def onClipboardFailed(self, message):
+        """剪贴板图片自动识别失败"""
+        InfoBar.error(
+            title='剪贴板识别失败',
+            content=message,
+            duration=2000,
+            position=InfoBarPosition.TOP,
+            parent=self
+        )
+
+    def onClipboardDeferred(self, record_id, message):
+        """剪贴板图片已加入离线队列"""
+        self.drainer.notify()
+        InfoBar.warning(
+            title='已加入离线队列',
+            content=f'{message}，网络恢复后将自动识别剪贴板中的图片',
+            duration=4000,
+            position=InfoBarPosition.TOP,
+            parent=self
+        )
 
     def updateConfidenceColor(self, confidence_value):
         """更新置信度进度条颜色"""
@@ -638,6 +922,7 @@ class LatexOcrInterface(ScrollArea):
         if mimeData.hasImage():
             pixmap = clipboard.pixmap()
             if not pixmap.isNull():
+                self.sourceImage = pixmap.toImage()
                 # 获取设备像素比
                 device_ratio = self.devicePixelRatio()
                 # 设置图片的设备像素比
@@ -716,7 +1001,7 @@ class LatexOcrInterface(ScrollArea):
         # 更新渲染
         self.updateRender()
         # 更新数据库
-        if hasattr(self, 'current_record_id'):
+        if getattr(self, 'current_record_id', None) is not None:
             print(f"Updating latex for record ID: {self.current_record_id}")  # 打印当前记录ID
             self.db.update_latex(self.current_record_id, latex)
         else:
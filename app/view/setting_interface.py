@@ -10,6 +10,7 @@ from PyQt5.QtGui import QDesktopServices, QColor
 from PyQt5.QtWidgets import QWidget, QLabel, QFileDialog
 import re  # 在文件顶部添加
 
+from ..common.tracing import tracer
 from ..common.config import cfg, HELP_URL, FEEDBACK_URL, AUTHOR, VERSION, YEAR, isWin11
 from ..common.signal_bus import signalBus
 from ..common.style_sheet import StyleSheet
@@ -176,6 +177,125 @@ class SettingInterface(ScrollArea):
             cfg.token.value,
             self.latexOcrGroup
         )
+        self.connectTimeoutCard = RangeSettingCard(
+            cfg.connectTimeout,
+            FIF.CONNECT,
+            "连接超时",
+            "建立连接的最长等待时间（秒）",
+            self.latexOcrGroup
+        )
+        self.readTimeoutCard = RangeSettingCard(
+            cfg.readTimeout,
+            FIF.STOP_WATCH,
+            "读取超时",
+            "等待识别结果的最长时间（秒）",
+            self.latexOcrGroup
+        )
+        self.poolSizeCard = RangeSettingCard(
+            cfg.poolSize,
+            FIF.SYNC,
+            "连接池大小",
+            "可复用的最大并发连接数，重启后生效",
+            self.latexOcrGroup
+        )
+        self.dailyQuotaCard = RangeSettingCard(
+            cfg.dailyQuota,
+            FIF.CALENDAR,
+            "每日额度",
+            "每个令牌每天最多调用接口的次数，0 表示不限",
+            self.latexOcrGroup
+        )
+        self.rateLimitCard = RangeSettingCard(
+            cfg.requestsPerMinute,
+            FIF.SPEED_HIGH,
+            "请求频率",
+            "每分钟最多发送的识别请求数，所有识别任务共享",
+            self.latexOcrGroup
+        )
+        self.hedgeCard = SwitchSettingCard(
+            FIF.SPEED_OFF,
+            "对冲请求",
+            "识别较慢时延迟向备用服务商（或同一服务商）再发一次请求，取先返回的结果，会额外消耗额度，重启后生效",
+            configItem=cfg.hedgeEnabled,
+            parent=self.latexOcrGroup
+        )
+        self.offlineQueueCard = SwitchSettingCard(
+            FIF.CLOUD,
+            "离线队列",
+            "网络不可用时暂存待识别图片，恢复后自动识别并补全历史记录，重启后生效",
+            configItem=cfg.offlineQueueEnabled,
+            parent=self.latexOcrGroup
+        )
+        self.clipboardWatchCard = SwitchSettingCard(
+            FIF.PASTE,
+            "监视剪贴板",
+            "复制新的图片后自动在后台识别并保存到历史记录",
+            configItem=cfg.clipboardWatchEnabled,
+            parent=self.latexOcrGroup
+        )
+        self.clipboardWriteBackCard = SwitchSettingCard(
+            FIF.COPY,
+            "结果写回剪贴板",
+            "剪贴板图片识别成功后，用 LaTeX 代码替换剪贴板内容",
+            configItem=cfg.clipboardWriteBack,
+            parent=self.latexOcrGroup
+        )
+        self.cacheCard = SwitchSettingCard(
+            FIF.SAVE,
+            "识别结果缓存",
+            "相同图片直接返回缓存结果，不消耗接口额度，重启后生效",
+            configItem=cfg.cacheEnabled,
+            parent=self.latexOcrGroup
+        )
+        self.preprocessCard = SwitchSettingCard(
+            FIF.ZOOM,
+            "上传前优化图片",
+            "裁掉留白、转为灰度并按字高缩小，减小上传体积，重启后生效",
+            configItem=cfg.preprocessEnabled,
+            parent=self.latexOcrGroup
+        )
+        self.binarizeCard = SwitchSettingCard(
+            FIF.PALETTE,
+            "二值化",
+            "上传黑白二值图，体积最小，复杂背景下可能影响识别，重启后生效",
+            configItem=cfg.preprocessBinarize,
+            parent=self.latexOcrGroup
+        )
+        self.duplicateLookupCard = SwitchSettingCard(
+            FIF.SEARCH,
+            "相似图片匹配",
+            "识别前查找历史记录中近似的图片，直接复用结果，重启后生效",
+            configItem=cfg.duplicateLookupEnabled,
+            parent=self.latexOcrGroup
+        )
+        self.tracingCard = SwitchSettingCard(
+            FIF.STOP_WATCH,
+            "性能追踪",
+            "统计识别流程各阶段（图像转换、编码、网络请求、数据库写入）的耗时分布",
+            configItem=cfg.tracingEnabled,
+            parent=self.latexOcrGroup
+        )
+        self.traceEventsCard = SwitchSettingCard(
+            FIF.HISTORY,
+            "记录追踪事件",
+            "保留最近 20000 个阶段的明细供导出，会占用额外内存，排查问题时再开启",
+            configItem=cfg.traceEventsEnabled,
+            parent=self.latexOcrGroup
+        )
+        self.exportTraceCard = PushSettingCard(
+            "导出",
+            FIF.SHARE,
+            "导出性能追踪",
+            "导出为 Chrome trace-event JSON，可在 chrome://tracing 或 Perfetto 中查看",
+            self.latexOcrGroup
+        )
+        self.duplicateThresholdCard = RangeSettingCard(
+            cfg.duplicateThreshold,
+            FIF.FILTER,
+            "相似度阈值",
+            "允许的感知哈希差异位数，越大越宽松",
+            self.latexOcrGroup
+        )
 
         self.__initWidget()
 
@@ -217,6 +337,23 @@ class SettingInterface(ScrollArea):
         self.latexOcrGroup.addSettingCard(self.typeCard)
         self.latexOcrGroup.addSettingCard(self.apiUrlCard)
         self.latexOcrGroup.addSettingCard(self.tokenCard)
+        self.latexOcrGroup.addSettingCard(self.connectTimeoutCard)
+        self.latexOcrGroup.addSettingCard(self.readTimeoutCard)
+        self.latexOcrGroup.addSettingCard(self.poolSizeCard)
+        self.latexOcrGroup.addSettingCard(self.dailyQuotaCard)
+        self.latexOcrGroup.addSettingCard(self.rateLimitCard)
+        self.latexOcrGroup.addSettingCard(self.hedgeCard)
+        self.latexOcrGroup.addSettingCard(self.offlineQueueCard)
+        self.latexOcrGroup.addSettingCard(self.clipboardWatchCard)
+        self.latexOcrGroup.addSettingCard(self.clipboardWriteBackCard)
+        self.latexOcrGroup.addSettingCard(self.cacheCard)
+        self.latexOcrGroup.addSettingCard(self.preprocessCard)
+        self.latexOcrGroup.addSettingCard(self.binarizeCard)
+        self.latexOcrGroup.addSettingCard(self.duplicateLookupCard)
+        self.latexOcrGroup.addSettingCard(self.duplicateThresholdCard)
+        self.latexOcrGroup.addSettingCard(self.tracingCard)
+        self.latexOcrGroup.addSettingCard(self.traceEventsCard)
+        self.latexOcrGroup.addSettingCard(self.exportTraceCard)
         self.expandLayout.addWidget(self.latexOcrGroup)
 
         # add setting card group to layout
@@ -261,6 +398,26 @@ class SettingInterface(ScrollArea):
         # 连接 API URL 和 Token 的点击事件
         self.apiUrlCard.clicked.connect(self.__onApiUrlCardClicked)
         self.tokenCard.clicked.connect(self.__onTokenCardClicked)
+        self.exportTraceCard.clicked.connect(self.__onExportTraceCardClicked)
+
+    def __onExportTraceCardClicked(self):
+        """ export trace card clicked slot """
+        path, _ = QFileDialog.getSaveFileName(
+            self, "导出性能追踪", "./latex_ocr_trace.json", "JSON (*.json)")
+        if not path:
+            return
+
+        count = tracer.export_chrome_trace(path)
+        if not tracer.capture_events:
+            content = "已导出各阶段耗时统计，开启“记录追踪事件”后可导出明细"
+        else:
+            content = f"已导出 {count} 条追踪事件"
+        InfoBar.success(
+            "导出成功",
+            content,
+            duration=2000,
+            parent=self
+        )
 
     def __onApiUrlCardClicked(self):
         """ API URL card clicked slot """
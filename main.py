@@ -8,6 +8,7 @@ from PyQt5.QtWidgets import QApplication
 from qfluentwidgets import FluentTranslator
 
 from app.common.config import cfg
+from app.common.tracing import tracer
 from app.view.main_window import MainWindow
 
 
@@ -22,6 +23,12 @@ else:
 
 QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps)
 
+# stage-level latency tracing
+tracer.enabled = cfg.get(cfg.tracingEnabled)
+tracer.capture_events = cfg.get(cfg.traceEventsEnabled)
+cfg.tracingEnabled.valueChanged.connect(lambda enabled: setattr(tracer, 'enabled', enabled))
+cfg.traceEventsEnabled.valueChanged.connect(lambda enabled: setattr(tracer, 'capture_events', enabled))
+
 # create application
 app = QApplication(sys.argv)
 app.setAttribute(Qt.AA_DontCreateNativeWidgetSiblings)
@@ -0,0 +1,62 @@
+# coding: utf-8
+import threading
+import time
+
+import pytest
+
+from app.common.db_connection import ConnectionManager
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = ConnectionManager(str(tmp_path / 'test.db'), max_readers=1)
+    with manager.write() as conn:
+        conn.execute('CREATE TABLE t (x INTEGER)')
+        conn.executemany('INSERT INTO t VALUES (?)', [(i,) for i in range(3)])
+    yield manager
+    manager.close()
+
+
+def test_nested_read_reuses_connection(manager):
+    with manager.read() as outer:
+        # 池只有一个连接：嵌套读取若再借一个会自锁
+        with manager.read() as inner:
+            assert inner is outer
+            assert inner.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 3
+        # 内层退出后外层连接仍可用，且未提前归还
+        assert outer.execute('SELECT MAX(x) FROM t').fetchone()[0] == 2
+        assert manager._idle == []
+    assert manager._idle == [outer]
+
+
+def test_pool_is_bounded_and_reused(manager):
+    with manager.read() as first:
+        pass
+    started = threading.Event()
+    got = []
+
+    def reader():
+        started.set()
+        with manager.read() as conn:
+            got.append(conn)
+
+    with manager.read() as held:
+        assert held is first
+        thread = threading.Thread(target=reader)
+        thread.start()
+        started.wait()
+        time.sleep(0.05)
+        # 池已满，其他线程等待归还而不是新开连接
+        assert got == []
+        assert len(manager._readers) == 1
+    thread.join(5)
+    assert got == [first]
+
+
+def test_nested_read_error_keeps_outer_usable(manager):
+    with manager.read() as outer:
+        with pytest.raises(ZeroDivisionError):
+            with manager.read():
+                1 / 0
+        assert outer.execute('SELECT 1').fetchone()[0] == 1
+    assert manager._idle == [outer]
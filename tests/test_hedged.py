@@ -0,0 +1,61 @@
+# coding: utf-8
+import threading
+import time
+
+import numpy as np
+
+from app.common.ocr_service import HedgedOcrService, failure_result, is_cancelled
+
+
+class DelayedService:
+    """等待 delay 秒后返回结果；等待期间被取消则记录下来并放弃"""
+
+    def __init__(self, delay, status=True, confidence=0.9):
+        self.delay = delay
+        self.status = status
+        self.confidence = confidence
+        self.calls = 0
+        self.cancelled = threading.Event()
+
+    def recognize(self, image_data):
+        self.calls += 1
+        deadline = time.monotonic() + self.delay
+        while time.monotonic() < deadline:
+            if is_cancelled():
+                self.cancelled.set()
+                return failure_result('请求已取消')
+            time.sleep(0.005)
+        if not self.status:
+            return failure_result('failed')
+        return {'status': True, 'latex': 'x', 'confidence': self.confidence, 'request_id': 'r', 'message': None}
+
+
+IMAGE = np.zeros((4, 4, 3), np.uint8)
+
+
+def test_fast_primary_skips_hedge():
+    primary, backup = DelayedService(0), DelayedService(0)
+    hedged = HedgedOcrService([(primary, 0), (backup, 0.2)])
+    assert hedged.recognize(IMAGE)['status']
+    assert backup.calls == 0
+    assert hedged.stats['hedges_skipped'] == 1
+
+
+def test_slow_primary_loses_and_is_cancelled():
+    primary, backup = DelayedService(2), DelayedService(0)
+    hedged = HedgedOcrService([(primary, 0), (backup, 0.05)])
+    start = time.monotonic()
+    assert hedged.recognize(IMAGE)['status']
+    assert time.monotonic() - start < 1
+    assert hedged.stats['hedge_wins'] == 1
+    # 落后的请求收到取消信号，不再等到完成
+    assert primary.cancelled.wait(1)
+
+
+def test_all_failures_return_failure():
+    hedged = HedgedOcrService([(DelayedService(0, status=False), 0), (DelayedService(0, status=False), 0.5)])
+    start = time.monotonic()
+    result = hedged.recognize(IMAGE)
+    assert not result['status']
+    # 首个请求失败时立即启动下一个，而不是等到启动延迟
+    assert time.monotonic() - start < 0.4
@@ -0,0 +1,64 @@
+# coding: utf-8
+import pytest
+
+from app.common.db_manager import DatabaseManager
+
+USER = 'tester'
+
+
+def make_db(tmp_path, timestamps):
+    """按给定时间戳写入记录，另有一条其他用户的记录夹在中间"""
+    db = DatabaseManager(str(tmp_path / 'history.db'))
+    rows = [(ts, f'x_{i}', f'r{i}', USER) for i, ts in enumerate(timestamps)]
+    rows.append((timestamps[len(timestamps) // 2], 'other', 'other', 'other'))
+    with db.connections.write() as conn:
+        conn.executemany('''
+            INSERT INTO history (timestamp, image_data, image_blob, latex_result, confidence, request_id, user_id)
+            VALUES (?, '', X'', ?, 0.9, ?, ?)
+        ''', rows)
+    return db
+
+
+def expected_ids(db):
+    with db.connections.read() as conn:
+        return [row[0] for row in conn.execute(
+            'SELECT id FROM history WHERE user_id = ? ORDER BY timestamp DESC, id DESC', (USER,))]
+
+
+def walk(db, page_size, search_text=None):
+    pages, after = [], None
+    while True:
+        records, after = db.get_history_page(page_size, search_text, USER, after)
+        pages.append([record[0] for record in records])
+        if after is None:
+            return pages
+        assert len(pages) < 100, '游标没有前进'
+
+
+@pytest.mark.parametrize('page_size', [1, 2, 3, 4, 7, 8])
+def test_pages_cover_ties_without_gaps(tmp_path, page_size):
+    # 大量记录时间戳相同，且相同时间戳跨越页边界
+    timestamps = ['2024-01-02 00:00:00'] * 4 + ['2024-01-01 00:00:00'] * 3
+    db = make_db(tmp_path, timestamps)
+    pages = walk(db, page_size)
+    assert [record_id for page in pages for record_id in page] == expected_ids(db)
+    assert all(len(page) == page_size for page in pages[:-1])
+
+
+def test_last_page_has_no_cursor(tmp_path):
+    db = make_db(tmp_path, [f'2024-01-0{day} 00:00:00' for day in range(1, 7)])
+    # 记录数恰好是页大小的整数倍：最后一页不返回游标，也不会多出空页
+    pages = walk(db, 3)
+    assert [len(page) for page in pages] == [3, 3]
+    records, after = db.get_history_page(10, None, USER)
+    assert len(records) == 6 and after is None
+
+
+def test_search_pages_use_keyset(tmp_path):
+    db = make_db(tmp_path, ['2024-01-01 00:00:00'] * 5)
+    # 索引未就绪时按 LIKE 搜索，同样以 (timestamp, id) 游标分页
+    db.search_ready = False
+    with db.connections.write() as conn:
+        conn.execute("UPDATE history_meta SET value = -1 WHERE key = 'fts_backfill_last'")
+    pages = walk(db, 2, 'x_')
+    assert [record_id for page in pages for record_id in page] == expected_ids(db)
@@ -0,0 +1,58 @@
+# coding: utf-8
+import base64
+
+import pytest
+
+from app.common.db_manager import DatabaseManager, decode_image
+
+USER = 'tester'
+PNG = b'\x89PNG\r\n\x1a\n' + bytes(range(64))
+
+
+@pytest.mark.parametrize('blob, text, expected', [
+    (PNG, '', PNG),
+    (memoryview(PNG), '', PNG),
+    (None, base64.b64encode(PNG).decode('ascii'), PNG),
+    # 已迁移的记录以 image_blob 为准
+    (PNG, base64.b64encode(b'old').decode('ascii'), PNG),
+    (None, 'abc', b''),
+    (b'', '', b''),
+    (None, None, b''),
+])
+def test_decode_image(blob, text, expected):
+    assert decode_image(blob, text) == expected
+
+
+@pytest.fixture
+def db(tmp_path):
+    """一半记录已迁移、一半仍为 base64 文本，另有一条无法解码的旧记录"""
+    db = DatabaseManager(str(tmp_path / 'history.db'))
+    new_id = db.add_record(PNG, 'x', 0.9, 'new', user_id=USER, thumbnail=b'')
+    with db.connections.write() as conn:
+        conn.execute('''
+            INSERT INTO history (timestamp, image_data, image_blob, latex_result, confidence, request_id, user_id)
+            VALUES ('2020-01-01', ?, NULL, 'y', 0.9, 'legacy', ?), ('2020-01-02', 'abc', NULL, 'z', 0.9, 'broken', ?)
+        ''', (base64.b64encode(PNG).decode('ascii'), USER, USER))
+        ids = dict(conn.execute('SELECT request_id, id FROM history').fetchall())
+    assert ids['new'] == new_id
+    return db, ids
+
+
+def test_reads_before_and_after_migration(db):
+    db, ids = db
+    assert db.has_legacy_images()
+    for _ in range(2):
+        assert db.get_image(ids['new']) == PNG
+        assert db.get_image(ids['legacy']) == PNG
+        assert db.get_image(ids['broken']) == b''
+        records, total = db.get_records(1, 10, user_id=USER)
+        assert total == 3
+        assert {record[0]: record[2] for record in records} == {
+            ids['new']: PNG, ids['legacy']: PNG, ids['broken']: b''}
+        db.migrate_images(pause=0)
+    assert not db.has_legacy_images()
+    assert db.get_image(-1) is None
+
+    with db.connections.read() as conn:
+        row = conn.execute('SELECT image_blob, image_data FROM history WHERE id = ?', (ids['legacy'],)).fetchone()
+    assert (bytes(row[0]), row[1]) == (PNG, '')
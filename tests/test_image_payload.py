@@ -0,0 +1,46 @@
+# coding: utf-8
+import threading
+
+import cv2
+import numpy as np
+
+from app.common.image_payload import ImagePayload, as_payload
+
+
+def formula_image():
+    """白底黑字、四周大片留白的截图"""
+    image = np.full((300, 800, 3), 255, np.uint8)
+    cv2.putText(image, 'x^2 + y_1 = z', (200, 160), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 0, 0), 3)
+    return image
+
+
+def test_encodes_once_across_threads():
+    payload = ImagePayload(formula_image())
+    calls = []
+    barrier = threading.Barrier(8)
+
+    def encoder(image):
+        calls.append(1)
+        return cv2.imencode('.png', image)[1]
+
+    def use():
+        barrier.wait()
+        payload.encoded('png', encoder)
+
+    threads = [threading.Thread(target=use) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+
+
+def test_png_is_shared_readonly_view():
+    image = formula_image()
+    payload = as_payload(image)
+    assert as_payload(payload) is payload
+    first, second = payload.png(), payload.png()
+    assert first.readonly
+    assert first.obj is second.obj
+    decoded = cv2.imdecode(np.frombuffer(first, np.uint8), cv2.IMREAD_COLOR)
+    assert np.array_equal(decoded, image)
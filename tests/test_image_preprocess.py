@@ -0,0 +1,32 @@
+# coding: utf-8
+import cv2
+import numpy as np
+
+from app.common.image_payload import ImagePayload
+from app.common.image_preprocess import ImagePreprocessor
+
+
+def formula_image():
+    """白底黑字、四周大片留白的截图"""
+    image = np.full((300, 800, 3), 255, np.uint8)
+    cv2.putText(image, 'x^2 + y_1 = z', (200, 160), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 0, 0), 3)
+    return image
+
+
+def test_preprocessor_shrinks_upload():
+    image = formula_image()
+    data, report = ImagePreprocessor().process(image)
+    assert len(data) == report['bytes'] < len(ImagePayload(image).png())
+    decoded = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_UNCHANGED)
+    # 裁掉留白后尺寸变小，内容仍可解码
+    assert decoded.shape[:2] == report['shape'][:2]
+    assert decoded.shape[1] < image.shape[1]
+    assert set(report['timings']) >= {'autocrop', 'grayscale', 'encode'}
+
+
+def test_binarize_keeps_glyphs():
+    image = formula_image()
+    data, _ = ImagePreprocessor(binary=True, target_glyph_height=0).process(image)
+    decoded = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_UNCHANGED)
+    assert set(np.unique(decoded)) <= {0, 255}
+    assert (decoded == 0).any()
@@ -0,0 +1,98 @@
+# coding: utf-8
+import sqlite3
+
+import pytest
+
+from app.common.db_manager import DatabaseManager
+from app.common.latex_search import build_match_query, latex_tokens
+
+USER = 'tester'
+LATEX = [
+    r'\frac{a}{b}',
+    r'\mathrm{d}x',
+    r'\int_0^1 \frac{\mathrm{d}x}{x^2}',
+    r'\sqrt{2} + \alpha',
+    r'x^2 + y_1',
+    r'\left( \frac{1}{2} \right)',
+    r'\mathrm{frac} \text{of}',
+]
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'history.db'))
+    for i, latex in enumerate(LATEX):
+        db.add_record(b'png', latex, 0.9, f'r{i}', user_id=USER, thumbnail=b'')
+    db.backfill_search_index(pause=0)
+    assert db.is_search_ready()
+    return db
+
+
+def fts_ids(db, text):
+    records, _ = db.get_history_page(page_size=100, search_text=text, user_id=USER)
+    return sorted(record[0] for record in records)
+
+
+def like_ids(db, text):
+    with db.connections.read() as conn:
+        rows = conn.execute(
+            'SELECT id FROM history WHERE user_id = ? AND latex_result LIKE ?', (USER, f'%{text}%')
+        ).fetchall()
+    return sorted(row[0] for row in rows)
+
+
+def test_commands_indexed_with_and_without_backslash():
+    assert latex_tokens(r'\frac{x_1}{2}') == r'\frac frac x _ 1 2'
+    assert build_match_query('frac') == '"frac" *'
+    assert build_match_query(r'\fr') == r'"\fr" *'
+    assert build_match_query(r'\frac{a}') == r'"\frac frac a" *'
+    assert build_match_query(r'"\frac"') == r'"\frac frac"'
+
+
+@pytest.mark.parametrize('text', [
+    'frac', r'\frac', r'\fr', 'mathrm', r'\mathrm', 'sqrt', 'alpha', 'left', r'\left', 'x^2',
+    r'\frac{1}', r'\mathrm{d}x',
+])
+def test_command_names_match_like_search(db, text):
+    assert db._search_match(text) is not None
+    assert fts_ids(db, text) == like_ids(db, text)
+    assert db.count_history_records(text, USER) == len(like_ids(db, text))
+
+
+def test_stale_index_is_rebuilt(tmp_path):
+    path = str(tmp_path / 'history.db')
+    db = DatabaseManager(path)
+    db.add_record(b'png', r'\frac{a}{b}', 0.9, 'r0', user_id=USER, thumbnail=b'')
+
+    # 模拟旧版本建立的索引：命令带反斜杠作为词元，且没有记录版本
+    conn = sqlite3.connect(path)
+    conn.executescript(r'''
+        DROP TRIGGER history_fts_insert;
+        DROP TRIGGER history_fts_delete;
+        DROP TRIGGER history_fts_update;
+        DROP TABLE history_fts;
+        CREATE VIRTUAL TABLE history_fts USING fts5(
+            tokens, tokenize="unicode61 remove_diacritics 0 tokenchars '\_^'", prefix='2 3'
+        );
+        INSERT INTO history_fts (rowid, tokens) SELECT id, '\frac a b' FROM history;
+        DELETE FROM history_meta WHERE key = 'fts_version';
+    ''')
+    conn.close()
+
+    db = DatabaseManager(path)
+    assert not db.is_search_ready()
+    assert fts_ids(db, 'frac') == like_ids(db, 'frac')
+    db.backfill_search_index(pause=0)
+    assert db.is_search_ready()
+    assert fts_ids(db, 'frac') == like_ids(db, 'frac') == [1]
+
+
+def test_ranked_search_counts_only_own_rows(db, monkeypatch):
+    monkeypatch.setattr('app.common.db_manager.RANKED_SEARCH_LIMIT', 2)
+    for i in range(3):
+        db.add_record(b'png', r'\alpha + %d' % i, 0.9, f'other{i}', user_id='other', thumbnail=b'')
+    match = db._search_match('alpha')
+    # 其他用户的命中不影响是否按相关度排序
+    assert db._ranked_search(match, USER)
+    assert not db._ranked_search(match, 'other')
+    assert fts_ids(db, 'alpha') == like_ids(db, 'alpha')
@@ -0,0 +1,73 @@
+# coding: utf-8
+import numpy as np
+import pytest
+import requests
+
+from app.common.ocr_service import SimpletexService
+from app.common.rate_limiter import QuotaLedger
+from app.common.settings import cfg
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.body = body or {}
+
+    def json(self):
+        return self.body
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return QuotaLedger(str(tmp_path / 'quota.db'), daily_limit=2)
+
+
+def test_reserve_respects_daily_limit(ledger):
+    assert ledger.try_reserve('t') and ledger.try_reserve('t')
+    assert not ledger.try_reserve('t')
+    assert ledger.used('t') == 2
+    ledger.release('t')
+    assert ledger.remaining('t') == 1
+    # 不同令牌分别计数
+    assert ledger.used('other') == 0
+
+
+def test_release_never_goes_negative(ledger):
+    ledger.release('t')
+    assert ledger.used('t') == 0
+
+
+def recognize_with(ledger, outcome):
+    """outcome 为异常时 post 抛出，否则作为响应返回"""
+    service = SimpletexService(ledger=ledger)
+
+    def post(*args, **kwargs):
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    service.session.post = post
+    try:
+        return service.recognize(np.zeros((8, 8, 3), np.uint8))
+    finally:
+        service.close()
+
+
+@pytest.mark.parametrize('outcome', [
+    requests.ConnectionError('refused'),
+    requests.ConnectTimeout('connect timeout'),
+    requests.ReadTimeout('read timeout'),
+    FakeResponse(429),
+    FakeResponse(503),
+    FakeResponse(401, {'status': False, 'message': 'invalid token'}),
+])
+def test_unbilled_calls_release_reservation(ledger, outcome):
+    result = recognize_with(ledger, outcome)
+    assert not result['status']
+    assert ledger.used(cfg.token.value) == 0
+
+
+def test_successful_call_keeps_reservation(ledger):
+    response = FakeResponse(200, {'status': True, 'res': {'latex': 'x', 'conf': 0.9}, 'request_id': 'r'})
+    assert recognize_with(ledger, response)['status']
+    assert ledger.used(cfg.token.value) == 1
@@ -0,0 +1,92 @@
+# coding: utf-8
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from app.common.ocr_service import ResilientOcrService, failure_result
+from app.common.resilience import CircuitBreaker, RetryPolicy
+
+
+class ScriptedService:
+    """按顺序返回预设结果的识别服务，元素为异常时抛出"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def recognize(self, image_data):
+        self.calls += 1
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def success():
+    return {'status': True, 'latex': 'x', 'confidence': 0.9, 'request_id': 'r', 'message': None}
+
+
+def open_breaker(service):
+    """熔断器在一次瞬时失败后断开，等待恢复期结束进入半开"""
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+    resilient = ResilientOcrService(service, RetryPolicy(max_attempts=1), breaker)
+    assert not resilient.recognize(np.zeros((4, 4, 3), np.uint8))['status']
+    assert breaker.state == CircuitBreaker.OPEN
+    time.sleep(0.06)
+    return resilient, breaker
+
+
+def test_non_retryable_probe_releases_breaker():
+    service = ScriptedService(
+        failure_result('busy', retryable=True),
+        failure_result('bad token'),
+        success(),
+    )
+    resilient, breaker = open_breaker(service)
+
+    # 半开探测得到非瞬时错误：原样返回
+    assert resilient.recognize(np.ones((4, 4, 3), np.uint8))['message'] == 'bad token'
+    # 之后的请求仍能到达服务，而不是一直被熔断
+    assert resilient.recognize(np.full((4, 4, 3), 2, np.uint8))['status']
+    assert service.calls == 3
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_probe_exception_releases_breaker():
+    service = ScriptedService(
+        failure_result('busy', retryable=True),
+        RuntimeError('boom'),
+        success(),
+    )
+    resilient, breaker = open_breaker(service)
+
+    with pytest.raises(RuntimeError):
+        resilient.recognize(np.ones((4, 4, 3), np.uint8))
+    assert resilient.recognize(np.full((4, 4, 3), 2, np.uint8))['status']
+    assert service.calls == 3
+
+
+def test_release_ignores_other_threads_probe():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow()
+
+    thread = threading.Thread(target=breaker.release)
+    thread.start()
+    thread.join()
+    # 其他线程的 release 不能结束本线程的探测
+    assert not breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_retry_diagnostics_stay_off_stdout(capsys):
+    service = ScriptedService(failure_result('busy', retryable=True), success())
+    breaker = CircuitBreaker(failure_threshold=5)
+    resilient = ResilientOcrService(service, RetryPolicy(max_attempts=2, base_delay=0.001), breaker)
+    assert resilient.recognize(np.zeros((4, 4, 3), np.uint8))['status']
+    out, err = capsys.readouterr()
+    assert out == ''
+    assert 'Retry 1/1' in err
@@ -0,0 +1,97 @@
+# coding: utf-8
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from app.common.ocr_service import SingleFlightOcrService, cancel_scope, cancelled_result
+
+
+class Interrupted(BaseException):
+    """模拟 KeyboardInterrupt / SystemExit 等非 Exception 中断"""
+
+
+class GatedService:
+    """首次调用阻塞到 release 后按 first 返回或抛出，之后的调用立即成功"""
+
+    def __init__(self, first):
+        self.first = first
+        self.gate = threading.Event()
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def recognize(self, image_data):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        if call == 1:
+            self.gate.wait(5)
+            if isinstance(self.first, BaseException):
+                raise self.first
+            return self.first() if callable(self.first) else self.first
+        return {'status': True, 'latex': 'x', 'confidence': 0.9, 'request_id': f'r{call}', 'message': None}
+
+
+def run_with_followers(service, leader, followers=3):
+    """leader 在首个线程中调用 flight.recognize，待其余线程合并进来后放行首个请求"""
+    flight = SingleFlightOcrService(service)
+    image = np.zeros((4, 4, 3), np.uint8)
+    results = [None] * followers
+
+    def follow(i):
+        results[i] = flight.recognize(image)
+
+    leader_thread = threading.Thread(target=leader, args=(flight, image), daemon=True)
+    leader_thread.start()
+    while flight.stats()['inflight'] == 0:
+        time.sleep(0.005)
+    threads = [threading.Thread(target=follow, args=(i,), daemon=True) for i in range(followers)]
+    for thread in threads:
+        thread.start()
+    while flight.stats()['collapsed'] < followers:
+        time.sleep(0.005)
+    service.gate.set()
+    for thread in threads + [leader_thread]:
+        thread.join(5)
+        assert not thread.is_alive(), '等待者没有被唤醒'
+    return flight, results
+
+
+def call(flight, image):
+    flight.recognize(image)
+
+
+def test_followers_share_leader_failure():
+    service = GatedService(RuntimeError('boom'))
+    flight, results = run_with_followers(service, call)
+    assert [r['message'] for r in results] == ['boom'] * 3
+    assert service.calls == 1
+    assert flight.stats()['inflight'] == 0
+
+
+def test_followers_rerun_after_leader_interrupted():
+    service = GatedService(Interrupted())
+
+    def leader(flight, image):
+        with pytest.raises(Interrupted):
+            flight.recognize(image)
+
+    flight, results = run_with_followers(service, leader)
+    assert all(r['status'] for r in results)
+    # 等待者重新发起请求（可能彼此合并），而不是拿到首个请求的异常
+    assert 2 <= service.calls <= 4
+
+
+def test_leader_cancellation_not_shared():
+    service = GatedService(cancelled_result)
+    event = threading.Event()
+
+    def leader(flight, image):
+        with cancel_scope(event):
+            event.set()
+            assert flight.recognize(image)['message'] == cancelled_result()['message']
+
+    flight, results = run_with_followers(service, leader)
+    assert all(r['status'] for r in results)
+    assert 2 <= service.calls <= 4
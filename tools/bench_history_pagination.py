@@ -0,0 +1,145 @@
+# coding: utf-8
+"""
+历史记录分页与搜索基准测试
+
+生成一个百万行的历史记录库，对比 LIMIT/OFFSET 分页与键集分页（get_history_page）
+在不同页码下的单页耗时，以及全文索引搜索与 LIKE 搜索的首页耗时。
+数据库建在临时目录，不影响 app/data/history.db。
+
+用法（在项目根目录执行）:
+    python -m tools.bench_history_pagination [--rows 1000000] [--page-size 15] [--repeat 20]
+"""
+import argparse
+import contextlib
+import io
+import math
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from app.common.db_manager import DatabaseManager
+
+USER_ID = 'bench'
+
+# 生成记录用的公式模板，%d 处填入行号，使每条记录内容不同
+TEMPLATES = (
+    r'\frac{a_{%d}}{b^2}',
+    r'\alpha^{%d}+\beta_{i}',
+    r'\int_0^{%d} x\,dx',
+    r'\sum_{k=1}^{%d} k^2',
+    r'\sqrt{%d}+\gamma',
+    r'\sin(%d\theta)+\cos\phi',
+    r'\mathbf{v}_{%d}\cdot\mathbf{w}',
+    r'\lim_{n\to\infty} a_{%d}',
+)
+
+
+def populate(db, rows, batch_size=50000):
+    """写入 rows 条记录，其中约 1/10 属于其他用户"""
+    start = datetime(2020, 1, 1)
+    thumbnail = b'\x89PNG' + bytes(300)
+    with db.connections.write() as conn:
+        for first in range(0, rows, batch_size):
+            batch = range(first, min(rows, first + batch_size))
+            conn.executemany('''
+                INSERT INTO history (id, timestamp, image_data, image_blob, latex_result, confidence, request_id, user_id)
+                VALUES (?, ?, '', ?, ?, 0.9, ?, ?)
+            ''', (
+                (i + 1, start + timedelta(seconds=i), b'\x89PNG' + bytes(2000), TEMPLATES[i % len(TEMPLATES)] % i,
+                 f'bench-{i}', 'other' if i % 10 == 0 else USER_ID)
+                for i in batch
+            ))
+            conn.executemany('INSERT INTO thumbnails (id, data) VALUES (?, ?)', ((i + 1, thumbnail) for i in batch))
+
+
+def cursor_for_page(db, page, page_size):
+    """直接查出第 page 页之前最后一条记录的游标（不计入计时）"""
+    if page == 1:
+        return None
+    with db.connections.read() as conn:
+        row = conn.execute('''
+            SELECT timestamp, id FROM history WHERE user_id = ?
+            ORDER BY timestamp DESC, id DESC LIMIT 1 OFFSET ?
+        ''', (USER_ID, (page - 1) * page_size - 1)).fetchone()
+    return tuple(row)
+
+
+def measure(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='历史记录分页与搜索基准测试')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--page-size', type=int, default=15)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 10, 100, 1000, 10000])
+    parser.add_argument('--search', nargs='+', default=['a_{4242}', '"\\sqrt{99996}"', '\\mathb', '\\lim'],
+                        help='搜索词，默认包含精确短语、前缀和高频命令')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, 'history.db'))
+        start = time.perf_counter()
+        populate(db, args.rows)
+        print(f'生成 {args.rows} 条记录: {time.perf_counter() - start:.1f}s')
+
+        with db.connections.read() as conn:
+            plan = conn.execute('''
+                EXPLAIN QUERY PLAN SELECT id FROM history
+                WHERE user_id = ? AND (timestamp, id) < (?, ?)
+                ORDER BY timestamp DESC, id DESC LIMIT 16
+            ''', (USER_ID, '9999', 0)).fetchall()
+        print('键集分页查询计划:', '; '.join(row[-1] for row in plan))
+        print(f'{"页码":>8} {"OFFSET(ms)":>12} {"键集(ms)":>10}')
+
+        # 超出最后一页的页码没有游标，不参与计时
+        with db.connections.read() as conn:
+            user_rows = conn.execute('SELECT COUNT(*) FROM history WHERE user_id = ?', (USER_ID,)).fetchone()[0]
+        last_page = math.ceil(user_rows / args.page_size)
+        pages = [page for page in args.pages if 1 <= page <= last_page]
+        skipped = sorted(set(args.pages) - set(pages))
+        if skipped:
+            print(f'跳过超出最后一页（{last_page}）的页码: {skipped}')
+
+        # 仅计时查询本身，屏蔽数据库模块的日志输出
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = []
+            for page in pages:
+                after = cursor_for_page(db, page, args.page_size)
+                offset_ms = measure(
+                    lambda: db.get_history_records(page, args.page_size, user_id=USER_ID), args.repeat)
+                keyset_ms = measure(
+                    lambda: db.get_history_page(args.page_size, user_id=USER_ID, after=after), args.repeat)
+                results.append((page, offset_ms, keyset_ms))
+        for page, offset_ms, keyset_ms in results:
+            print(f'{page:>8} {offset_ms:>12.3f} {keyset_ms:>10.3f}')
+
+        print(f'{"搜索词":>16} {"命中":>8} {"全文索引(ms)":>14} {"LIKE(ms)":>10}')
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = []
+            for text in args.search:
+                hits = db.count_history_records(text, USER_ID)
+                fts_ms = measure(lambda: db.get_history_page(args.page_size, text, USER_ID), args.repeat)
+                db.search_ready = False
+                with db.connections.write() as conn:
+                    # 临时标记索引未就绪，测量回退的 LIKE 路径
+                    conn.execute("UPDATE history_meta SET value = -1 WHERE key = 'fts_backfill_last'")
+                like_ms = measure(lambda: db.get_history_page(args.page_size, text, USER_ID), args.repeat)
+                with db.connections.write() as conn:
+                    conn.execute("UPDATE history_meta SET value = 0 WHERE key = 'fts_backfill_last'")
+                results.append((text, hits, fts_ms, like_ms))
+        for text, hits, fts_ms, like_ms in results:
+            print(f'{text:>16} {hits:>8} {fts_ms:>14.3f} {like_ms:>10.3f}')
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+# coding: utf-8
+"""
+上传前图像优化的基准测试
+
+逐个开启预处理步骤，对比参考图片集上的上传字节数和预处理耗时；
+加 --recognize 时同时调用识别服务，统计端到端耗时和与标注的一致率。
+
+用法（在项目根目录执行）:
+    python -m tools.bench_preprocess REF_DIR [--labels labels.json] [--recognize]
+
+labels.json 为 {文件名: 期望的 LaTeX}。
+"""
+import argparse
+import json
+import os
+import time
+
+import cv2
+
+from app.common.batch_engine import iter_image_paths, read_image
+from app.common.image_preprocess import ImagePreprocessor
+
+VARIANTS = [
+    ('baseline', None),
+    ('autocrop', dict(crop=True, grayscale=False, binary=False, target_glyph_height=0, compression=3)),
+    ('grayscale', dict(crop=False, grayscale=True, binary=False, target_glyph_height=0, compression=3)),
+    ('binarize', dict(crop=False, grayscale=False, binary=True, target_glyph_height=0, compression=3)),
+    ('downscale', dict(crop=False, grayscale=False, binary=False, target_glyph_height=48, compression=3)),
+    ('compression9', dict(crop=False, grayscale=False, binary=False, target_glyph_height=0, compression=9)),
+    ('default', dict(crop=True, grayscale=True, binary=False, target_glyph_height=48, compression=6)),
+    ('all', dict(crop=True, grayscale=True, binary=True, target_glyph_height=48, compression=9)),
+]
+
+
+def normalize(latex):
+    return ''.join((latex or '').split())
+
+
+def send(service, data):
+    """绕过服务内部的预处理，直接上传给定字节"""
+    from app.common.config import cfg
+    files = [('file', ('formula.png', data, 'image/png'))]
+    response = service.session.post(
+        cfg.api_url.value, files=files, headers={'token': cfg.token.value},
+        timeout=(cfg.connectTimeout.value, cfg.readTimeout.value))
+    result = response.json()
+    return result.get('res', {}).get('latex', '') if result.get('status') is True else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='上传前图像优化基准测试')
+    parser.add_argument('source', help='参考图片目录或通配符')
+    parser.add_argument('--labels', help='标注文件 {文件名: LaTeX}')
+    parser.add_argument('--recognize', action='store_true', help='调用识别服务测量端到端耗时和准确率')
+    args = parser.parse_args()
+
+    labels = {}
+    if args.labels:
+        with open(args.labels, encoding='utf-8') as f:
+            labels = json.load(f)
+
+    service = None
+    if args.recognize:
+        from app.common.ocr_service import SimpletexService
+        service = SimpletexService()
+
+    paths = list(iter_image_paths(args.source))
+    print(f'{"variant":<14}{"avg bytes":>12}{"ratio":>8}{"prep ms":>10}{"e2e ms":>10}{"accuracy":>10}')
+    baseline_bytes = None
+    for name, options in VARIANTS:
+        preprocessor = ImagePreprocessor(**options) if options else None
+        total_bytes = total_prep = total_e2e = 0.0
+        correct = labelled = 0
+        for path in paths:
+            image = read_image(path)
+            start = time.perf_counter()
+            if preprocessor is None:
+                data = cv2.imencode('.png', image)[1].tobytes()
+            else:
+                data, _ = preprocessor.process(image)
+            total_prep += (time.perf_counter() - start) * 1000
+            total_bytes += len(data)
+
+            if service is not None:
+                latex = send(service, data)
+                total_e2e += (time.perf_counter() - start) * 1000
+                expected = labels.get(os.path.basename(path))
+                if expected is not None:
+                    labelled += 1
+                    correct += normalize(latex) == normalize(expected)
+
+        count = len(paths) or 1
+        avg_bytes = total_bytes / count
+        if baseline_bytes is None:
+            baseline_bytes = avg_bytes or 1
+        e2e = f'{total_e2e / count:.1f}' if service is not None else '-'
+        accuracy = f'{correct / labelled:.1%}' if labelled else '-'
+        print(f'{name:<14}{avg_bytes:>12.0f}{avg_bytes / baseline_bytes:>8.2f}'
+              f'{total_prep / count:>10.2f}{e2e:>10}{accuracy:>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# coding: utf-8
+"""
+优先级调度器基准测试
+
+在后台持续施加批量识别负载，同时周期性地发起交互请求，对比交互请求的延迟百分位：
+- fifo：单一 FIFO 队列，令牌先到先得
+- sched-only：优先级调度，但令牌先到先得（批量请求占着工作线程排在令牌队列前面）
+- priority：优先级调度，令牌也按优先级发放
+每个请求先从真实的令牌桶（默认与配置相同：60 次/分钟，突发 3）取令牌，
+识别本身用固定耗时的桩代替，不访问网络。
+
+用法（在项目根目录执行）:
+    python -m tools.bench_scheduler [--workers 4] [--bulk-threads 16] [--latency-ms 200] [--rpm 60] [--burst 3] [--reserve 1]
+"""
+import argparse
+import threading
+import time
+
+from app.common.ocr_scheduler import OcrScheduler, PRIORITY_BULK, PRIORITY_INTERACTIVE, percentile
+from app.common.rate_limiter import TokenBucket
+
+
+def run(scheduler, args, interactive_priority, token_priority=None):
+    """token_priority 为 None 时令牌按调用链优先级发放，否则所有请求以该优先级排队（即先到先得）"""
+    stop = threading.Event()
+    limiter = TokenBucket(args.rpm / 60, args.burst, interactive_reserve=args.reserve)
+
+    def work():
+        limiter.acquire(priority=token_priority)
+        time.sleep(args.latency_ms / 1000)
+
+    def bulk_loop():
+        while not stop.is_set():
+            scheduler.submit(work, priority=PRIORITY_BULK).result()
+
+    threads = [threading.Thread(target=bulk_loop, daemon=True) for _ in range(args.bulk_threads)]
+    for t in threads:
+        t.start()
+    time.sleep(args.latency_ms / 1000 * 2)
+
+    latencies = []
+    for _ in range(args.probes):
+        start = time.monotonic()
+        scheduler.submit(work, priority=interactive_priority).result()
+        latencies.append(time.monotonic() - start)
+        time.sleep(args.interval_ms / 1000)
+
+    stop.set()
+    for t in threads:
+        t.join()
+    scheduler.shutdown()
+    return latencies, scheduler.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='优先级调度器基准测试')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--bulk-limit', type=int, default=3)
+    parser.add_argument('--bulk-threads', type=int, default=16, help='并发的批量请求方数量')
+    parser.add_argument('--latency-ms', type=float, default=200)
+    parser.add_argument('--probes', type=int, default=10, help='交互请求次数')
+    parser.add_argument('--interval-ms', type=float, default=2000, help='两次交互请求的间隔')
+    parser.add_argument('--rpm', type=float, default=60, help='令牌桶速率（次/分钟）')
+    parser.add_argument('--burst', type=int, default=3, help='令牌桶容量')
+    parser.add_argument('--reserve', type=int, default=1, help='交互请求专用的令牌数')
+    args = parser.parse_args()
+
+    def priority_scheduler():
+        return OcrScheduler(args.workers, {PRIORITY_INTERACTIVE: args.workers, PRIORITY_BULK: args.bulk_limit})
+
+    idle = [args.latency_ms / 1000]
+    fifo = OcrScheduler(args.workers, {PRIORITY_INTERACTIVE: args.workers, PRIORITY_BULK: args.workers},
+                        aging_interval=1e9)
+    fifo_latencies, _ = run(fifo, args, PRIORITY_BULK, token_priority=PRIORITY_BULK)
+    sched_latencies, _ = run(priority_scheduler(), args, PRIORITY_INTERACTIVE, token_priority=PRIORITY_BULK)
+    latencies, stats = run(priority_scheduler(), args, PRIORITY_INTERACTIVE)
+
+    print(f'{"mode":<12}{"p50 ms":>10}{"p95 ms":>10}')
+    for name, values in (('idle', idle), ('fifo', fifo_latencies), ('sched-only', sched_latencies),
+                         ('priority', latencies)):
+        print(f'{name:<12}{percentile(values, 50) * 1000:>10.0f}{percentile(values, 95) * 1000:>10.0f}')
+    print(f'bulk completed under priority scheduling: {stats["bulk"]["completed"]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+# coding: utf-8
+"""
+本地 Simpletex 兼容模拟服务，用于离线压测客户端、重试和批量识别
+
+实现与 https://server.simpletex.cn/api/latex_ocr 相同的 multipart 接口和
+JSON 响应（status, res.latex, res.conf, request_id），并可配置延迟分布、
+错误率和限流。
+
+用法（在项目根目录执行）:
+    python -m tools.mock_simpletex_server --port 8765 --latency lognormal --latency-ms 300 \\
+        --error-rate 0.02 --http-error-rate 0.01 --rate-limit 5
+
+然后在设置中把 API 地址改为 http://127.0.0.1:8765/api/latex_ocr
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.common.multipart import parse_multipart
+
+
+class LatencyModel:
+    """模拟服务端处理耗时（毫秒）"""
+
+    def __init__(self, kind='fixed', mean=200.0, jitter=50.0):
+        self.kind = kind
+        self.mean = mean
+        self.jitter = jitter
+
+    def sample(self):
+        if self.kind == 'fixed':
+            value = self.mean
+        elif self.kind == 'uniform':
+            value = random.uniform(self.mean - self.jitter, self.mean + self.jitter)
+        elif self.kind == 'normal':
+            value = random.gauss(self.mean, self.jitter)
+        elif self.kind == 'exponential':
+            value = random.expovariate(1.0 / self.mean) if self.mean > 0 else 0
+        elif self.kind == 'lognormal':
+            # 按期望值和标准差反推对数正态参数，模拟长尾延迟
+            variance = self.jitter ** 2
+            sigma2 = math.log(1 + variance / (self.mean ** 2)) if self.mean > 0 else 0
+            mu = math.log(self.mean) - sigma2 / 2 if self.mean > 0 else 0
+            value = random.lognormvariate(mu, math.sqrt(sigma2)) if self.mean > 0 else 0
+        else:
+            raise ValueError(f'Unsupported latency distribution: {self.kind}')
+        return max(0.0, value)
+
+
+class TokenBucket:
+    """服务端限流令牌桶"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class MockState:
+    """模拟服务的配置与计数"""
+
+    def __init__(self, args):
+        self.latency = LatencyModel(args.latency, args.latency_ms, args.latency_jitter)
+        self.error_rate = args.error_rate
+        self.http_error_rate = args.http_error_rate
+        self.bucket = TokenBucket(args.rate_limit, args.burst or args.rate_limit) if args.rate_limit else None
+        self.quota = args.daily_quota
+        self.token = args.token
+        self.counters = {'requests': 0, 'ok': 0, 'errors': 0, 'http_errors': 0,
+                         'rate_limited': 0, 'quota_exceeded': 0, 'unauthorized': 0}
+        self._lock = threading.Lock()
+
+    def count(self, key):
+        with self._lock:
+            self.counters[key] += 1
+            return self.counters[key]
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'MockSimpletex/1.0'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, code, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def error_json(self, code, message):
+        self.send_json(code, {'status': False, 'message': message, 'request_id': self.request_id})
+
+    def do_GET(self):
+        if self.path == '/stats':
+            return self.send_json(200, self.server.state.counters)
+        self.request_id = None
+        self.error_json(404, 'Not Found')
+
+    def do_POST(self):
+        state = self.server.state
+        self.request_id = f'tr_{uuid.uuid4().hex[:24]}'
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        state.count('requests')
+
+        if self.path.split('?')[0] != '/api/latex_ocr':
+            return self.error_json(404, 'Not Found')
+        if state.token and self.headers.get('token') != state.token:
+            state.count('unauthorized')
+            return self.error_json(401, 'Invalid token')
+        if state.bucket is not None and not state.bucket.try_acquire():
+            state.count('rate_limited')
+            return self.error_json(429, 'Too Many Requests')
+        if state.quota and state.counters['ok'] >= state.quota:
+            state.count('quota_exceeded')
+            return self.error_json(200, 'Daily quota exceeded')
+
+        try:
+            files = parse_multipart(body, self.headers.get('Content-Type')).get('file')
+        except ValueError as e:
+            return self.error_json(400, str(e))
+        if not files:
+            return self.error_json(400, 'Missing file')
+
+        time.sleep(state.latency.sample() / 1000)
+
+        roll = random.random()
+        if roll < state.http_error_rate:
+            state.count('http_errors')
+            return self.error_json(500, 'Internal Server Error')
+        if roll < state.http_error_rate + state.error_rate:
+            state.count('errors')
+            return self.error_json(200, 'Recognition failed')
+
+        # 结果由图片内容决定，便于校验缓存和去重
+        digest = hashlib.sha256(files[0][2]).hexdigest()
+        state.count('ok')
+        self.send_json(200, {
+            'status': True,
+            'res': {
+                'latex': f'\\mathrm{{mock}}_{{{digest[:8]}}}',
+                'conf': round(0.8 + int(digest[8:10], 16) / 255 * 0.2, 4)
+            },
+            'request_id': self.request_id
+        })
+
+
+def create_server(args):
+    server = ThreadingHTTPServer((args.host, args.port), MockHandler)
+    server.daemon_threads = True
+    server.state = MockState(args)
+    server.verbose = args.verbose
+    return server
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='本地 Simpletex 兼容模拟服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', default='fixed',
+                        choices=['fixed', 'uniform', 'normal', 'exponential', 'lognormal'],
+                        help='延迟分布')
+    parser.add_argument('--latency-ms', type=float, default=200.0, help='平均延迟（毫秒）')
+    parser.add_argument('--latency-jitter', type=float, default=50.0, help='延迟抖动/标准差（毫秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回 status=false 的比例')
+    parser.add_argument('--http-error-rate', type=float, default=0.0, help='返回 HTTP 500 的比例')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='每秒允许的请求数，0 为不限')
+    parser.add_argument('--burst', type=float, default=0.0, help='限流突发容量，默认等于 rate-limit')
+    parser.add_argument('--daily-quota', type=int, default=0, help='成功次数上限，0 为不限')
+    parser.add_argument('--token', default='', help='要求请求头 token 与之相同')
+    parser.add_argument('--verbose', action='store_true', help='打印访问日志')
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    server = create_server(args)
+    print(f'Mock Simpletex listening on http://{args.host}:{server.server_port}/api/latex_ocr')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()